@@ -1,4 +1,4 @@
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
 from flask_cors import CORS
 from flasgger import Swagger
 
@@ -9,9 +9,15 @@ from routes.challenge import challenge_bp
 from routes.user import user_bp
 from routes.invite import invite_bp
 from routes.match import match_bp
+from services import compression, http_pool, metrics, readiness, tracing
+from services.json_provider import OrjsonProvider
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
+tracing.init_app(app)
+metrics.init_app(app)
+compression.init_app(app)
 
 swagger_config = {
     "headers": [],
@@ -44,7 +50,7 @@ swagger_template = {
     },
 }
 
-Swagger(app, config=swagger_config, template=swagger_template)
+swagger = Swagger(app, config=swagger_config, template=swagger_template)
 
 # Register blueprints
 app.register_blueprint(auth_bp, url_prefix="/auth")
@@ -102,6 +108,51 @@ def health():
     return jsonify({"status": "OK"}), 200
 
 
+@app.route("/ready", methods=["GET"])
+def ready():
+    """Readiness check for load balancers
+    ---
+    tags:
+      - General
+    responses:
+      200:
+        description: Ready (status "ready"), or "degraded" when OpenAI or Places is down. Per-dependency status and latency.
+      503:
+        description: Supabase is down, no probe has completed yet, or probes have stopped
+    """
+    status, body = readiness.response()
+    return Response(body, status=status, mimetype="application/json")
+
+
+@app.route("/health/pools", methods=["GET"])
+def pool_health():
+    """Outbound connection pool stats
+    ---
+    tags:
+      - General
+    responses:
+      200:
+        description: Per-upstream request, connection reuse and saturation counters
+    """
+    return jsonify({"data": http_pool.stats()}), 200
+
+
+@app.route("/metrics", methods=["GET"])
+def prometheus_metrics():
+    """Prometheus metrics
+    ---
+    tags:
+      - General
+    produces:
+      - text/plain
+    responses:
+      200:
+        description: Request and upstream latency histograms, cache hits and misses, in-flight gauges (all workers)
+    """
+    body, content_type = metrics.render()
+    return Response(body, content_type=content_type)
+
+
 @app.route("/records", methods=["GET"])
 def list_records():
     """List records from Supabase
@@ -166,21 +217,24 @@ def create_record():
 
 @app.route("/supabase/health", methods=["GET"])
 def supabase_health():
-    """Supabase connection check
+    """Supabase connection check (result of the last background query)
     ---
     tags:
       - General
     responses:
       200:
-        description: Supabase client is connected
+        description: Supabase answered the last probe query
       500:
         description: Supabase connection failed
+      503:
+        description: No probe has completed yet
     """
-    try:
-        get_supabase_client()
-        return jsonify({"status": "connected"}), 200
-    except Exception as exc:
-        return jsonify({"status": "error", "details": str(exc)}), 500
+    result = readiness.dependency("supabase")
+    if result is None:
+        return jsonify({"status": "starting"}), 503
+    if result["status"] != "up":
+        return jsonify({"status": "error", "details": result["error"]}), 500
+    return jsonify({"status": "connected", "latency_ms": result["latency_ms"]}), 200
 
 
 if __name__ == "__main__":
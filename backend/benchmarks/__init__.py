@@ -0,0 +1,12 @@
+"""Microbenchmarks for hot pure-Python paths: LLM output parsing, prompt
+building, response serialization and challenge scoring.
+
+Usage:
+    python -m benchmarks                       # run everything
+    python -m benchmarks -k jsonify            # only names containing "jsonify"
+    python -m benchmarks --save-baseline       # store results in benchmarks/baseline.json
+    python -m benchmarks --baseline            # compare against it
+
+Benchmarks register themselves with ``@benchmark`` in the bench_*.py
+modules. See README.md, "Benchmarks".
+"""
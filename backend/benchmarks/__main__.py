@@ -0,0 +1,69 @@
+import argparse
+import json
+import os
+import sys
+
+from benchmarks import bench_llm, bench_routes  # noqa: F401  (registers the benchmarks)
+from benchmarks import harness
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m benchmarks", description="Microbenchmarks for hot pure-Python paths.")
+    parser.add_argument("-k", metavar="TEXT", help="only run benchmarks whose name contains TEXT")
+    parser.add_argument("--rounds", type=int, default=50, help="timed rounds per benchmark (default 50)")
+    parser.add_argument("--min-round-ms", type=float, default=10, help="minimum length of one round (default 10)")
+    parser.add_argument("--warmup-ms", type=float, default=200, help="untimed rounds before sampling (default 200)")
+    parser.add_argument("--json", metavar="PATH", help="write the results here")
+    parser.add_argument("--baseline", metavar="PATH", nargs="?", const=DEFAULT_BASELINE,
+                        help="compare against a saved run (default benchmarks/baseline.json)")
+    parser.add_argument("--save-baseline", metavar="PATH", nargs="?", const=DEFAULT_BASELINE,
+                        help="save this run as the baseline (default benchmarks/baseline.json)")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown (default 0.10)")
+    args = parser.parse_args(argv)
+
+    selected = {name: setup for name, setup in harness.registered().items() if not args.k or args.k in name}
+    if not selected:
+        print(f"no benchmark name contains {args.k!r}")
+        return 2
+
+    results = {"machine": harness.machine(), "benchmarks": {}}
+    print(f"{'benchmark':<62}{'median us':>12}{'min us':>10}{'iqr us':>10}{'loops':>9}{'outliers':>10}{'rel':>9}")
+    for name, setup in selected.items():
+        stats = harness.measure(setup(), args.rounds, args.min_round_ms / 1000, args.warmup_ms / 1000)
+        results["benchmarks"][name] = stats
+        print(
+            f"{name:<62}{stats['median_us']:>12.3f}{stats['min_us']:>10.3f}"
+            f"{stats['iqr_us']:>10.3f}{stats['loops']:>9}{stats['outliers']:>10}{stats['relative']:>9.3f}"
+        )
+
+    for path in (args.json, args.save_baseline):
+        if path:
+            with open(path, "w") as f:
+                json.dump(results, f, indent=2)
+                f.write("\n")
+            print(f"\nwrote {path}")
+
+    if not args.baseline:
+        return 0
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != results["machine"]:
+        print("\nwarning: the baseline was recorded on a different machine or Python; compare with care")
+    regressions, improvements = harness.compare(results, baseline, args.tolerance)
+    if improvements:
+        print(f"\nfaster than {args.baseline}:")
+        for line in improvements:
+            print(f"  {line}")
+    if regressions:
+        print(f"\nFAIL: {len(regressions)} benchmark(s) more than {args.tolerance:.0%} slower than {args.baseline}:")
+        for line in regressions:
+            print(f"  {line}")
+        return 1
+    print(f"\nOK: nothing more than {args.tolerance:.0%} slower than {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,41 @@
+"""llm_service: parsing model replies, building prompts and deduplicating candidate pools."""
+
+from benchmarks import fixtures
+from benchmarks.harness import benchmark
+from services import candidate_pool, llm_service
+
+
+@benchmark("llm._parse_json options, unfenced")
+def parse_unfenced():
+    text = fixtures.OPTIONS_REPLY
+    return lambda: llm_service._parse_json(text)
+
+
+@benchmark("llm._parse_json options, fenced")
+def parse_fenced():
+    text = fixtures.OPTIONS_REPLY_FENCED
+    return lambda: llm_service._parse_json(text)
+
+
+@benchmark("llm._parse_json challenges, fenced")
+def parse_challenges_fenced():
+    text = fixtures.CHALLENGES_REPLY_FENCED
+    return lambda: llm_service._parse_json(text)
+
+
+@benchmark("llm craving prompt, 10 places")
+def craving_prompt():
+    places = fixtures.PLACES
+    return lambda: llm_service._craving_options_prompt("crepe", places)
+
+
+@benchmark("llm craving prompt, 10 places + 5 preferences")
+def craving_prompt_personalized():
+    places, preferences = fixtures.PLACES, fixtures.PREFERENCES
+    return lambda: llm_service._craving_options_prompt("crepe", places, preferences)
+
+
+@benchmark("candidate_pool.distinct, 25 craving options")
+def distinct_pool():
+    pool = fixtures.CRAVING_POOL
+    return lambda: candidate_pool.distinct(pool, "option")
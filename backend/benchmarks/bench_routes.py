@@ -0,0 +1,89 @@
+"""Route hot paths: response serialization, request parsing, compression and challenge scoring.
+
+The jsonify benchmarks go through the real app's JSON provider
+(services/json_provider.py). Each has a "stdlib json" twin using Flask's
+default provider on the same payload, so the two can be read side by side.
+"""
+
+import json
+
+from flask import jsonify
+from flask.json.provider import DefaultJSONProvider
+
+from benchmarks import fixtures
+from benchmarks.harness import benchmark
+from routes import challenge
+from services import compression
+
+_app = None
+
+
+def _in_app_context():
+    """jsonify needs an app context; push the real app's once, so its JSON provider is timed."""
+    global _app
+    if _app is None:
+        from app import app
+
+        app.app_context().push()
+        _app = app
+    return _app
+
+
+def _stdlib_provider():
+    return DefaultJSONProvider(_in_app_context())
+
+
+_PAYLOADS = {
+    "crave response (6 options)": fixtures.CRAVE_RESPONSE,
+    "legacy session with location_options": {"data": fixtures.LEGACY_SESSION},
+    "history page (50 sessions)": fixtures.HISTORY_RESPONSE,
+}
+
+
+def _register_serialization(label: str, payload: dict):
+    @benchmark(f"jsonify {label}")
+    def app_provider():
+        _in_app_context()
+        return lambda: jsonify(payload)
+
+    @benchmark(f"jsonify {label}, stdlib json")
+    def stdlib_provider():
+        response = _stdlib_provider().response
+        return lambda: response(payload)
+
+    body = json.dumps(payload).encode()
+
+    @benchmark(f"parse {label}")
+    def app_loads():
+        loads = _in_app_context().json.loads
+        return lambda: loads(body)
+
+    @benchmark(f"parse {label}, stdlib json")
+    def stdlib_loads():
+        loads = _stdlib_provider().loads
+        return lambda: loads(body)
+
+
+for _label, _payload in _PAYLOADS.items():
+    _register_serialization(_label, _payload)
+
+
+def _register_compression(encoding: str):
+    @benchmark(f"{encoding} history page (50 sessions)")
+    def compress_history():
+        body = _in_app_context().json.response(fixtures.HISTORY_RESPONSE).get_data()
+        return lambda: compression._compress_bytes(body, encoding)
+
+
+for _encoding in compression.ENCODINGS:
+    _register_compression(_encoding)
+
+
+@benchmark("challenge._score_completion, 0-100%")
+def score_completion():
+    completions = range(101)
+
+    def run():
+        for completion in completions:
+            challenge._score_completion(completion, 540)
+    return run
@@ -0,0 +1,139 @@
+"""Realistic inputs, shaped like what the app sees in production.
+
+Sizes follow the app's own caps: 10 places per search (places_service),
+5 preferences in a prompt (PERSONALIZATION_TOP_K), 4-6 craving options
+(25 in a candidate pool), 3 challenges or healthy suggestions, and 50
+sessions per history page
+(HISTORY_DEFAULT_LIMIT). Content is generated from a fixed seed, so every
+run times the same data.
+"""
+
+import json
+import random
+import uuid
+from datetime import datetime, timedelta, timezone
+
+_rng = random.Random(45)
+
+_STORES = [
+    "Pizza Hut", "Domino's Pizza", "The Crepe Corner", "Burger King", "Ministry of Crab",
+    "Barefoot Cafe", "Cafe Kumbuk", "Sugar Bistro", "Raja Bojun", "Paradise Road Cafe",
+]
+_STREETS = ["Galle Road", "Duplication Road", "Ward Place", "Flower Road", "Dharmapala Mawatha"]
+_ITEMS = [
+    "Nutella banana crepe", "Double pepperoni pizza", "Chicken kottu", "Crispy chicken burger",
+    "Chocolate lava cake", "Cheese-loaded fries", "Strawberry cheesecake", "Spicy ramen bowl",
+]
+
+
+def _uuid() -> str:
+    return str(uuid.UUID(int=_rng.getrandbits(128), version=4))
+
+
+def _place() -> dict:
+    return {
+        "name": _rng.choice(_STORES),
+        "address": f"{_rng.randint(1, 400)} {_rng.choice(_STREETS)}, Colombo {_rng.randint(1, 15):02d}",
+        "place_id": "ChIJ" + "".join(_rng.choices("ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789_-", k=23)),
+        "rating": round(_rng.uniform(3.2, 4.9), 1),
+    }
+
+
+def _option() -> dict:
+    item = _rng.choice(_ITEMS)
+    store = _rng.choice(_STORES)
+    return {
+        "option": item,
+        "store": store,
+        "description": f"A generous {item.lower()} from {store}, made fresh to order and ideal for this craving.",
+    }
+
+
+def _challenge(minutes: int) -> dict:
+    return {
+        "description": "Brisk walk at a steady pace, then 3 rounds of 15 squats, 10 push-ups and 20 lunges, "
+                       "finishing with a 5-minute cool-down stretch.",
+        "time_limit": minutes,
+    }
+
+
+def _suggestion() -> dict:
+    return {
+        "suggestion": "Greek yogurt parfait with berries",
+        "description": "Layer plain Greek yogurt, mixed berries and a spoon of granola in a glass.",
+        "estimated_calories": _rng.randrange(120, 320, 10),
+        "why": "Creamy and sweet like the original, with far more protein and less sugar.",
+    }
+
+
+PLACES = [_place() for _ in range(10)]
+PREFERENCES = [
+    {"item": item, "order_count": count}
+    for item, count in zip(_rng.sample(_ITEMS, 5), (9, 6, 4, 3, 2))
+]
+CRAVING_OPTIONS = [_option() for _ in range(6)]
+CHALLENGES = [_challenge(m) for m in (45, 30, 15)]
+HEALTHY_SUGGESTIONS = [_suggestion() for _ in range(3)]
+
+# LLM replies, as the model returns them with and without markdown fences
+OPTIONS_REPLY = json.dumps(CRAVING_OPTIONS, indent=2)
+OPTIONS_REPLY_FENCED = f"```json\n{OPTIONS_REPLY}\n```"
+CHALLENGES_REPLY_FENCED = f"```json\n{json.dumps(CHALLENGES, indent=2)}\n```"
+
+# A pre-008 session row, with everything still in the location_options blob
+LEGACY_SESSION = {
+    "session_id": _uuid(),
+    "user_id": _uuid(),
+    "crave_item": "crepe",
+    "calories": 540,
+    "session_type": "healthy_route",
+    "rating": None,
+    "created_at": "2026-01-14T18:22:05.481923+00:00",
+    "location_options": {
+        "places": PLACES,
+        "options": CRAVING_OPTIONS,
+        "healthy_suggestions": HEALTHY_SUGGESTIONS,
+        "healthy_excluded": ["Frozen banana 'nice cream'", "Chia pudding"],
+        "crave_regenerations": 2,
+        "challenge_regenerations": 0,
+        "healthy_regenerations": 1,
+    },
+}
+
+CRAVE_RESPONSE = {"data": {"session_id": _uuid(), "options": CRAVING_OPTIONS, "personalized": True}}
+
+
+def _history_session(created_at: datetime) -> dict:
+    session_id = _uuid()
+    session_type = _rng.choice(["solo_challenge", "invite_friend", "challenge_random", "healthy_route", "skip"])
+    challenges = []
+    if session_type in ("solo_challenge", "invite_friend", "challenge_random"):
+        challenges.append({
+            "challenge_id": _uuid(),
+            "session_id": session_id,
+            **_challenge(_rng.choice([15, 30, 45])),
+            "expiry_time": (created_at + timedelta(hours=24)).isoformat(),
+            "status": _rng.choice(["completed", "completed", "expired", "active"]),
+            "created_at": (created_at + timedelta(minutes=2)).isoformat(),
+        })
+    return {
+        "session_id": session_id,
+        "crave_item": _rng.choice(_ITEMS),
+        "calories": _rng.randrange(150, 1200, 10),
+        "session_type": session_type,
+        "rating": _rng.randint(1, 10) if challenges else None,
+        "created_at": created_at.isoformat(),
+        "challenges": challenges,
+    }
+
+
+_now = datetime(2026, 3, 1, 12, 0, tzinfo=timezone.utc)
+HISTORY_RESPONSE = {
+    "data": {
+        "sessions": [_history_session(_now - timedelta(hours=7 * i)) for i in range(50)],
+        "next_cursor": "WyIyMDI2LTAyLTE2VDEwOjAwOjAwKzAwOjAwIiwgIjkxZjI0MDgyIl0",
+    }
+}
+
+# A first crave with candidate pools on: candidate_pool.pool_size(5, 4), with repeats to drop
+CRAVING_POOL = [_option() for _ in range(25)]
@@ -0,0 +1,135 @@
+"""Timing loop, statistics and baseline comparison for the benchmarks."""
+
+import gc
+import platform
+import statistics
+import time
+
+_benchmarks = {}  # name -> setup function returning the zero-argument callable to time
+
+
+def benchmark(name: str):
+    """Register a setup function. It builds the fixtures and returns the callable to time."""
+    def register(setup):
+        _benchmarks[name] = setup
+        return setup
+    return register
+
+
+def registered() -> dict:
+    return dict(_benchmarks)
+
+
+_REFERENCE_ROWS = [{"id": i, "name": f"item {i}", "score": i * 0.5} for i in range(50)]
+
+
+def _reference():
+    """Fixed pure-Python work (dict lookups, string building) timed next to every round."""
+    total = 0
+    for row in _REFERENCE_ROWS:
+        total += len(row["name"]) + int(row["score"])
+    return ",".join(str(row["id"]) for row in _REFERENCE_ROWS), total
+
+
+def measure(fn, rounds: int, min_round_seconds: float, warmup_seconds: float) -> dict:
+    """Time *fn* over *rounds* rounds, each long enough to swamp timer resolution.
+
+    The number of calls per round is calibrated first, then rounds run for
+    *warmup_seconds* untimed, so caches and the allocator settle before
+    sampling. The garbage collector is paused inside a round, as timeit does.
+
+    Every round is followed by a round of _reference(). ``relative`` is the
+    median of fn's time over the reference's, round by round, so a machine
+    that is busier or throttled for part of the run moves both and the
+    ratio stays put. Baselines compare on it.
+    """
+    loops = _calibrate(fn, min_round_seconds)
+    reference_loops = _calibrate(_reference, min_round_seconds)
+
+    warmup_until = time.perf_counter() + warmup_seconds
+    while time.perf_counter() < warmup_until:
+        _round(fn, loops)
+
+    gc.collect()
+    samples, ratios = [], []
+    for _ in range(rounds):
+        per_call = _round(fn, loops) / loops
+        samples.append(per_call)
+        ratios.append(per_call / (_round(_reference, reference_loops) / reference_loops))
+    return {**_stats(samples, loops), "relative": round(statistics.median(ratios), 4)}
+
+
+def _calibrate(fn, min_round_seconds: float) -> int:
+    """Calls per round needed for a round to last *min_round_seconds*."""
+    loops = 1
+    while True:
+        elapsed = _round(fn, loops)
+        if elapsed >= min_round_seconds:
+            return loops
+        # aim a little past the target so the next round is usually long enough
+        loops = max(loops * 2, int(loops * min_round_seconds * 1.2 / max(elapsed, 1e-9)))
+
+
+def _round(fn, loops: int) -> float:
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        start = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        return time.perf_counter() - start
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _stats(samples: list, loops: int) -> dict:
+    """Per-call times in microseconds."""
+    us = sorted(s * 1e6 for s in samples)
+    q1, _, q3 = statistics.quantiles(us, n=4)
+    iqr = q3 - q1
+    return {
+        "loops": loops,
+        "rounds": len(us),
+        "min_us": round(us[0], 3),
+        "median_us": round(statistics.median(us), 3),
+        "mean_us": round(statistics.fmean(us), 3),
+        "stdev_us": round(statistics.stdev(us), 3) if len(us) > 1 else 0.0,
+        "iqr_us": round(iqr, 3),
+        # rounds outside 1.5 IQR of the quartiles, usually interference from other processes
+        "outliers": sum(1 for v in us if v < q1 - 1.5 * iqr or v > q3 + 1.5 * iqr),
+    }
+
+
+def machine() -> dict:
+    """What a result depends on besides the code; baselines only compare on the same setup."""
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "platform": platform.platform(),
+        "machine": platform.machine(),
+        "processor": platform.processor(),
+    }
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> tuple[list, list]:
+    """(regressions, improvements) of *results* against *baseline*, as printable lines.
+
+    A benchmark regresses when its time relative to the reference work
+    (see measure) grows by more than *tolerance* (a fraction).
+    """
+    regressions, improvements = [], []
+    for name, base in baseline.get("benchmarks", {}).items():
+        current = results["benchmarks"].get(name)
+        if current is None:
+            continue
+        change = current["relative"] / base["relative"] - 1
+        line = (
+            f"{name}: {change:+.1%} relative to the reference "
+            f"(median {base['median_us']:.3f} -> {current['median_us']:.3f} us)"
+        )
+        if change > tolerance:
+            regressions.append(line)
+        elif change < -tolerance:
+            improvements.append(line)
+    return regressions, improvements
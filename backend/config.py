@@ -1,19 +1,60 @@
 import os
+import tempfile
 from functools import lru_cache
 from typing import Tuple
 
 from dotenv import load_dotenv
 from supabase import Client, create_client
+from supabase.lib.client_options import SyncClientOptions
 
 load_dotenv()
 
+# Offline stand-ins (see standins/): "all", or a comma list of supabase, openai, places
+_standins = {s.strip() for s in os.getenv("STANDINS", "").lower().split(",") if s.strip()}
+STANDINS = {"supabase", "openai", "places"} if "all" in _standins else _standins
+STANDIN_SUPABASE_URL = "http://supabase.standin"
+
 SUPABASE_TABLE = os.getenv("SUPABASE_TABLE", "profiles")
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY")
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY") or ("sk-standin" if "openai" in STANDINS else None)
+GOOGLE_PLACES_API_KEY = os.getenv("GOOGLE_PLACES_API_KEY") or (
+    "AIzaStandIn" if "places" in STANDINS else None
+)
+PUBSUB_BACKEND = os.getenv("PUBSUB_BACKEND", "local")
+WRITE_BEHIND_ENABLED = os.getenv("WRITE_BEHIND_ENABLED", "1") == "1"
+WRITE_BEHIND_SPOOL_DIR = os.getenv(
+    "WRITE_BEHIND_SPOOL_DIR", os.path.join(tempfile.gettempdir(), "cravebalance-write-behind")
+)
+ROW_CACHE_TTL_SECONDS = float(os.getenv("ROW_CACHE_TTL_SECONDS", "0"))
+HTTP_POOL_MAX_CONNECTIONS = int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100"))
+HTTP_POOL_MAX_KEEPALIVE = int(os.getenv("HTTP_POOL_MAX_KEEPALIVE", "20"))
+HTTP2_ENABLED = os.getenv("HTTP2_ENABLED", "1") == "1"
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "1") == "1"
+SLOW_REQUEST_MS = float(os.getenv("SLOW_REQUEST_MS", "1000"))
+READY_PROBE_INTERVAL_SECONDS = float(os.getenv("READY_PROBE_INTERVAL_SECONDS", "10"))
+COMPRESSION_ENABLED = os.getenv("COMPRESSION_ENABLED", "1") == "1"
+COMPRESSION_MIN_BYTES = int(os.getenv("COMPRESSION_MIN_BYTES", "1024"))
+COMPRESSION_ZSTD_LEVEL = int(os.getenv("COMPRESSION_ZSTD_LEVEL", "3"))
+COMPRESSION_GZIP_LEVEL = int(os.getenv("COMPRESSION_GZIP_LEVEL", "5"))
+IDEMPOTENCY_TTL_SECONDS = float(os.getenv("IDEMPOTENCY_TTL_SECONDS", "86400"))
+IDEMPOTENCY_MAX_ENTRIES = int(os.getenv("IDEMPOTENCY_MAX_ENTRIES", "5000"))
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "30"))
+IDEMPOTENCY_CLAIM_SECONDS = float(os.getenv("IDEMPOTENCY_CLAIM_SECONDS", "300"))
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+LLM_MAX_CONCURRENT = int(os.getenv("LLM_MAX_CONCURRENT", "32"))
+LLM_QUEUE_SIZE = int(os.getenv("LLM_QUEUE_SIZE", "32"))
+LLM_QUEUE_TIMEOUT_SECONDS = float(os.getenv("LLM_QUEUE_TIMEOUT_SECONDS", "10"))
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "10"))
+LLM_BURST = float(os.getenv("LLM_BURST", "20"))
+LLM_USER_RATE_PER_MINUTE = float(os.getenv("LLM_USER_RATE_PER_MINUTE", "30"))
+LLM_USER_BURST = float(os.getenv("LLM_USER_BURST", "10"))
+CANDIDATE_POOLS_ENABLED = os.getenv("CANDIDATE_POOLS_ENABLED", "1") == "1"
+LOCATION_OPTIONS_CONVERSION_ENABLED = os.getenv("LOCATION_OPTIONS_CONVERSION_ENABLED", "1") == "1"
 
 
 def _load_supabase_credentials() -> Tuple[str, str]:
     """Fetch Supabase credentials from the environment."""
+    if "supabase" in STANDINS:
+        return STANDIN_SUPABASE_URL, "standin-anon-key"
     url = os.getenv("SUPABASE_URL")
     key = os.getenv("SUPABASE_ANON_KEY")
     if not url or not key:
@@ -23,8 +64,44 @@ def _load_supabase_credentials() -> Tuple[str, str]:
     return url, key
 
 
+def _load_supabase_service_key() -> str:
+    """Fetch the service role key, used only for the RPCs in migrations/."""
+    if "supabase" in STANDINS:
+        return "standin-service-role-key"
+    key = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+    if not key:
+        raise RuntimeError(
+            "Supabase service role key missing. Set SUPABASE_SERVICE_ROLE_KEY."
+        )
+    return key
+
+
 @lru_cache(maxsize=1)
 def get_supabase_client() -> Client:
     """Create a Supabase client once and reuse it."""
+    from services import http_pool
+
     url, key = _load_supabase_credentials()
-    return create_client(url, key)
+    return create_client(
+        url,
+        key,
+        options=SyncClientOptions(httpx_client=http_pool.get_httpx_client("supabase")),
+    )
+
+
+@lru_cache(maxsize=1)
+def get_supabase_service_client() -> Client:
+    """Create the service-role Supabase client once and reuse it.
+
+    Only for the SECURITY DEFINER functions in migrations/, which take the
+    user ID as an argument and so may only be executed by the service role.
+    It bypasses RLS, so never use it for table queries.
+    """
+    from services import http_pool
+
+    url, _ = _load_supabase_credentials()
+    return create_client(
+        url,
+        _load_supabase_service_key(),
+        options=SyncClientOptions(httpx_client=http_pool.get_httpx_client("supabase")),
+    )
@@ -0,0 +1,66 @@
+"""Gunicorn settings for serving the API in production.
+
+    gunicorn -c gunicorn.conf.py app:app
+
+By default each worker is a gevent worker: sockets are monkey-patched
+before the app is imported, so a request waiting on OpenAI, Google Places
+or Supabase yields to other requests instead of holding a thread. One
+worker process can then hold WORKER_CONNECTIONS in-flight requests.
+Set WORKER_CLASS=gthread to fall back to a fixed thread pool per worker.
+"""
+
+import os
+import shutil
+import tempfile
+
+bind = os.getenv("BIND", "0.0.0.0:5000")
+workers = int(os.getenv("WEB_CONCURRENCY", "2"))
+worker_class = os.getenv("WORKER_CLASS", "gevent")
+
+# gevent: concurrent requests per worker; gthread: threads per worker
+worker_connections = int(os.getenv("WORKER_CONNECTIONS", "1000"))
+threads = int(os.getenv("WORKER_THREADS", "8"))
+
+# With gthread, a request queued for an LLM slot (services/admission.py)
+# holds a thread. Keep running + queued LLM requests to three quarters of
+# the threads, so the rest stay free for cheap endpoints.
+if worker_class == "gthread":
+    os.environ.setdefault("LLM_MAX_CONCURRENT", str(max(1, threads // 2)))
+    os.environ.setdefault("LLM_QUEUE_SIZE", str(max(1, threads // 4)))
+
+# LLM calls take seconds; SSE streams (/invite/status/<id>/stream) stay
+# open for minutes. Async workers heartbeat independently of requests, so
+# this only catches a worker whose event loop is stuck.
+timeout = int(os.getenv("WORKER_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("WORKER_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("WORKER_KEEPALIVE", "5"))
+
+accesslog = "-"
+
+# /metrics: every worker writes its samples to files here, and a scrape of
+# any worker adds them up. Must be set before the app is imported.
+os.environ.setdefault(
+    "PROMETHEUS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "cravebalance-metrics")
+)
+os.makedirs(os.environ["PROMETHEUS_MULTIPROC_DIR"], exist_ok=True)
+
+
+def on_starting(server):
+    # Start from zero: drop the samples of the previous run's workers
+    directory = os.environ["PROMETHEUS_MULTIPROC_DIR"]
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory, exist_ok=True)
+
+
+def post_worker_init(worker):
+    # Replay spools left by a crashed worker now; an idle worker might never
+    # submit a write, which would otherwise be what starts the recovery
+    from services import write_behind
+
+    write_behind.start()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
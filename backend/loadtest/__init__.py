@@ -0,0 +1,12 @@
+"""End-to-end load test: virtual users running the README's user flows.
+
+Usage:
+    python -m loadtest --standins [--users 20] [--duration 60]
+    python -m loadtest --url http://staging:5000 --baseline loadtest/baselines/standins.json
+
+Each virtual user signs up, then runs journeys (solo challenge, invite a
+friend, random match, healthy route, skip) picked by --mix weights until
+--duration is up. The report has p50/p95/p99 per step, error rates, and
+Supabase/OpenAI/Places calls per journey, read from the Server-Timing
+header (TRACING_ENABLED must be on). See README.md, "Load Testing".
+"""
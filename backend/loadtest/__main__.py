@@ -0,0 +1,99 @@
+import argparse
+import json
+import os
+import sys
+
+from loadtest import report, runner
+from loadtest.journeys import DEFAULT_MIX, JOURNEYS
+
+DEFAULT_PORT = 5099
+MAX_ERROR_RATE = 0.01
+
+
+def parse_mix(text: str) -> dict:
+    """"solo=40,match=20" -> {"solo": 40, "match": 20}."""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in JOURNEYS:
+            raise argparse.ArgumentTypeError(f"unknown journey {name!r}; choose from {', '.join(JOURNEYS)}")
+        try:
+            mix[name] = float(weight)
+        except ValueError:
+            raise argparse.ArgumentTypeError(f"bad weight for {name}: {weight!r}") from None
+    if not any(mix.values()):
+        raise argparse.ArgumentTypeError("at least one journey needs a positive weight")
+    return mix
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m loadtest", description="End-to-end load test of the user journeys.")
+    target = parser.add_mutually_exclusive_group()
+    target.add_argument("--url", default=os.getenv("BASE_URL", "http://localhost:5000"), help="server to load (default $BASE_URL or localhost:5000)")
+    target.add_argument("--standins", action="store_true", help="start server.py with STANDINS=all and load that")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT, help="port for --standins")
+    parser.add_argument("--users", type=int, default=20, help="concurrent virtual users")
+    parser.add_argument("--duration", type=float, default=60, help="seconds to start new journeys for")
+    parser.add_argument("--ramp-up", type=float, default=5, help="seconds over which users start")
+    parser.add_argument("--think", type=float, default=0.2, help="mean pause before each request, seconds")
+    parser.add_argument("--mix", type=parse_mix, default=DEFAULT_MIX, help="journey weights, e.g. solo=40,invite=15,match=20,healthy=15,skip=10")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--json", metavar="PATH", help="write the full summary here")
+    parser.add_argument("--baseline", metavar="PATH", help="fail if the run regresses against this summary")
+    parser.add_argument("--save-baseline", metavar="PATH", help="save this run's summary as a baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative regression (default 0.25)")
+    parser.add_argument("--slack-ms", type=float, default=5, help="allowed absolute latency regression (default 5)")
+    args = parser.parse_args(argv)
+
+    config = {
+        "target": "standins" if args.standins else "url",
+        "users": args.users,
+        "duration": args.duration,
+        "think": args.think,
+        "mix": args.mix,
+    }
+    if args.standins:
+        config["standin_latency"] = {
+            name: os.getenv(f"STANDIN_{name.upper()}_LATENCY", "default") for name in ("supabase", "openai", "places")
+        }
+
+    if args.standins:
+        with runner.StandInServer(args.port) as server:
+            recorder = runner.run(server.base_url, args.users, args.duration, args.mix, args.think, args.seed, args.ramp_up)
+    else:
+        recorder = runner.run(args.url, args.users, args.duration, args.mix, args.think, args.seed, args.ramp_up)
+    summary = report.summarize(recorder, config)
+
+    print()
+    print(report.render(summary))
+    for path in (args.json, args.save_baseline):
+        if path:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+            with open(path, "w") as f:
+                json.dump(summary, f, indent=2)
+                f.write("\n")
+            print(f"\nwrote {path}")
+
+    failed = False
+    if summary["error_rate"] > MAX_ERROR_RATE:
+        print(f"\nFAIL: error rate {summary['error_rate']:.2%} is above {MAX_ERROR_RATE:.0%}")
+        failed = True
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        for difference in report.config_differences(summary, baseline):
+            print(f"warning: run settings differ from the baseline, {difference}")
+        regressions = report.compare(summary, baseline, args.tolerance, args.slack_ms)
+        if regressions:
+            print(f"\nFAIL: {len(regressions)} regression(s) against {args.baseline}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            failed = True
+        else:
+            print(f"\nOK: no regressions against {args.baseline}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,80 @@
+"""HTTP client for one virtual user. Times every call and reads Server-Timing."""
+
+import re
+import threading
+import time
+
+import requests
+
+TIMEOUT_SECONDS = 60
+
+# db;dur=12.3;desc="4 calls" -> ("db", "4")
+_SERVER_TIMING = re.compile(r'(\w+);dur=[\d.]+;desc="(\d+) calls?"')
+
+
+class JourneyError(Exception):
+    """A step failed, so the rest of the journey cannot run."""
+
+
+class Recorder:
+    """Collects step and journey samples from every virtual user."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.steps = []  # (step, seconds, status or None, error or None)
+        self.journeys = []  # (journey, seconds, outcome, upstream calls by kind, error or None)
+        self.seconds = 0.0  # wall time from the first user starting to the last finishing
+
+    def step(self, step: str, seconds: float, status, error):
+        with self._lock:
+            self.steps.append((step, seconds, status, error))
+
+    def journey(self, journey: str, seconds: float, outcome: str, upstream: dict, error):
+        with self._lock:
+            self.journeys.append((journey, seconds, outcome, upstream, error))
+
+
+class Client:
+    """One signed-in account. ``call`` raises JourneyError on anything unexpected."""
+
+    def __init__(self, base_url: str, recorder: Recorder | None, rng, think: float):
+        self.base_url = base_url.rstrip("/")
+        self.recorder = recorder
+        self.rng = rng
+        self.think = think
+        self.http = requests.Session()
+        self.token = None
+        self.upstream = {}  # upstream calls by kind since the last take_upstream()
+
+    def call(self, step: str, path: str | None = None, json=None, expect=(200, 201)):
+        """Run *step* ("POST /session/crave"); *path* fills in templated steps."""
+        method, template = step.split(" ", 1)
+        if self.think:
+            time.sleep(self.rng.expovariate(1 / self.think))
+        headers = {"Authorization": f"Bearer {self.token}"} if self.token else {}
+        start = time.perf_counter()
+        try:
+            resp = self.http.request(
+                method, self.base_url + (path or template), json=json, headers=headers, timeout=TIMEOUT_SECONDS
+            )
+        except requests.RequestException as exc:
+            self._record(step, time.perf_counter() - start, None, type(exc).__name__)
+            raise JourneyError(f"{step}: {exc}") from exc
+        elapsed = time.perf_counter() - start
+
+        for kind, calls in _SERVER_TIMING.findall(resp.headers.get("Server-Timing", "")):
+            self.upstream[kind] = self.upstream.get(kind, 0) + int(calls)
+        if resp.status_code not in expect:
+            self._record(step, elapsed, resp.status_code, f"HTTP {resp.status_code}")
+            raise JourneyError(f"{step} returned {resp.status_code}: {resp.text[:200]}")
+        self._record(step, elapsed, resp.status_code, None)
+        body = resp.json()
+        return body.get("data", body) if isinstance(body, dict) else body
+
+    def take_upstream(self) -> dict:
+        upstream, self.upstream = self.upstream, {}
+        return upstream
+
+    def _record(self, step, seconds, status, error):
+        if self.recorder is not None:
+            self.recorder.step(step, seconds, status, error)
@@ -0,0 +1,123 @@
+"""The journeys a virtual user runs, following the paths in README.md's User Flows.
+
+Each journey returns an outcome ("completed", or "unmatched" when a random
+match found no opponent in time) and raises JourneyError when a step fails.
+"""
+
+import time
+
+from loadtest.client import JourneyError
+
+LOCATIONS = [(6.9271, 79.8612), (40.7128, -74.0060), (51.5074, -0.1278), (-33.8688, 151.2093)]
+CRAVINGS = ["pizza", "burger", "ramen", "ice cream", "fries", "donut", "tacos", "cake", "crepe", "sushi"]
+REGENERATE_CHANCE = 0.3
+
+# Every match journey picks the same item, so queued players' calorie
+# estimates fall in range of each other and they can be paired
+MATCH_ITEM = "Pepperoni pizza"
+MATCH_POLL_SECONDS = 1.0
+MATCH_WAIT_SECONDS = 30
+
+
+def _start_session(client, session_type: str, item: str | None = None):
+    """crave (maybe regenerate) -> select -> choose-type. Returns (session_id, choose-type data)."""
+    rng = client.rng
+    lat, lng = rng.choice(LOCATIONS)
+    data = client.call(
+        "POST /session/crave",
+        json={"crave_item": rng.choice(CRAVINGS), "latitude": lat, "longitude": lng},
+    )
+    session_id = data["session_id"]
+    if rng.random() < REGENERATE_CHANCE:
+        data = client.call("POST /session/crave/regenerate", json={"session_id": session_id})
+    option = item or rng.choice(data["options"])["option"]
+    client.call("POST /session/select", json={"session_id": session_id, "selected_option": option})
+    chosen = client.call(
+        "POST /session/choose-type", json={"session_id": session_id, "session_type": session_type}
+    )
+    return session_id, chosen
+
+
+def _play_challenge(client, challenge_id: str):
+    client.call("POST /challenge/start", json={"challenge_id": challenge_id})
+    client.call(
+        "POST /challenge/complete",
+        json={"challenge_id": challenge_id, "completion_percentage": client.rng.choice([50, 75, 100])},
+    )
+
+
+def solo(user) -> str:
+    client = user.me
+    session_id, chosen = _start_session(client, "solo_challenge")
+    challenges = chosen["challenges"]
+    if client.rng.random() < REGENERATE_CHANCE:
+        challenges = client.call("POST /session/challenges/regenerate", json={"session_id": session_id})["challenges"]
+    pick = client.rng.choice(challenges)
+    data = client.call(
+        "POST /challenge/select",
+        json={"session_id": session_id, "challenge_description": pick["description"], "time_limit": pick["time_limit"]},
+    )
+    _play_challenge(client, data["challenge_id"])
+    return "completed"
+
+
+def invite(user) -> str:
+    inviter, friend = user.me, user.friend
+    session_id, chosen = _start_session(inviter, "invite_friend")
+    pick = inviter.rng.choice(chosen["challenges"])
+    invitation = inviter.call(
+        "POST /invite/create",
+        json={"session_id": session_id, "challenge_description": pick["description"], "time_limit": pick["time_limit"]},
+    )
+    token = invitation["invite_token"]
+    friend.call("GET /invite/<token>", path=f"/invite/{token}")
+    accepted = friend.call("POST /invite/respond", json={"invite_token": token, "action": "accept"})
+    inviter.call(
+        "GET /invite/status/<invitation_id>", path=f"/invite/status/{invitation['invitation_id']}"
+    )
+    _play_challenge(inviter, invitation["challenge_id"])
+    _play_challenge(friend, accepted["challenge_id"])
+    return "completed"
+
+
+def match(user) -> str:
+    client = user.me
+    session_id, _ = _start_session(client, "challenge_random", item=MATCH_ITEM)
+    queued = client.call("POST /match/queue", json={"session_id": session_id})
+    if not queued.get("matched"):
+        queue_id = queued["queue_id"]
+        deadline = time.monotonic() + MATCH_WAIT_SECONDS
+        while True:
+            time.sleep(MATCH_POLL_SECONDS)
+            queued = client.call("GET /match/status/<queue_id>", path=f"/match/status/{queue_id}")
+            if queued["status"] == "matched":
+                break
+            if queued["status"] != "waiting":
+                raise JourneyError(f"queue entry ended as {queued['status']}")
+            if time.monotonic() > deadline:
+                client.call("POST /match/cancel", json={"queue_id": queue_id})
+                return "unmatched"
+    _play_challenge(client, queued["challenge_id"])
+    return "completed"
+
+
+def healthy(user) -> str:
+    client = user.me
+    session_id, chosen = _start_session(client, "healthy_route")
+    suggestions = chosen["suggestions"]
+    if client.rng.random() < REGENERATE_CHANCE:
+        suggestions = client.call("POST /session/healthy/regenerate", json={"session_id": session_id})["suggestions"]
+    client.call(
+        "POST /session/healthy/accept",
+        json={"session_id": session_id, "selected_suggestion": client.rng.choice(suggestions)["suggestion"]},
+    )
+    return "completed"
+
+
+def skip(user) -> str:
+    _start_session(user.me, "skip")
+    return "completed"
+
+
+JOURNEYS = {"solo": solo, "invite": invite, "match": match, "healthy": healthy, "skip": skip}
+DEFAULT_MIX = {"solo": 40, "invite": 15, "match": 20, "healthy": 15, "skip": 10}
@@ -0,0 +1,161 @@
+"""Summaries of a run, the printed report, and comparison against a saved baseline."""
+
+import math
+
+# A percentile is only compared when at least this many samples lie above
+# it: p50 needs 10 samples, p95 100, p99 500. Fewer and it is noise.
+MIN_TAIL_SAMPLES = 5
+
+
+def percentile(sorted_values: list, q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(q / 100 * len(sorted_values)) - 1)]
+
+
+def summarize(recorder, config: dict) -> dict:
+    wall_seconds = recorder.seconds
+    steps = {}
+    for step, seconds, _status, error in recorder.steps:
+        entry = steps.setdefault(step, {"times": [], "errors": 0})
+        entry["times"].append(seconds * 1000)
+        entry["errors"] += error is not None
+
+    journeys = {}
+    for name, seconds, outcome, upstream, _error in recorder.journeys:
+        entry = journeys.setdefault(name, {"times": [], "outcomes": {}, "upstream": {}})
+        entry["times"].append(seconds)
+        entry["outcomes"][outcome] = entry["outcomes"].get(outcome, 0) + 1
+        if outcome == "completed":
+            for kind, calls in upstream.items():
+                entry["upstream"][kind] = entry["upstream"].get(kind, 0) + calls
+
+    total_requests = len(recorder.steps)
+    total_errors = sum(s["errors"] for s in steps.values())
+    return {
+        "config": config,
+        "wall_seconds": round(wall_seconds, 1),
+        "requests": total_requests,
+        "requests_per_second": round(total_requests / wall_seconds, 1) if wall_seconds else 0.0,
+        "error_rate": round(total_errors / total_requests, 4) if total_requests else 0.0,
+        "steps": {step: _step_summary(entry) for step, entry in sorted(steps.items())},
+        "journeys": {name: _journey_summary(entry) for name, entry in sorted(journeys.items())},
+        "errors": _top_errors(recorder),
+    }
+
+
+def _step_summary(entry: dict) -> dict:
+    times = sorted(entry["times"])
+    return {
+        "count": len(times),
+        "error_rate": round(entry["errors"] / len(times), 4),
+        "p50_ms": round(percentile(times, 50), 1),
+        "p95_ms": round(percentile(times, 95), 1),
+        "p99_ms": round(percentile(times, 99), 1),
+        "max_ms": round(times[-1], 1),
+    }
+
+
+def _journey_summary(entry: dict) -> dict:
+    times = sorted(entry["times"])
+    completed = entry["outcomes"].get("completed", 0)
+    return {
+        "count": len(times),
+        "outcomes": entry["outcomes"],
+        "failure_rate": round(entry["outcomes"].get("failed", 0) / len(times), 4),
+        "p50_s": round(percentile(times, 50), 2),
+        "p95_s": round(percentile(times, 95), 2),
+        # mean upstream calls per completed journey, by Server-Timing kind (db, llm, places)
+        "upstream_calls": {
+            kind: round(calls / completed, 2) for kind, calls in sorted(entry["upstream"].items())
+        } if completed else {},
+    }
+
+
+def _top_errors(recorder, limit: int = 5) -> list:
+    counts = {}
+    for _name, _seconds, outcome, _upstream, error in recorder.journeys:
+        if outcome == "failed":
+            counts[error] = counts.get(error, 0) + 1
+    return [{"error": e, "count": n} for e, n in sorted(counts.items(), key=lambda kv: -kv[1])[:limit]]
+
+
+def render(summary: dict) -> str:
+    lines = [
+        f"{summary['requests']} requests in {summary['wall_seconds']}s "
+        f"({summary['requests_per_second']} req/s), error rate {summary['error_rate']:.2%}",
+        "",
+        f"{'step':<40}{'count':>7}{'err%':>7}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'max ms':>9}",
+    ]
+    for step, s in summary["steps"].items():
+        lines.append(
+            f"{step:<40}{s['count']:>7}{s['error_rate'] * 100:>7.1f}"
+            f"{s['p50_ms']:>9.1f}{s['p95_ms']:>9.1f}{s['p99_ms']:>9.1f}{s['max_ms']:>9.1f}"
+        )
+    lines += ["", f"{'journey':<10}{'count':>7}{'fail%':>7}{'p50 s':>8}{'p95 s':>8}  outcomes / upstream calls per journey"]
+    for name, j in summary["journeys"].items():
+        outcomes = ", ".join(f"{k} {v}" for k, v in sorted(j["outcomes"].items()))
+        upstream = ", ".join(f"{k} {v}" for k, v in j["upstream_calls"].items()) or "-"
+        lines.append(
+            f"{name:<10}{j['count']:>7}{j['failure_rate'] * 100:>7.1f}{j['p50_s']:>8.2f}{j['p95_s']:>8.2f}"
+            f"  {outcomes} / {upstream}"
+        )
+    if summary["errors"]:
+        lines += ["", "most common failures:"]
+        lines += [f"  {e['count']:>5} x {e['error']}" for e in summary["errors"]]
+    return "\n".join(lines)
+
+
+def compare(summary: dict, baseline: dict, tolerance: float, slack_ms: float) -> list[str]:
+    """Regressions of *summary* against *baseline*; empty when the run passes.
+
+    A percentile regresses when it exceeds the baseline by more than
+    *tolerance* (a fraction) plus *slack_ms*; error rates by more than one
+    percentage point; upstream calls per journey by more than *tolerance*
+    plus half a call. Tail percentiles of rare steps are skipped (see
+    MIN_TAIL_SAMPLES).
+    """
+    regressions = []
+    for step, base in baseline.get("steps", {}).items():
+        current = summary["steps"].get(step)
+        if current is None:
+            continue
+        count = min(current["count"], base["count"])
+        for q in (50, 95, 99):
+            if count * (100 - q) / 100 < MIN_TAIL_SAMPLES:
+                continue
+            key = f"p{q}_ms"
+            limit = base[key] * (1 + tolerance) + slack_ms
+            if current[key] > limit:
+                regressions.append(f"{step} {key}: {current[key]:.1f} > {limit:.1f} (baseline {base[key]:.1f})")
+        if count >= 2 * MIN_TAIL_SAMPLES and current["error_rate"] > base["error_rate"] + 0.01:
+            regressions.append(
+                f"{step} error rate: {current['error_rate']:.2%} (baseline {base['error_rate']:.2%})"
+            )
+
+    for name, base in baseline.get("journeys", {}).items():
+        current = summary["journeys"].get(name)
+        if current is None:
+            continue
+        if current["failure_rate"] > base["failure_rate"] + 0.01:
+            regressions.append(
+                f"{name} journey failure rate: {current['failure_rate']:.2%} (baseline {base['failure_rate']:.2%})"
+            )
+        for kind, calls in base["upstream_calls"].items():
+            limit = calls * (1 + tolerance) + 0.5
+            if current["upstream_calls"].get(kind, 0) > limit:
+                regressions.append(
+                    f"{name} journey {kind} calls: {current['upstream_calls'][kind]} > {limit:.1f} (baseline {calls})"
+                )
+    return regressions
+
+
+def config_differences(summary: dict, baseline: dict) -> list[str]:
+    """Settings that differ from the baseline run, which make the comparison less meaningful."""
+    base = baseline.get("config", {})
+    return [
+        f"{key}: {base.get(key)!r} in baseline, {value!r} now"
+        for key, value in summary["config"].items()
+        if base.get(key) != value
+    ]
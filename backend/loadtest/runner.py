@@ -0,0 +1,135 @@
+"""Virtual users, the run loop, and starting a stand-in server to run against."""
+
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+import requests
+
+from loadtest.client import Client, JourneyError, Recorder
+from loadtest.journeys import JOURNEYS
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PASSWORD = "loadtest-password"
+SERVER_START_TIMEOUT_SECONDS = 60
+DRAIN_TIMEOUT_SECONDS = 120  # how long journeys still running at the deadline get to finish
+
+
+class VirtualUser:
+    """Two accounts: its own, and the friend it invites."""
+
+    def __init__(self, base_url: str, recorder: Recorder, run_id: str, index: int, seed: int, think: float):
+        self.rng = random.Random(seed * 100003 + index)
+        self.me = Client(base_url, recorder, self.rng, think)
+        self.friend = Client(base_url, recorder, self.rng, think)
+        for client, role in ((self.me, "a"), (self.friend, "b")):
+            _sign_in(client, f"loadtest-{run_id}-{index}{role}@example.com", f"Load {index}{role}")
+
+    def run(self, mix: dict, recorder: Recorder, deadline: float):
+        names, weights = list(mix), list(mix.values())
+        while time.monotonic() < deadline:
+            name = self.rng.choices(names, weights)[0]
+            start = time.perf_counter()
+            outcome, error = "failed", None
+            try:
+                outcome = JOURNEYS[name](self)
+            except JourneyError as exc:
+                error = str(exc)
+            except (KeyError, TypeError, ValueError) as exc:  # response missing a field we need
+                error = f"unexpected response: {exc!r}"
+            upstream = self.me.take_upstream()
+            for kind, calls in self.friend.take_upstream().items():
+                upstream[kind] = upstream.get(kind, 0) + calls
+            recorder.journey(name, time.perf_counter() - start, outcome, upstream, error)
+
+
+def _sign_in(client: Client, email: str, name: str):
+    """Sign up (not timed), falling back to login when email confirmation is on."""
+    setup = Client(client.base_url, None, client.rng, 0)
+    data = setup.call("POST /auth/signup", json={"email": email, "password": PASSWORD, "name": name})
+    session = data.get("session") or setup.call(
+        "POST /auth/login", json={"email": email, "password": PASSWORD}
+    ).get("session")
+    if not session:
+        raise RuntimeError(f"could not sign in {email}; turn off email confirmation")
+    setup.token = session["access_token"]
+    setup.call("PUT /user/profile", json={"age": client.rng.randint(18, 65), "weight": client.rng.randint(50, 110)})
+    client.token = setup.token
+
+
+def run(base_url: str, users: int, duration: float, mix: dict, think: float, seed: int, ramp_up: float) -> Recorder:
+    """Sign up *users* virtual users, run them for *duration* seconds, return the samples."""
+    recorder = Recorder()
+    run_id = uuid.uuid4().hex[:8]
+    print(f"signing up {users * 2} accounts...")
+    vus = [VirtualUser(base_url, recorder, run_id, i, seed, think) for i in range(users)]
+
+    started = time.monotonic()
+    deadline = started + ramp_up + duration
+    threads = []
+    for i, vu in enumerate(vus):
+        thread = threading.Thread(target=_start_after, args=(ramp_up * i / users, vu, mix, recorder, deadline), daemon=True)
+        thread.start()
+        threads.append(thread)
+    print(f"running {users} virtual users for {duration:.0f}s (+{ramp_up:.0f}s ramp-up)...")
+    drain_until = deadline + DRAIN_TIMEOUT_SECONDS
+    for thread in threads:
+        thread.join(max(0.0, drain_until - time.monotonic()))
+    recorder.seconds = time.monotonic() - started
+    return recorder
+
+
+def _start_after(delay: float, vu: VirtualUser, mix: dict, recorder: Recorder, deadline: float):
+    time.sleep(delay)
+    vu.run(mix, recorder, deadline)
+
+
+class StandInServer:
+    """``python server.py`` with STANDINS=all and one worker, for the length of a ``with`` block."""
+
+    def __init__(self, port: int):
+        self.base_url = f"http://127.0.0.1:{port}"
+        self.port = port
+        self.process = None
+        self.log = None
+
+    def __enter__(self):
+        # The stand-in has no OpenAI rate limit to stay under, and virtual users call the LLM
+        # far more often than people do. Admission control still caps concurrency.
+        env = {
+            "LLM_RATE_PER_SECOND": "1000",
+            "LLM_BURST": "1000",
+            "LLM_USER_RATE_PER_MINUTE": "6000",
+            "LLM_USER_BURST": "1000",
+            **os.environ,
+        }
+        env.update(STANDINS="all", WEB_CONCURRENCY="1", BIND=f"127.0.0.1:{self.port}", TRACING_ENABLED="1")
+        self.log = tempfile.NamedTemporaryFile(prefix="loadtest-server-", suffix=".log", delete=False)
+        self.process = subprocess.Popen(
+            [sys.executable, "server.py"], cwd=BACKEND_DIR, env=env, stdout=self.log, stderr=subprocess.STDOUT
+        )
+        give_up = time.monotonic() + SERVER_START_TIMEOUT_SECONDS
+        while time.monotonic() < give_up:
+            if self.process.poll() is not None:
+                break
+            try:
+                if requests.get(f"{self.base_url}/health", timeout=1).ok:
+                    return self
+            except requests.RequestException:
+                pass
+            time.sleep(0.2)
+        self.__exit__(None, None, None)
+        raise RuntimeError(f"stand-in server did not start; see {self.log.name}")
+
+    def __exit__(self, *exc_info):
+        self.process.terminate()
+        try:
+            self.process.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            self.process.kill()
+        self.log.close()
@@ -0,0 +1,176 @@
+import hashlib
+import logging
+import time
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+
+from config import (
+    IDEMPOTENCY_CLAIM_SECONDS,
+    IDEMPOTENCY_MAX_ENTRIES,
+    IDEMPOTENCY_TTL_SECONDS,
+    IDEMPOTENCY_WAIT_SECONDS,
+    get_supabase_client,
+)
+from services.cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+HEADER = "Idempotency-Key"
+MAX_KEY_LENGTH = 255
+TABLE = "idempotency_keys"
+
+# Conflicts and rate limits are worth retrying with the same key; 5xx are never stored
+_NOT_STORED = {409, 429}
+
+# How often a duplicate re-reads a claim that is still running; doubles up to the max
+_POLL_SECONDS = 0.05
+_MAX_POLL_SECONDS = 1.0
+
+# (user_id, key) -> finished row from TABLE. A stored response never changes,
+# so this worker can keep a copy and skip the database on repeated retries.
+_responses = TTLCache(
+    maxsize=IDEMPOTENCY_MAX_ENTRIES, default_ttl=IDEMPOTENCY_TTL_SECONDS, name="idempotency"
+)
+
+
+def idempotent(f):
+    """Decorator that replays the first response for a repeated Idempotency-Key.
+
+    Requests without the header run as before. Keys are scoped to
+    ``g.user_id``, so apply it below ``require_auth``. Claims and responses
+    live in the idempotency_keys table, shared by every worker. A duplicate
+    that arrives while the first request is still running waits for it, up
+    to IDEMPOTENCY_WAIT_SECONDS.
+    """
+
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return f(*args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({"error": f"{HEADER} must be 1 to {MAX_KEY_LENGTH} characters."}), 400
+
+        scope = (g.user_id, key)
+        fingerprint = _fingerprint()
+        deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+        delay = _POLL_SECONDS
+        try:
+            supabase = get_supabase_client()
+            while True:
+                row = _claim(supabase, scope, fingerprint)
+                if row is None:
+                    break
+                if row["fingerprint"] != fingerprint:
+                    return _mismatch()
+                if row["status"] is not None:
+                    return _replay(row)
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    response = jsonify({"error": f"A request with this {HEADER} is still in progress."})
+                    response.headers["Retry-After"] = "1"
+                    return response, 409
+                time.sleep(min(delay, remaining))
+                delay = min(delay * 2, _MAX_POLL_SECONDS)
+        except Exception as exc:
+            return jsonify({"error": str(exc)}), 500
+
+        stored = False
+        try:
+            response = current_app.make_response(f(*args, **kwargs))
+            if not response.is_streamed and response.status_code < 500 and response.status_code not in _NOT_STORED:
+                stored = _store(supabase, scope, response)
+            return response
+        finally:
+            if not stored:
+                _release(supabase, scope)
+
+    return decorated
+
+
+def _claim(supabase, scope: tuple, fingerprint: str) -> dict | None:
+    """Claim *scope* for this request and return None, or return the row that holds it."""
+    row = _responses.get(scope)
+    if row is not None:
+        return row
+    user_id, key = scope
+    while True:
+        inserted = (
+            supabase.table(TABLE)
+            .upsert(
+                {"user_id": user_id, "key": key, "fingerprint": fingerprint},
+                on_conflict="user_id,key",
+                ignore_duplicates=True,
+            )
+            .execute()
+        )
+        if inserted.data:
+            return None
+        resp = (
+            supabase.table(TABLE)
+            .select("id, fingerprint, status, headers, body, created_at")
+            .eq("user_id", user_id)
+            .eq("key", key)
+            .execute()
+        )
+        if not resp.data:
+            continue  # released between the insert and the select
+        row = resp.data[0]
+        age = _age(row)
+        finished = row["status"] is not None
+        if age < (IDEMPOTENCY_TTL_SECONDS if finished else IDEMPOTENCY_CLAIM_SECONDS):
+            if finished:
+                _responses.set(scope, row, ttl=IDEMPOTENCY_TTL_SECONDS - age)
+            return row
+        # Expired, or claimed by a request whose worker died: replace it
+        supabase.table(TABLE).delete().eq("id", row["id"]).execute()
+
+
+def _store(supabase, scope: tuple, response) -> bool:
+    """Save *response* as the one to replay for *scope*; False if that failed."""
+    headers = [[k, v] for k, v in response.headers.items() if k != "Content-Length"]
+    fields = {"status": response.status_code, "headers": headers, "body": response.get_data(as_text=True)}
+    user_id, key = scope
+    try:
+        resp = supabase.table(TABLE).update(fields).eq("user_id", user_id).eq("key", key).execute()
+    except Exception:
+        logger.exception("Could not store the response for %s %s", HEADER, key)
+        return False
+    if resp.data:
+        _responses.set(scope, resp.data[0])
+    return True
+
+
+def _release(supabase, scope: tuple):
+    """Drop the claim on *scope*, so a retry runs the request again."""
+    user_id, key = scope
+    try:
+        supabase.table(TABLE).delete().eq("user_id", user_id).eq("key", key).execute()
+    except Exception:
+        # The claim expires after IDEMPOTENCY_CLAIM_SECONDS instead
+        logger.exception("Could not release %s %s", HEADER, key)
+
+
+def _age(row: dict) -> float:
+    created_at = datetime.fromisoformat(row["created_at"])
+    return (datetime.now(timezone.utc) - created_at).total_seconds()
+
+
+def _fingerprint() -> str:
+    """Identifies the request a key was first used for, so a reused key is caught."""
+    digest = hashlib.sha256(f"{request.method} {request.path}\n".encode())
+    digest.update(request.get_data())  # cached, so get_json() still works afterwards
+    return digest.hexdigest()
+
+
+def _replay(row: dict):
+    headers = [tuple(header) for header in row["headers"]]
+    response = current_app.response_class(row["body"], status=row["status"], headers=headers)
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _mismatch():
+    return jsonify({"error": f"This {HEADER} was already used for a different request."}), 422
@@ -0,0 +1,102 @@
+-- ============================================================
+-- Transactional invite response
+-- Run this in Supabase SQL Editor after 003_add_healthy_route.sql
+-- ============================================================
+
+-- Accepts or declines an invitation in a single call. The invitation row is
+-- locked with FOR UPDATE, so concurrent accepts of the same token serialise:
+-- the first one wins and the rest see a non-pending status.
+--
+-- Returns a JSON object. On failure it has an "error" key:
+--   not_found | expired | not_pending (with "status") | self_invite
+CREATE OR REPLACE FUNCTION public.respond_to_invitation(
+    p_invite_token TEXT,
+    p_user_id UUID,
+    p_action TEXT,
+    p_challenge_expiry_hours INTEGER DEFAULT 24
+)
+RETURNS JSONB AS $$
+DECLARE
+    inv invitations%ROWTYPE;
+    src sessions%ROWTYPE;
+    new_session_id UUID;
+    new_challenge_id UUID;
+    challenge_expiry TIMESTAMPTZ;
+BEGIN
+    SELECT * INTO inv
+    FROM invitations
+    WHERE invite_token = p_invite_token
+    FOR UPDATE;
+
+    IF NOT FOUND THEN
+        RETURN jsonb_build_object('error', 'not_found');
+    END IF;
+
+    IF now() > inv.expiry_time THEN
+        IF inv.status = 'pending' THEN
+            UPDATE invitations SET status = 'expired'
+            WHERE invitation_id = inv.invitation_id;
+        END IF;
+        RETURN jsonb_build_object('error', 'expired');
+    END IF;
+
+    IF inv.status <> 'pending' THEN
+        RETURN jsonb_build_object('error', 'not_pending', 'status', inv.status);
+    END IF;
+
+    IF inv.inviter_user_id = p_user_id THEN
+        RETURN jsonb_build_object('error', 'self_invite');
+    END IF;
+
+    IF p_action = 'decline' THEN
+        UPDATE invitations SET status = 'declined'
+        WHERE invitation_id = inv.invitation_id;
+        RETURN jsonb_build_object(
+            'invitation_id', inv.invitation_id,
+            'status', 'declined'
+        );
+    END IF;
+
+    -- Accept: copy the inviter's craving into a session for the invitee
+    SELECT * INTO src FROM sessions WHERE session_id = inv.session_id;
+
+    INSERT INTO sessions (user_id, crave_item, calories, session_type)
+    VALUES (p_user_id, COALESCE(src.crave_item, ''), src.calories, 'invite_friend')
+    RETURNING session_id INTO new_session_id;
+
+    challenge_expiry := now() + make_interval(hours => p_challenge_expiry_hours);
+
+    INSERT INTO challenges (session_id, challenge, time_limit, expiry_time, status)
+    VALUES (
+        new_session_id,
+        inv.challenge_description,
+        inv.challenge_time_limit,
+        challenge_expiry,
+        'pending'
+    )
+    RETURNING challenge_id INTO new_challenge_id;
+
+    UPDATE invitations
+    SET invitee_user_id = p_user_id,
+        invitee_session_id = new_session_id,
+        status = 'accepted'
+    WHERE invitation_id = inv.invitation_id;
+
+    RETURN jsonb_build_object(
+        'invitation_id', inv.invitation_id,
+        'session_id', new_session_id,
+        'challenge_id', new_challenge_id,
+        'challenge', inv.challenge_description,
+        'time_limit', inv.challenge_time_limit,
+        'expiry_time', challenge_expiry
+    );
+END;
+$$ LANGUAGE plpgsql SECURITY DEFINER;
+
+-- It acts as whichever p_user_id it is given, so callers holding the anon
+-- key must not reach it through PostgREST. Only the backend's service role
+-- (SUPABASE_SERVICE_ROLE_KEY) may execute it.
+REVOKE EXECUTE ON FUNCTION public.respond_to_invitation(TEXT, UUID, TEXT, INTEGER)
+    FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.respond_to_invitation(TEXT, UUID, TEXT, INTEGER)
+    TO service_role;
@@ -0,0 +1,10 @@
+-- ============================================================
+-- Keyset pagination index for session history
+-- Run this in Supabase SQL Editor after 004_respond_to_invitation_rpc.sql
+-- ============================================================
+
+-- GET /user/history pages through a user's sessions ordered by
+-- (created_at DESC, session_id DESC); this index serves both the filter
+-- and the sort so each page is an index range scan.
+CREATE INDEX IF NOT EXISTS idx_sessions_user_created
+    ON sessions(user_id, created_at DESC, session_id DESC);
@@ -0,0 +1,135 @@
+-- ============================================================
+-- Per-user stats and streaks, maintained on write
+-- Run this in Supabase SQL Editor after 005_history_keyset_index.sql
+-- ============================================================
+
+-- 1. Aggregate table: one row per user
+CREATE TABLE IF NOT EXISTS user_stats (
+    user_id UUID PRIMARY KEY REFERENCES profiles(user_id) ON DELETE CASCADE,
+    total_sessions INTEGER NOT NULL DEFAULT 0,
+    sessions_by_type JSONB NOT NULL DEFAULT '{}'::jsonb,
+    rating_sum INTEGER NOT NULL DEFAULT 0,
+    rating_count INTEGER NOT NULL DEFAULT 0,
+    current_streak INTEGER NOT NULL DEFAULT 0,   -- consecutive active days ending on last_active_date
+    best_streak INTEGER NOT NULL DEFAULT 0,
+    last_active_date DATE,
+    total_calories_offset INTEGER NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+ALTER TABLE user_stats ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own stats"
+    ON user_stats FOR SELECT
+    USING (auth.uid() = user_id);
+
+-- 2. Record one finished session (challenge completed, healthy choice
+--    accepted or craving skipped) in a single upsert
+CREATE OR REPLACE FUNCTION public.record_session_outcome(
+    p_user_id UUID,
+    p_session_type TEXT,
+    p_rating INTEGER DEFAULT NULL,
+    p_calories_offset INTEGER DEFAULT 0
+)
+RETURNS user_stats AS $$
+    INSERT INTO user_stats AS s (
+        user_id, total_sessions, sessions_by_type, rating_sum, rating_count,
+        current_streak, best_streak, last_active_date, total_calories_offset
+    )
+    VALUES (
+        p_user_id, 1, jsonb_build_object(p_session_type, 1),
+        COALESCE(p_rating, 0), (p_rating IS NOT NULL)::int,
+        1, 1, current_date, COALESCE(p_calories_offset, 0)
+    )
+    ON CONFLICT (user_id) DO UPDATE SET
+        total_sessions = s.total_sessions + 1,
+        sessions_by_type = s.sessions_by_type || jsonb_build_object(
+            p_session_type,
+            COALESCE((s.sessions_by_type ->> p_session_type)::int, 0) + 1
+        ),
+        rating_sum = s.rating_sum + COALESCE(p_rating, 0),
+        rating_count = s.rating_count + (p_rating IS NOT NULL)::int,
+        current_streak = CASE
+            WHEN s.last_active_date = current_date THEN s.current_streak
+            WHEN s.last_active_date = current_date - 1 THEN s.current_streak + 1
+            ELSE 1
+        END,
+        best_streak = GREATEST(s.best_streak, CASE
+            WHEN s.last_active_date = current_date THEN s.current_streak
+            WHEN s.last_active_date = current_date - 1 THEN s.current_streak + 1
+            ELSE 1
+        END),
+        last_active_date = current_date,
+        total_calories_offset = s.total_calories_offset + COALESCE(p_calories_offset, 0),
+        updated_at = now()
+    RETURNING *;
+$$ LANGUAGE sql SECURITY DEFINER;
+
+-- It writes whichever p_user_id it is given, so only the backend's service
+-- role (SUPABASE_SERVICE_ROLE_KEY) may execute it, not anon-key callers.
+REVOKE EXECUTE ON FUNCTION public.record_session_outcome(UUID, TEXT, INTEGER, INTEGER)
+    FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.record_session_outcome(UUID, TEXT, INTEGER, INTEGER)
+    TO service_role;
+
+-- 3. Backfill from existing sessions. A session counts once it has a
+--    rating (challenge completed / healthy choice accepted) or was skipped.
+--    Calories offset is approximated: skip = full calories, challenge =
+--    calories scaled by rating; healthy substitutes are not recoverable.
+WITH outcomes AS (
+    SELECT user_id, session_type, rating, calories, created_at::date AS day
+    FROM sessions
+    WHERE rating IS NOT NULL OR session_type = 'skip'
+),
+by_type AS (
+    SELECT user_id, jsonb_object_agg(session_type, n) AS types
+    FROM (
+        SELECT user_id, COALESCE(session_type, 'unknown') AS session_type, count(*) AS n
+        FROM outcomes
+        GROUP BY 1, 2
+    ) t
+    GROUP BY user_id
+),
+days AS (
+    SELECT DISTINCT user_id, day FROM outcomes
+),
+runs AS (
+    SELECT user_id, count(*) AS len, max(day) AS last_day
+    FROM (
+        SELECT user_id, day,
+               day - (row_number() OVER (PARTITION BY user_id ORDER BY day))::int AS grp
+        FROM days
+    ) islands
+    GROUP BY user_id, grp
+),
+streaks AS (
+    SELECT DISTINCT ON (user_id)
+           user_id, len AS current_streak, last_day,
+           max(len) OVER (PARTITION BY user_id) AS best_streak
+    FROM runs
+    ORDER BY user_id, last_day DESC
+),
+totals AS (
+    SELECT user_id,
+           count(*) AS total_sessions,
+           COALESCE(sum(rating), 0) AS rating_sum,
+           count(rating) AS rating_count,
+           COALESCE(sum(CASE
+               WHEN session_type = 'skip' THEN COALESCE(calories, 0)
+               WHEN session_type IN ('solo_challenge', 'invite_friend', 'challenge_random')
+                   THEN COALESCE(calories, 0) * rating / 10
+               ELSE 0
+           END), 0) AS total_calories_offset
+    FROM outcomes
+    GROUP BY user_id
+)
+INSERT INTO user_stats (
+    user_id, total_sessions, sessions_by_type, rating_sum, rating_count,
+    current_streak, best_streak, last_active_date, total_calories_offset
+)
+SELECT t.user_id, t.total_sessions, b.types, t.rating_sum, t.rating_count,
+       s.current_streak, s.best_streak, s.last_day, t.total_calories_offset
+FROM totals t
+JOIN by_type b USING (user_id)
+JOIN streaks s USING (user_id)
+ON CONFLICT (user_id) DO NOTHING;
@@ -0,0 +1,37 @@
+-- ============================================================
+-- Single-statement preference increments
+-- Run this in Supabase SQL Editor after 006_user_stats.sql
+-- ============================================================
+
+-- Adds order_count to each (user_id, category, item) row, creating rows that
+-- do not exist yet, in one INSERT ... ON CONFLICT. Takes a JSON array so a
+-- whole batch of increments can be flushed in one call:
+--   [{"user_id": "...", "category": "crepe", "item": "Nutella crepe",
+--     "order_count": 2, "last_ordered": "2026-01-01T12:00:00+00:00"}, ...]
+-- Duplicate keys within a batch are summed first, since ON CONFLICT cannot
+-- touch the same row twice in one statement.
+-- Returns one row per key, with inserted = true for rows that did not exist
+-- yet (xmax is 0 only for a freshly inserted tuple). The backend counts
+-- those as new distinct items for personalization.
+DROP FUNCTION IF EXISTS public.increment_preferences(JSONB);
+CREATE FUNCTION public.increment_preferences(p_rows JSONB)
+RETURNS TABLE (user_id UUID, category TEXT, item TEXT, inserted BOOLEAN) AS $$
+    INSERT INTO user_preferences AS p (user_id, category, item, order_count, last_ordered)
+    SELECT r.user_id, r.category, r.item,
+           sum(COALESCE(r.order_count, 1)),
+           max(COALESCE(r.last_ordered, now()))
+    FROM jsonb_to_recordset(p_rows) AS r(
+        user_id UUID, category TEXT, item TEXT, order_count INTEGER, last_ordered TIMESTAMPTZ
+    )
+    GROUP BY r.user_id, r.category, r.item
+    ON CONFLICT (user_id, category, item) DO UPDATE SET
+        order_count = p.order_count + EXCLUDED.order_count,
+        last_ordered = GREATEST(p.last_ordered, EXCLUDED.last_ordered)
+    RETURNING p.user_id, p.category, p.item, (p.xmax = 0);
+$$ LANGUAGE sql SECURITY DEFINER;
+
+-- It writes rows for whichever user_id each element names, so only the
+-- backend's service role (SUPABASE_SERVICE_ROLE_KEY) may execute it.
+REVOKE EXECUTE ON FUNCTION public.increment_preferences(JSONB)
+    FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.increment_preferences(JSONB) TO service_role;
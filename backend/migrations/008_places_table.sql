@@ -0,0 +1,104 @@
+-- ============================================================
+-- Normalize sessions.location_options
+-- Run this in Supabase SQL Editor after 007_increment_preferences_rpc.sql
+-- ============================================================
+
+-- 1. Places are stored once, keyed by Google place_id, and shared between
+--    sessions instead of being copied into every row
+CREATE TABLE IF NOT EXISTS places (
+    place_id TEXT PRIMARY KEY,
+    name TEXT NOT NULL DEFAULT '',
+    address TEXT NOT NULL DEFAULT '',
+    rating NUMERIC(2, 1) NOT NULL DEFAULT 0,
+    updated_at TIMESTAMPTZ DEFAULT now()
+);
+
+ALTER TABLE places ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Anyone can view places"
+    ON places FOR SELECT
+    USING (true);
+
+-- 2. Narrow columns replacing the location_options blob
+ALTER TABLE sessions
+    ADD COLUMN IF NOT EXISTS place_ids TEXT[],
+    ADD COLUMN IF NOT EXISTS craving_options JSONB,
+    ADD COLUMN IF NOT EXISTS healthy_suggestions JSONB,
+    ADD COLUMN IF NOT EXISTS healthy_excluded TEXT[] NOT NULL DEFAULT '{}',
+    ADD COLUMN IF NOT EXISTS crave_regenerations SMALLINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS challenge_regenerations SMALLINT NOT NULL DEFAULT 0,
+    ADD COLUMN IF NOT EXISTS healthy_regenerations SMALLINT NOT NULL DEFAULT 0;
+
+-- 3. Upsert a Places API result list in one statement. Takes the JSON array
+--    the app already builds: [{"place_id", "name", "address", "rating"}, ...]
+CREATE OR REPLACE FUNCTION public.upsert_places(p_places JSONB)
+RETURNS void AS $$
+    INSERT INTO places AS p (place_id, name, address, rating, updated_at)
+    SELECT DISTINCT ON (r.place_id)
+           r.place_id, COALESCE(r.name, ''), COALESCE(r.address, ''), COALESCE(r.rating, 0), now()
+    FROM jsonb_to_recordset(p_places) AS r(place_id TEXT, name TEXT, address TEXT, rating NUMERIC)
+    WHERE COALESCE(r.place_id, '') <> ''
+    ON CONFLICT (place_id) DO UPDATE
+        SET name = EXCLUDED.name,
+            address = EXCLUDED.address,
+            rating = EXCLUDED.rating,
+            updated_at = EXCLUDED.updated_at
+        WHERE (p.name, p.address, p.rating) IS DISTINCT FROM (EXCLUDED.name, EXCLUDED.address, EXCLUDED.rating);
+$$ LANGUAGE sql SECURITY DEFINER;
+
+-- 4. Convert existing rows, p_batch_size at a time. Returns how many rows
+--    were converted; call it until it returns 0
+--    (scripts/convert_location_options.py does this). Each call is its own
+--    short transaction that locks only its batch, so the app keeps running.
+CREATE OR REPLACE FUNCTION public.convert_location_options(p_batch_size INTEGER DEFAULT 500)
+RETURNS INTEGER AS $$
+    WITH batch AS (
+        SELECT session_id, location_options AS lo
+        FROM sessions
+        WHERE location_options IS NOT NULL
+        ORDER BY session_id
+        LIMIT p_batch_size
+        FOR UPDATE SKIP LOCKED
+    ),
+    saved_places AS (
+        SELECT public.upsert_places(COALESCE(jsonb_agg(place), '[]'::jsonb))
+        FROM batch, jsonb_array_elements(COALESCE(batch.lo->'places', '[]'::jsonb)) AS place
+    ),
+    converted AS (
+        UPDATE sessions s
+        SET place_ids = ARRAY(
+                SELECT e.place->>'place_id'
+                FROM jsonb_array_elements(COALESCE(b.lo->'places', '[]'::jsonb))
+                     WITH ORDINALITY AS e(place, n)
+                WHERE COALESCE(e.place->>'place_id', '') <> ''
+                ORDER BY e.n
+            ),
+            craving_options = b.lo->'options',
+            healthy_suggestions = b.lo->'healthy_suggestions',
+            healthy_excluded = ARRAY(
+                SELECT jsonb_array_elements_text(COALESCE(b.lo->'healthy_excluded', '[]'::jsonb))
+            ),
+            crave_regenerations = COALESCE((b.lo->>'crave_regenerations')::SMALLINT, 0),
+            challenge_regenerations = COALESCE((b.lo->>'challenge_regenerations')::SMALLINT, 0),
+            healthy_regenerations = COALESCE((b.lo->>'healthy_regenerations')::SMALLINT, 0),
+            location_options = NULL
+        FROM batch b
+        WHERE s.session_id = b.session_id
+        RETURNING 1
+    )
+    SELECT (SELECT count(*) FROM converted)::INTEGER
+    FROM saved_places;
+$$ LANGUAGE sql SECURITY DEFINER;
+
+-- 5. Clients holding the anon key must not rewrite the shared places table
+--    or run the conversion, so only the backend's service role
+--    (SUPABASE_SERVICE_ROLE_KEY) may execute these.
+REVOKE EXECUTE ON FUNCTION public.upsert_places(JSONB) FROM PUBLIC, anon, authenticated;
+REVOKE EXECUTE ON FUNCTION public.convert_location_options(INTEGER) FROM PUBLIC, anon, authenticated;
+GRANT EXECUTE ON FUNCTION public.upsert_places(JSONB) TO service_role;
+GRANT EXECUTE ON FUNCTION public.convert_location_options(INTEGER) TO service_role;
+
+-- Once convert_location_options() returns 0, set
+-- LOCATION_OPTIONS_CONVERSION_ENABLED=0 and restart the backend, which stops
+-- it selecting the old column. Only then can the column be dropped:
+--   ALTER TABLE sessions DROP COLUMN location_options;
@@ -0,0 +1,22 @@
+-- ============================================================
+-- Candidate pools for the regenerate endpoints
+-- Run this in Supabase SQL Editor after 008_places_table.sql
+-- ============================================================
+
+-- Options generated up front but not shown yet. The regenerate endpoints
+-- take their next page from here instead of calling the LLM again.
+ALTER TABLE sessions
+    ADD COLUMN IF NOT EXISTS crave_candidates JSONB,
+    ADD COLUMN IF NOT EXISTS challenge_candidates JSONB,
+    ADD COLUMN IF NOT EXISTS healthy_candidates JSONB;
+
+-- Whether the craving pool was generated with the user's order history,
+-- so pages served from it report what they were made with.
+ALTER TABLE sessions
+    ADD COLUMN IF NOT EXISTS crave_personalized BOOLEAN;
+
+-- Items already shown, which a fallback LLM call is told to avoid
+-- (healthy suggestions use healthy_excluded from migration 8).
+ALTER TABLE sessions
+    ADD COLUMN IF NOT EXISTS crave_excluded TEXT[] NOT NULL DEFAULT '{}',
+    ADD COLUMN IF NOT EXISTS challenge_excluded TEXT[] NOT NULL DEFAULT '{}';
@@ -0,0 +1,43 @@
+-- ============================================================
+-- Shared store for Idempotency-Key responses
+-- Run this in Supabase SQL Editor after 009_candidate_pools.sql
+-- ============================================================
+
+-- One row per (user, key). The first request inserts it with a NULL
+-- status to claim the key, and fills in the response when it finishes.
+-- Every worker sees the same rows, so a retry is replayed whichever
+-- worker it reaches.
+CREATE TABLE IF NOT EXISTS idempotency_keys (
+    id UUID PRIMARY KEY DEFAULT gen_random_uuid(),
+    user_id UUID NOT NULL REFERENCES profiles(user_id) ON DELETE CASCADE,
+    key TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    status SMALLINT,
+    headers JSONB,
+    body TEXT,
+    created_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+    UNIQUE (user_id, key)
+);
+
+ALTER TABLE idempotency_keys ENABLE ROW LEVEL SECURITY;
+
+CREATE POLICY "Users can view own idempotency keys"
+    ON idempotency_keys FOR SELECT
+    USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can insert own idempotency keys"
+    ON idempotency_keys FOR INSERT
+    WITH CHECK (auth.uid() = user_id);
+
+CREATE POLICY "Users can update own idempotency keys"
+    ON idempotency_keys FOR UPDATE
+    USING (auth.uid() = user_id);
+
+CREATE POLICY "Users can delete own idempotency keys"
+    ON idempotency_keys FOR DELETE
+    USING (auth.uid() = user_id);
+
+-- Rows older than IDEMPOTENCY_TTL_SECONDS are ignored and replaced on use.
+-- Delete them periodically to keep the table small, e.g.
+--   DELETE FROM idempotency_keys WHERE created_at < now() - interval '1 day';
+CREATE INDEX IF NOT EXISTS idx_idempotency_keys_created_at ON idempotency_keys(created_at);
@@ -5,7 +5,16 @@ from flask import Blueprint, g, jsonify, request
 
 from config import get_supabase_client
 from middleware.auth_middleware import require_auth
+from middleware.idempotency import idempotent
 from models.enums import ChallengeStatus
+from services import (
+    data_access,
+    leaderboard,
+    preference_service,
+    rank_service,
+    stats_service,
+    write_behind,
+)
 
 challenge_bp = Blueprint("challenge", __name__)
 
@@ -14,6 +23,7 @@ CHALLENGE_EXPIRY_HOURS = 24
 
 @challenge_bp.route("/select", methods=["POST"])
 @require_auth
+@idempotent
 def select_challenge():
     """Pick a challenge from the generated options
     ---
@@ -22,6 +32,11 @@ def select_challenge():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -104,6 +119,7 @@ def select_challenge():
 
 @challenge_bp.route("/start", methods=["POST"])
 @require_auth
+@idempotent
 def start_challenge():
     """Start a pending challenge
     ---
@@ -112,6 +128,11 @@ def start_challenge():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -184,6 +205,7 @@ def start_challenge():
 
 @challenge_bp.route("/complete", methods=["POST"])
 @require_auth
+@idempotent
 def complete_challenge():
     """Report challenge completion and receive rating/points
     ---
@@ -192,6 +214,11 @@ def complete_challenge():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -233,7 +260,7 @@ def complete_challenge():
         # Fetch challenge with session data
         ch_resp = (
             supabase.table("challenges")
-            .select("*, sessions(session_id, user_id, calories, crave_item)")
+            .select("*, sessions(session_id, user_id, calories, crave_item, session_type)")
             .eq("challenge_id", challenge_id)
             .execute()
         )
@@ -249,16 +276,8 @@ def complete_challenge():
         if challenge["status"] != ChallengeStatus.ACTIVE.value:
             return jsonify({"error": f"Challenge is {challenge['status']}, not active."}), 400
 
-        # Derive rating (1-10) from completion percentage
-        rating = max(1, min(10, math.ceil(completion / 10)))
-
         calories = session.get("calories") or 300
-
-        # Calculate base points
-        if rating > 3:
-            points = math.floor((rating * calories) / 10)
-        else:
-            points = -math.floor(calories / 10)
+        rating, points = _score_completion(completion, calories)
 
         # Check if this challenge belongs to a random match
         is_match = False
@@ -286,10 +305,13 @@ def complete_challenge():
             {"status": ChallengeStatus.COMPLETED.value}
         ).eq("challenge_id", challenge_id).execute()
 
-        # Update session rating
-        supabase.table("sessions").update(
-            {"rating": rating}
-        ).eq("session_id", session["session_id"]).execute()
+        # Update session rating. A match opponent reads it when they complete,
+        # so only non-match ratings can be written behind.
+        if is_match:
+            data_access.update_session(supabase, session["session_id"], {"rating": rating})
+        else:
+            write_behind.update_later("sessions", "session_id", session["session_id"], {"rating": rating})
+            data_access.patch("sessions", session["session_id"], {"rating": rating})
 
         # Apply match winner bonus if applicable
         winner_bonus = False
@@ -350,33 +372,26 @@ def complete_challenge():
                 }).eq("match_id", match_id).execute()
 
         # Update user total points (floor at 0)
-        profile_resp = (
-            supabase.table("profiles")
-            .select("total_points")
-            .eq("user_id", g.user_id)
-            .execute()
-        )
-        current_points = profile_resp.data[0]["total_points"] if profile_resp.data else 0
+        profile = data_access.get_profile(supabase, g.user_id, ("total_points",), fresh=True) or {}
+        current_points = profile.get("total_points") or 0
         new_total = max(0, current_points + points)
 
-        supabase.table("profiles").update(
-            {"total_points": new_total}
-        ).eq("user_id", g.user_id).execute()
+        data_access.update_profile(supabase, g.user_id, {"total_points": new_total})
+        leaderboard.record_points(g.user_id, new_total)
+
+        stats_service.record_session_outcome(
+            g.user_id,
+            session.get("session_type"),
+            rating=rating,
+            calories_offset=round(calories * completion / 100),
+        )
 
         # Upsert user preference
         crave_item = session.get("crave_item", "")
-        category = crave_item.split(" ")[-1].lower() if crave_item else "unknown"
-        _upsert_preference(supabase, g.user_id, category, crave_item)
-
-        # Look up rank
-        rank_resp = (
-            supabase.table("ranks")
-            .select("rank_type")
-            .lte("min_points", new_total)
-            .gte("max_points", new_total)
-            .execute()
-        )
-        rank = rank_resp.data[0]["rank_type"] if rank_resp.data else "Beginner"
+        category = preference_service.preference_category(crave_item, "unknown")
+        preference_service.increment_preference_later(g.user_id, category, crave_item)
+
+        rank = rank_service.resolve_rank(new_total)
 
         result = {
             "rating": rating,
@@ -396,26 +411,11 @@ def complete_challenge():
         return jsonify({"error": str(exc)}), 500
 
 
-def _upsert_preference(supabase, user_id: str, category: str, item: str):
-    """Increment order_count if preference exists, otherwise create it."""
-    existing = (
-        supabase.table("user_preferences")
-        .select("*")
-        .eq("user_id", user_id)
-        .eq("category", category)
-        .eq("item", item)
-        .execute()
-    )
-    if existing.data:
-        pref = existing.data[0]
-        supabase.table("user_preferences").update({
-            "order_count": pref["order_count"] + 1,
-            "last_ordered": datetime.now(timezone.utc).isoformat(),
-        }).eq("preference_id", pref["preference_id"]).execute()
+def _score_completion(completion: int, calories: int) -> tuple[int, int]:
+    """Rating (1-10) and base points for a completion percentage."""
+    rating = max(1, min(10, math.ceil(completion / 10)))
+    if rating > 3:
+        points = math.floor((rating * calories) / 10)
     else:
-        supabase.table("user_preferences").insert({
-            "user_id": user_id,
-            "category": category,
-            "item": item,
-            "order_count": 1,
-        }).execute()
+        points = -math.floor(calories / 10)
+    return rating, points
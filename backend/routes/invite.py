@@ -1,20 +1,34 @@
+import hashlib
+import json
 import secrets
 from datetime import datetime, timedelta, timezone
 
-from flask import Blueprint, g, jsonify, request
+from flask import Blueprint, Response, g, jsonify, request, stream_with_context
 
-from config import get_supabase_client
+from config import get_supabase_client, get_supabase_service_client
 from middleware.auth_middleware import require_auth
+from middleware.idempotency import idempotent
 from models.enums import ChallengeStatus, InvitationStatus
+from services.cache import TTLCache
+from services.pubsub import get_pubsub
 
 invite_bp = Blueprint("invite", __name__)
 
 INVITE_EXPIRY_MINUTES = 5
 CHALLENGE_EXPIRY_HOURS = 24
+INVITE_CACHE_TTL_SECONDS = 30  # upper bound; entries never outlive the invite itself
+INVITE_CACHE_MAX_ENTRIES = 4096
+INVITE_STREAM_RECHECK_SECONDS = 15  # keep-alive + cross-worker status re-read
+
+# invite_token -> rendered invitation (or a not-found/expired marker)
+_invite_cache = TTLCache(
+    maxsize=INVITE_CACHE_MAX_ENTRIES, default_ttl=INVITE_CACHE_TTL_SECONDS, name="invites"
+)
 
 
 @invite_bp.route("/create", methods=["POST"])
 @require_auth
+@idempotent
 def create_invite():
     """Create an invitation for a friend
     ---
@@ -23,6 +37,11 @@ def create_invite():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -66,7 +85,7 @@ def create_invite():
         # Verify session belongs to user and has session_type = invite_friend
         sess_resp = (
             supabase.table("sessions")
-            .select("*")
+            .select("session_id, session_type")
             .eq("session_id", session_id)
             .eq("user_id", user_id)
             .execute()
@@ -147,61 +166,96 @@ def view_invite(token):
         description: Server error
     """
     try:
-        supabase = get_supabase_client()
+        entry = _invite_cache.get(token)
+        if entry is None:
+            entry = _load_invite_entry(token)
 
-        inv_resp = (
-            supabase.table("invitations")
-            .select("*, sessions(crave_item, calories)")
-            .eq("invite_token", token)
-            .execute()
-        )
-        if not inv_resp.data:
+        if entry["kind"] == "not_found":
             return jsonify({"error": "Invitation not found."}), 404
-
-        invitation = inv_resp.data[0]
-
-        # Check expiry
-        expiry = datetime.fromisoformat(invitation["expiry_time"])
-        now = datetime.now(timezone.utc)
-        if now > expiry:
-            # Mark as expired if still pending
-            if invitation["status"] == InvitationStatus.PENDING.value:
-                supabase.table("invitations").update(
-                    {"status": InvitationStatus.EXPIRED.value}
-                ).eq("invitation_id", invitation["invitation_id"]).execute()
+        if entry["kind"] == "expired":
             return jsonify({"error": "Invitation has expired."}), 404
 
-        expires_in = int((expiry - now).total_seconds())
-
-        # Get inviter name
-        profile_resp = (
-            supabase.table("profiles")
-            .select("name")
-            .eq("user_id", invitation["inviter_user_id"])
-            .execute()
-        )
-        inviter_name = profile_resp.data[0]["name"] if profile_resp.data else "Unknown"
+        invitation = entry["invitation"]
+        expires_in = int((entry["expiry"] - datetime.now(timezone.utc)).total_seconds())
+        if expires_in <= 0:
+            # Cache TTL is bounded by expiry, so this only happens at the boundary
+            _invite_cache.invalidate(token)
+            return jsonify({"error": "Invitation has expired."}), 404
 
-        session_data = invitation.get("sessions", {})
-
-        return jsonify({
-            "data": {
-                "inviter_name": inviter_name,
-                "crave_item": session_data.get("crave_item"),
-                "calories": session_data.get("calories"),
-                "challenge": invitation["challenge_description"],
-                "time_limit": invitation["challenge_time_limit"],
-                "expires_in_seconds": expires_in,
-                "status": invitation["status"],
-            }
-        }), 200
+        response = jsonify({"data": {**invitation, "expires_in_seconds": expires_in}})
+        # Weak ETag: the countdown changes every second but the invite itself does not.
+        # Clients revalidate every time (304 if unchanged); shared caches store nothing,
+        # so an accepted or expired invite is never served from a proxy as pending.
+        response.set_etag(entry["etag"], weak=True)
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response.make_conditional(request)
 
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
 
 
+def _load_invite_entry(token: str) -> dict:
+    """Read an invitation plus inviter name and cache the rendered result."""
+    supabase = get_supabase_client()
+
+    inv_resp = (
+        supabase.table("invitations")
+        .select("*, sessions(crave_item, calories)")
+        .eq("invite_token", token)
+        .execute()
+    )
+    if not inv_resp.data:
+        entry = {"kind": "not_found"}
+        _invite_cache.set(token, entry)
+        return entry
+
+    invitation = inv_resp.data[0]
+
+    # Check expiry
+    expiry = datetime.fromisoformat(invitation["expiry_time"])
+    now = datetime.now(timezone.utc)
+    if now > expiry:
+        # Mark as expired if still pending
+        if invitation["status"] == InvitationStatus.PENDING.value:
+            supabase.table("invitations").update(
+                {"status": InvitationStatus.EXPIRED.value}
+            ).eq("invitation_id", invitation["invitation_id"]).execute()
+        entry = {"kind": "expired"}
+        _invite_cache.set(token, entry)
+        return entry
+
+    # Get inviter name
+    profile_resp = (
+        supabase.table("profiles")
+        .select("name")
+        .eq("user_id", invitation["inviter_user_id"])
+        .execute()
+    )
+    inviter_name = profile_resp.data[0]["name"] if profile_resp.data else "Unknown"
+
+    session_data = invitation.get("sessions") or {}
+    rendered = {
+        "inviter_name": inviter_name,
+        "crave_item": session_data.get("crave_item"),
+        "calories": session_data.get("calories"),
+        "challenge": invitation["challenge_description"],
+        "time_limit": invitation["challenge_time_limit"],
+        "status": invitation["status"],
+    }
+    etag_source = f"{invitation['invitation_id']}|{invitation['expiry_time']}|{sorted(rendered.items())}"
+    entry = {
+        "kind": "found",
+        "invitation": rendered,
+        "expiry": expiry,
+        "etag": hashlib.sha1(etag_source.encode()).hexdigest()[:20],
+    }
+    _invite_cache.set(token, entry, ttl=min(INVITE_CACHE_TTL_SECONDS, (expiry - now).total_seconds()))
+    return entry
+
+
 @invite_bp.route("/respond", methods=["POST"])
 @require_auth
+@idempotent
 def respond_to_invite():
     """Accept or decline an invitation
     ---
@@ -210,6 +264,11 @@ def respond_to_invite():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -242,90 +301,45 @@ def respond_to_invite():
         return jsonify({"error": "invite_token and action (accept/decline) are required."}), 400
 
     try:
-        supabase = get_supabase_client()
-        user_id = g.user_id
-
-        # Look up invitation
-        inv_resp = (
-            supabase.table("invitations")
-            .select("*, sessions(crave_item, calories, session_type)")
-            .eq("invite_token", invite_token)
-            .execute()
-        )
-        if not inv_resp.data:
+        # Status check, row lock, session + challenge creation and the status
+        # flip all happen in one transaction (migrations/004). Only the service
+        # role may run it, since it acts as whichever p_user_id it is given.
+        result = get_supabase_service_client().rpc("respond_to_invitation", {
+            "p_invite_token": invite_token,
+            "p_user_id": g.user_id,
+            "p_action": action,
+            "p_challenge_expiry_hours": CHALLENGE_EXPIRY_HOURS,
+        }).execute().data or {}
+
+        error = result.get("error")
+        if error in ("expired", "not_pending"):
+            _invite_cache.invalidate(invite_token)
+        if error == "not_found":
             return jsonify({"error": "Invitation not found."}), 404
-
-        invitation = inv_resp.data[0]
-
-        # Verify not expired
-        expiry = datetime.fromisoformat(invitation["expiry_time"])
-        if datetime.now(timezone.utc) > expiry:
-            if invitation["status"] == InvitationStatus.PENDING.value:
-                supabase.table("invitations").update(
-                    {"status": InvitationStatus.EXPIRED.value}
-                ).eq("invitation_id", invitation["invitation_id"]).execute()
+        if error == "expired":
             return jsonify({"error": "Invitation has expired."}), 400
-
-        # Verify status is pending
-        if invitation["status"] != InvitationStatus.PENDING.value:
-            return jsonify({"error": f"Invitation is already {invitation['status']}."}), 400
-
-        # Prevent self-invite
-        if invitation["inviter_user_id"] == user_id:
+        if error == "not_pending":
+            return jsonify({"error": f"Invitation is already {result['status']}."}), 400
+        if error == "self_invite":
             return jsonify({"error": "You cannot accept your own invitation."}), 400
 
-        if action == "decline":
-            supabase.table("invitations").update(
-                {"status": InvitationStatus.DECLINED.value}
-            ).eq("invitation_id", invitation["invitation_id"]).execute()
-            return jsonify({"data": {"invitation_id": invitation["invitation_id"], "status": "declined"}}), 200
-
-        # Accept flow
-        session_data = invitation.get("sessions", {})
+        _invite_cache.invalidate(invite_token)
+        get_pubsub().publish(_status_channel(result["invitation_id"]), {
+            "status": InvitationStatus.DECLINED.value if action == "decline" else InvitationStatus.ACCEPTED.value,
+            "invitee_user_id": g.user_id if action == "accept" else None,
+        })
 
-        # Create a session for the invitee (copy crave_item, calories, session_type)
-        invitee_session_resp = (
-            supabase.table("sessions")
-            .insert({
-                "user_id": user_id,
-                "crave_item": session_data.get("crave_item", ""),
-                "calories": session_data.get("calories"),
-                "session_type": "invite_friend",
-            })
-            .execute()
-        )
-        invitee_session = invitee_session_resp.data[0]
-
-        # Create a challenge for the invitee (same description/time_limit)
-        challenge_expiry = (datetime.now(timezone.utc) + timedelta(hours=CHALLENGE_EXPIRY_HOURS)).isoformat()
-        ch_resp = (
-            supabase.table("challenges")
-            .insert({
-                "session_id": invitee_session["session_id"],
-                "challenge": invitation["challenge_description"],
-                "time_limit": invitation["challenge_time_limit"],
-                "expiry_time": challenge_expiry,
-                "status": ChallengeStatus.PENDING.value,
-            })
-            .execute()
-        )
-        challenge = ch_resp.data[0]
-
-        # Update invitation
-        supabase.table("invitations").update({
-            "invitee_user_id": user_id,
-            "invitee_session_id": invitee_session["session_id"],
-            "status": InvitationStatus.ACCEPTED.value,
-        }).eq("invitation_id", invitation["invitation_id"]).execute()
+        if action == "decline":
+            return jsonify({"data": {"invitation_id": result["invitation_id"], "status": "declined"}}), 200
 
         return jsonify({
             "data": {
-                "invitation_id": invitation["invitation_id"],
-                "session_id": invitee_session["session_id"],
-                "challenge_id": challenge["challenge_id"],
-                "challenge": invitation["challenge_description"],
-                "time_limit": invitation["challenge_time_limit"],
-                "expiry_time": challenge_expiry,
+                "invitation_id": result["invitation_id"],
+                "session_id": result["session_id"],
+                "challenge_id": result["challenge_id"],
+                "challenge": result["challenge"],
+                "time_limit": result["time_limit"],
+                "expiry_time": result["expiry_time"],
             }
         }), 200
 
@@ -358,46 +372,141 @@ def invite_status(invitation_id):
     try:
         supabase = get_supabase_client()
 
-        inv_resp = (
-            supabase.table("invitations")
-            .select("*")
-            .eq("invitation_id", invitation_id)
-            .execute()
-        )
-        if not inv_resp.data:
+        invitation = _load_invitation_for_user(supabase, invitation_id, g.user_id)
+        if invitation is None:
             return jsonify({"error": "Invitation not found."}), 404
 
-        invitation = inv_resp.data[0]
+        _expire_if_due(supabase, invitation)
 
-        # Verify the requester is the inviter or invitee
-        if invitation["inviter_user_id"] != g.user_id and invitation.get("invitee_user_id") != g.user_id:
-            return jsonify({"error": "Invitation not found."}), 404
+        return jsonify({"data": _status_result(supabase, invitation)}), 200
 
-        # Auto-expire if past expiry and still pending
-        if invitation["status"] == InvitationStatus.PENDING.value:
-            expiry = datetime.fromisoformat(invitation["expiry_time"])
-            if datetime.now(timezone.utc) > expiry:
-                supabase.table("invitations").update(
-                    {"status": InvitationStatus.EXPIRED.value}
-                ).eq("invitation_id", invitation_id).execute()
-                invitation["status"] = InvitationStatus.EXPIRED.value
-
-        result = {
-            "invitation_id": invitation["invitation_id"],
-            "status": invitation["status"],
-        }
-
-        # Include invitee name if accepted
-        if invitation["status"] == InvitationStatus.ACCEPTED.value and invitation.get("invitee_user_id"):
-            profile_resp = (
-                supabase.table("profiles")
-                .select("name")
-                .eq("user_id", invitation["invitee_user_id"])
-                .execute()
-            )
-            result["invitee_name"] = profile_resp.data[0]["name"] if profile_resp.data else "Unknown"
-
-        return jsonify({"data": result}), 200
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+
+
+@invite_bp.route("/status/<invitation_id>/stream", methods=["GET"])
+@require_auth
+def invite_status_stream(invitation_id):
+    """Wait for an invitation to be answered (Server-Sent Events)
+    ---
+    tags:
+      - Invite
+    security:
+      - Bearer: []
+    produces:
+      - text/event-stream
+    parameters:
+      - name: invitation_id
+        in: path
+        type: string
+        required: true
+    responses:
+      200:
+        description: >
+          Event stream. Sends keep-alive comments while the invitation is
+          pending, then a single "status" event with the same payload as
+          GET /invite/status/{invitation_id} once it is accepted, declined
+          or expired, and closes.
+      404:
+        description: Invitation not found
+      500:
+        description: Server error
+    """
+    try:
+        supabase = get_supabase_client()
 
+        invitation = _load_invitation_for_user(supabase, invitation_id, g.user_id)
+        if invitation is None:
+            return jsonify({"error": "Invitation not found."}), 404
+        user_id = g.user_id
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
+
+    def events():
+        # Subscribed only once the stream starts, so a client that disconnects
+        # before then leaves nothing open. Re-read after subscribing so a
+        # response landing since the check above is not missed.
+        with get_pubsub().subscribe(_status_channel(invitation_id)) as subscription:
+            current = _load_invitation_for_user(supabase, invitation_id, user_id) or invitation
+            expiry = datetime.fromisoformat(current["expiry_time"])
+            while not _expire_if_due(supabase, current) and current["status"] == InvitationStatus.PENDING.value:
+                remaining = (expiry - datetime.now(timezone.utc)).total_seconds()
+                message = subscription.get(timeout=max(0.0, min(remaining, INVITE_STREAM_RECHECK_SECONDS)))
+                if message is not None:
+                    current = {**current, **message}
+                    continue
+                if remaining > INVITE_STREAM_RECHECK_SECONDS:
+                    # Responses handled by another worker are not published
+                    # here, so re-read occasionally instead of waiting blind
+                    current = _load_invitation_for_user(supabase, invitation_id, user_id) or current
+                    yield ": keep-alive\n\n"
+
+            payload = json.dumps(_status_result(supabase, current))
+            yield f"event: status\ndata: {payload}\n\n"
+
+    return Response(
+        stream_with_context(events()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _status_channel(invitation_id: str) -> str:
+    return f"invitation:{invitation_id}"
+
+
+def _load_invitation_for_user(supabase, invitation_id: str, user_id: str) -> dict | None:
+    """Return the invitation if *user_id* is its inviter or invitee, else None."""
+    inv_resp = (
+        supabase.table("invitations")
+        .select("*")
+        .eq("invitation_id", invitation_id)
+        .execute()
+    )
+    if not inv_resp.data:
+        return None
+
+    invitation = inv_resp.data[0]
+    if invitation["inviter_user_id"] != user_id and invitation.get("invitee_user_id") != user_id:
+        return None
+    return invitation
+
+
+def _expire_if_due(supabase, invitation: dict) -> bool:
+    """Mark a pending invitation expired once past expiry. Returns True if it is expired."""
+    if invitation["status"] == InvitationStatus.EXPIRED.value:
+        return True
+    if invitation["status"] != InvitationStatus.PENDING.value:
+        return False
+
+    expiry = datetime.fromisoformat(invitation["expiry_time"])
+    if datetime.now(timezone.utc) <= expiry:
+        return False
+
+    supabase.table("invitations").update(
+        {"status": InvitationStatus.EXPIRED.value}
+    ).eq("invitation_id", invitation["invitation_id"]).eq(
+        "status", InvitationStatus.PENDING.value
+    ).execute()
+    invitation["status"] = InvitationStatus.EXPIRED.value
+    _invite_cache.invalidate(invitation["invite_token"])
+    return True
+
+
+def _status_result(supabase, invitation: dict) -> dict:
+    """Build the status payload, including the invitee name once accepted."""
+    result = {
+        "invitation_id": invitation["invitation_id"],
+        "status": invitation["status"],
+    }
+
+    if invitation["status"] == InvitationStatus.ACCEPTED.value and invitation.get("invitee_user_id"):
+        profile_resp = (
+            supabase.table("profiles")
+            .select("name")
+            .eq("user_id", invitation["invitee_user_id"])
+            .execute()
+        )
+        result["invitee_name"] = profile_resp.data[0]["name"] if profile_resp.data else "Unknown"
+
+    return result
@@ -4,8 +4,9 @@ from flask import Blueprint, g, jsonify, request
 
 from config import get_supabase_client
 from middleware.auth_middleware import require_auth
+from middleware.idempotency import idempotent
 from models.enums import ChallengeStatus, QueueStatus
-from services import llm_service
+from services import admission, llm_service
 
 match_bp = Blueprint("match", __name__)
 
@@ -16,6 +17,8 @@ CALORIE_MATCH_RANGE = 50
 
 @match_bp.route("/queue", methods=["POST"])
 @require_auth
+@idempotent
+@admission.admit(admission.HIGH)
 def join_queue():
     """Join the matchmaking queue to challenge a random player
     ---
@@ -24,6 +27,11 @@ def join_queue():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -41,6 +49,10 @@ def join_queue():
         description: Missing fields or already in queue
       404:
         description: Session not found
+      429:
+        description: Too many LLM requests from this user (see Retry-After)
+      503:
+        description: LLM capacity is full (see Retry-After)
       500:
         description: Server error
     """
@@ -57,7 +69,7 @@ def join_queue():
         # Verify session belongs to user and has calories
         sess_resp = (
             supabase.table("sessions")
-            .select("*")
+            .select("session_id, calories")
             .eq("session_id", session_id)
             .eq("user_id", user_id)
             .execute()
@@ -320,6 +332,7 @@ def match_status(queue_id):
 
 @match_bp.route("/cancel", methods=["POST"])
 @require_auth
+@idempotent
 def cancel_queue():
     """Cancel a matchmaking queue entry
     ---
@@ -328,6 +341,11 @@ def cancel_queue():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
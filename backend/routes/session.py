@@ -2,20 +2,133 @@ import math
 
 from flask import Blueprint, g, jsonify, request
 
-from config import get_supabase_client
+from config import CANDIDATE_POOLS_ENABLED, LOCATION_OPTIONS_CONVERSION_ENABLED, get_supabase_client
 from middleware.auth_middleware import require_auth
+from middleware.idempotency import idempotent
 from models.enums import SessionType
-from services import llm_service, places_service
+from services import (
+    admission,
+    candidate_pool,
+    data_access,
+    leaderboard,
+    llm_service,
+    personalization,
+    places_service,
+    preference_service,
+    rank_service,
+    stats_service,
+    write_behind,
+)
 
 session_bp = Blueprint("session", __name__)
 
-MATURITY_THRESHOLD = 5  # preferences count to trigger personalisation
 SKIP_BONUS_POINTS = 50
 MAX_REGENERATIONS = 3
+CONCURRENT_REGENERATION_ERROR = "Session was regenerated concurrently. Please try again."
+
+# Items shown per page. With candidate pools, the first generation covers
+# the first page and all MAX_REGENERATIONS regenerations.
+CRAVE_PAGE_SIZE = 5
+CHALLENGE_PAGE_SIZE = 3
+HEALTHY_PAGE_SIZE = 3
+CHALLENGE_DIFFICULTIES = ("easy", "medium", "hard")
+
+# Read only while pre-008 rows may still need converting (see _ensure_converted).
+# With LOCATION_OPTIONS_CONVERSION_ENABLED=0 the column can be dropped.
+LEGACY_COLUMNS = ("location_options",) if LOCATION_OPTIONS_CONVERSION_ENABLED else ()
+
+
+def _pool_count(page_size: int) -> int | None:
+    """How many items to ask the LLM for: a whole candidate pool, or None for one page."""
+    if not CANDIDATE_POOLS_ENABLED:
+        return None
+    return candidate_pool.pool_size(page_size, MAX_REGENERATIONS + 1)
+
+
+def _split_pool(items: list, key: str, page_size: int, **groups) -> tuple[list, list | None]:
+    """(first page, rest of the candidate pool), or (items, None) when pools are off."""
+    if not CANDIDATE_POOLS_ENABLED:
+        return items, None
+    return candidate_pool.take(candidate_pool.distinct(items, key), page_size, **groups)
+
+
+def _next_page(session: dict, column: str, page_size: int, **groups) -> tuple[list | None, list | None]:
+    """(next page, rest) from the session's stored pool, or (None, None) if a full page is not left."""
+    pool = session.get(column) or []
+    if len(pool) < page_size:
+        return None, None
+    return candidate_pool.take(pool, page_size, **groups)
+
+
+def _shown(excluded: list, items: list, key: str) -> list:
+    """*excluded* plus the *key* of each of *items*: everything shown so far, for the LLM to avoid."""
+    excluded = list(excluded or [])
+    for item in items or []:
+        name = item.get(key, "") if isinstance(item, dict) else ""
+        if name and name not in excluded:
+            excluded.append(name)
+    return excluded
+
+
+def _challenge_page(session: dict, profile: dict) -> tuple[list, list | None]:
+    """Generate challenges for *session*: (first page, rest of the candidate pool or None)."""
+    count = _pool_count(CHALLENGE_PAGE_SIZE)
+    challenges = llm_service.generate_challenges(
+        calories=session.get("calories", 300),
+        user_age=profile.get("age"),
+        user_weight=profile.get("weight"),
+        sets=math.ceil(count / len(CHALLENGE_DIFFICULTIES)) if count else 1,
+    )
+    return _split_pool(
+        challenges, "description", CHALLENGE_PAGE_SIZE,
+        group_key="difficulty", groups=CHALLENGE_DIFFICULTIES,
+    )
+
+
+def _ensure_converted(supabase, session: dict) -> dict:
+    """Move a pre-008 session's location_options blob into the narrow columns.
+
+    Rows written since migration 008 have location_options = NULL and are
+    returned untouched. Older rows are converted the first time they are
+    read here (scripts/convert_location_options.py converts the rest).
+    A no-op once LOCATION_OPTIONS_CONVERSION_ENABLED is turned off.
+    """
+    legacy = session.get("location_options") if LOCATION_OPTIONS_CONVERSION_ENABLED else None
+    if legacy is None:
+        return session
+    fields = {
+        "place_ids": places_service.save_places(legacy.get("places") or []),
+        "craving_options": legacy.get("options"),
+        "healthy_suggestions": legacy.get("healthy_suggestions"),
+        "healthy_excluded": legacy.get("healthy_excluded") or [],
+        "crave_regenerations": legacy.get("crave_regenerations", 0),
+        "challenge_regenerations": legacy.get("challenge_regenerations", 0),
+        "healthy_regenerations": legacy.get("healthy_regenerations", 0),
+        "location_options": None,
+    }
+    resp = (
+        supabase.table("sessions")
+        .update(fields)
+        .eq("session_id", session["session_id"])
+        .not_.is_("location_options", "null")
+        .execute()
+    )
+    if resp.data:
+        data_access.remember("sessions", resp.data[0])
+    else:
+        # Converted by someone else in the meantime; their columns win
+        data_access.forget("sessions", session["session_id"])
+        fields = data_access.get_session(
+            supabase, session["session_id"], session["user_id"], tuple(fields), fresh=True
+        ) or fields
+    session.update(fields)
+    return session
 
 
 @session_bp.route("/crave", methods=["POST"])
 @require_auth
+@idempotent
+@admission.admit(admission.NORMAL)
 def submit_crave():
     """Submit a craving and get specific options
     ---
@@ -24,6 +137,11 @@ def submit_crave():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -48,6 +166,10 @@ def submit_crave():
         description: Craving options generated
       400:
         description: Missing required fields
+      429:
+        description: Too many LLM requests from this user (see Retry-After)
+      503:
+        description: LLM capacity is full (see Retry-After)
       500:
         description: Server error
     """
@@ -63,41 +185,41 @@ def submit_crave():
         supabase = get_supabase_client()
         user_id = g.user_id
 
-        # Check user preferences for this category
-        prefs_resp = (
-            supabase.table("user_preferences")
-            .select("*")
-            .eq("user_id", user_id)
-            .eq("category", crave_item.lower())
-            .execute()
+        # Top items for this category, from the in-memory personalization profile
+        preferences, is_personalized = personalization.get_personalization(
+            supabase, user_id, crave_item.lower()
         )
-        preferences = prefs_resp.data or []
-        is_personalized = len(preferences) >= MATURITY_THRESHOLD
 
         # Find nearby places
         places = places_service.search_nearby_places(crave_item, lat, lng)
 
-        # Generate specific options via LLM
+        # Generate specific options via LLM (with pools, enough for every regeneration)
         try:
             options = llm_service.generate_craving_options(
                 crave_item,
                 places,
-                user_preferences=preferences if is_personalized else None,
+                user_preferences=preferences or None,
+                count=_pool_count(CRAVE_PAGE_SIZE),
             )
         except Exception as llm_err:
             return jsonify({"error": f"LLM service error: {llm_err}"}), 502
+        options, candidates = _split_pool(options, "option", CRAVE_PAGE_SIZE)
 
-        # Create session record
-        session_resp = (
-            supabase.table("sessions")
-            .insert({
-                "user_id": user_id,
-                "crave_item": crave_item,
-                "location_options": {"places": places, "options": options},
-            })
-            .execute()
-        )
+        # Create session record; places are shared rows referenced by ID
+        place_ids = places_service.save_places(places)
+        row = {
+            "user_id": user_id,
+            "crave_item": crave_item,
+            "place_ids": place_ids,
+            "craving_options": options,
+        }
+        if candidates is not None:
+            # Regenerations served from the pool report the personalization it was made with
+            row["crave_candidates"] = candidates
+            row["crave_personalized"] = is_personalized
+        session_resp = supabase.table("sessions").insert(row).execute()
         session = session_resp.data[0]
+        data_access.remember("sessions", session)
 
         return jsonify({
             "data": {
@@ -113,6 +235,8 @@ def submit_crave():
 
 @session_bp.route("/select", methods=["POST"])
 @require_auth
+@idempotent
+@admission.admit(admission.NORMAL)
 def select_option():
     """Select a craving option and get calorie estimate
     ---
@@ -121,6 +245,11 @@ def select_option():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -142,6 +271,10 @@ def select_option():
         description: Missing fields
       404:
         description: Session not found
+      429:
+        description: Too many LLM requests from this user (see Retry-After)
+      503:
+        description: LLM capacity is full (see Retry-After)
       500:
         description: Server error
     """
@@ -156,14 +289,8 @@ def select_option():
         supabase = get_supabase_client()
 
         # Verify session belongs to user
-        sess_resp = (
-            supabase.table("sessions")
-            .select("*")
-            .eq("session_id", session_id)
-            .eq("user_id", g.user_id)
-            .execute()
-        )
-        if not sess_resp.data:
+        session = data_access.get_session(supabase, session_id, g.user_id, ())
+        if session is None:
             return jsonify({"error": "Session not found."}), 404
 
         # Estimate calories via LLM
@@ -173,10 +300,10 @@ def select_option():
             return jsonify({"error": f"LLM service error: {llm_err}"}), 502
 
         # Update session
-        supabase.table("sessions").update({
+        data_access.update_session(supabase, session_id, {
             "crave_item": selected_option,
             "calories": calories,
-        }).eq("session_id", session_id).execute()
+        })
 
         return jsonify({
             "data": {
@@ -193,6 +320,8 @@ def select_option():
 
 @session_bp.route("/choose-type", methods=["POST"])
 @require_auth
+@idempotent
+@admission.admit(admission.NORMAL)
 def choose_session_type():
     """Choose a session type (solo challenge, invite friend, etc.)
     ---
@@ -201,6 +330,11 @@ def choose_session_type():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -222,6 +356,10 @@ def choose_session_type():
         description: Invalid input
       404:
         description: Session not found
+      429:
+        description: Too many LLM requests from this user (see Retry-After)
+      503:
+        description: LLM capacity is full (see Retry-After)
       500:
         description: Server error
     """
@@ -243,41 +381,27 @@ def choose_session_type():
         supabase = get_supabase_client()
 
         # Verify session + get calories
-        sess_resp = (
-            supabase.table("sessions")
-            .select("*")
-            .eq("session_id", session_id)
-            .eq("user_id", g.user_id)
-            .execute()
+        session = data_access.get_session(
+            supabase, session_id, g.user_id, ("crave_item", "calories", *LEGACY_COLUMNS)
         )
-        if not sess_resp.data:
+        if session is None:
             return jsonify({"error": "Session not found."}), 404
 
-        session = sess_resp.data[0]
-
         # Update session type
-        supabase.table("sessions").update({
-            "session_type": stype.value,
-        }).eq("session_id", session_id).execute()
+        data_access.update_session(supabase, session_id, {"session_type": stype.value})
 
         if stype == SessionType.SOLO_CHALLENGE:
             # Fetch user profile for personalised challenges
-            profile_resp = (
-                supabase.table("profiles")
-                .select("age, weight")
-                .eq("user_id", g.user_id)
-                .execute()
-            )
-            profile = profile_resp.data[0] if profile_resp.data else {}
+            profile = data_access.get_profile(supabase, g.user_id, ("age", "weight")) or {}
 
             try:
-                challenges = llm_service.generate_challenges(
-                    calories=session.get("calories", 300),
-                    user_age=profile.get("age"),
-                    user_weight=profile.get("weight"),
-                )
+                challenges, candidates = _challenge_page(session, profile)
             except Exception as llm_err:
                 return jsonify({"error": f"LLM service error: {llm_err}"}), 502
+            fields = {"challenge_excluded": _shown([], challenges, "description")}
+            if candidates is not None:
+                fields["challenge_candidates"] = candidates
+            data_access.update_session(supabase, session_id, fields)
 
             return jsonify({
                 "data": {
@@ -289,28 +413,20 @@ def choose_session_type():
 
         if stype == SessionType.SKIP:
             # Award willpower bonus
-            profile_resp = (
-                supabase.table("profiles")
-                .select("total_points")
-                .eq("user_id", g.user_id)
-                .execute()
-            )
-            current_points = profile_resp.data[0]["total_points"] if profile_resp.data else 0
+            profile = data_access.get_profile(supabase, g.user_id, ("total_points",), fresh=True) or {}
+            current_points = profile.get("total_points") or 0
             new_total = current_points + SKIP_BONUS_POINTS
 
-            supabase.table("profiles").update(
-                {"total_points": new_total}
-            ).eq("user_id", g.user_id).execute()
-
-            # Look up rank
-            rank_resp = (
-                supabase.table("ranks")
-                .select("rank_type")
-                .lte("min_points", new_total)
-                .gte("max_points", new_total)
-                .execute()
+            data_access.update_profile(supabase, g.user_id, {"total_points": new_total})
+            leaderboard.record_points(g.user_id, new_total)
+
+            stats_service.record_session_outcome(
+                g.user_id,
+                stype.value,
+                calories_offset=session.get("calories") or 0,
             )
-            rank = rank_resp.data[0]["rank_type"] if rank_resp.data else "Beginner"
+
+            rank = rank_service.resolve_rank(new_total)
 
             return jsonify({
                 "data": {
@@ -325,22 +441,16 @@ def choose_session_type():
 
         if stype == SessionType.INVITE_FRIEND:
             # Generate challenges for the inviter to pick from before creating invite
-            profile_resp = (
-                supabase.table("profiles")
-                .select("age, weight")
-                .eq("user_id", g.user_id)
-                .execute()
-            )
-            profile = profile_resp.data[0] if profile_resp.data else {}
+            profile = data_access.get_profile(supabase, g.user_id, ("age", "weight")) or {}
 
             try:
-                challenges = llm_service.generate_challenges(
-                    calories=session.get("calories", 300),
-                    user_age=profile.get("age"),
-                    user_weight=profile.get("weight"),
-                )
+                challenges, candidates = _challenge_page(session, profile)
             except Exception as llm_err:
                 return jsonify({"error": f"LLM service error: {llm_err}"}), 502
+            fields = {"challenge_excluded": _shown([], challenges, "description")}
+            if candidates is not None:
+                fields["challenge_candidates"] = candidates
+            data_access.update_session(supabase, session_id, fields)
 
             return jsonify({
                 "data": {
@@ -357,18 +467,22 @@ def choose_session_type():
                 suggestions = llm_service.generate_healthy_substitute(
                     crave_item=session.get("crave_item", ""),
                     calories=session.get("calories", 300),
+                    count=_pool_count(HEALTHY_PAGE_SIZE),
                 )
             except Exception as llm_err:
                 return jsonify({"error": f"LLM service error: {llm_err}"}), 502
+            suggestions, candidates = _split_pool(suggestions, "suggestion", HEALTHY_PAGE_SIZE)
 
             # Store suggestions in session for regeneration tracking
-            loc_opts = session.get("location_options") or {}
-            loc_opts["healthy_suggestions"] = suggestions
-            loc_opts["healthy_regenerations"] = 0
-            loc_opts["healthy_excluded"] = []
-            supabase.table("sessions").update(
-                {"location_options": loc_opts}
-            ).eq("session_id", session_id).execute()
+            _ensure_converted(supabase, session)
+            fields = {
+                "healthy_suggestions": suggestions,
+                "healthy_regenerations": 0,
+                "healthy_excluded": [],
+            }
+            if candidates is not None:
+                fields["healthy_candidates"] = candidates
+            data_access.update_session(supabase, session_id, fields)
 
             return jsonify({
                 "data": {
@@ -406,6 +520,7 @@ def choose_session_type():
 
 @session_bp.route("/crave/regenerate", methods=["POST"])
 @require_auth
+@idempotent
 def regenerate_crave_options():
     """Regenerate craving options (different suggestions)
     ---
@@ -414,6 +529,11 @@ def regenerate_crave_options():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -431,6 +551,12 @@ def regenerate_crave_options():
         description: Regeneration limit reached or missing fields
       404:
         description: Session not found
+      409:
+        description: Another regeneration of this session happened at the same time
+      429:
+        description: Too many LLM requests from this user (see Retry-After)
+      503:
+        description: LLM capacity is full (see Retry-After)
       500:
         description: Server error
     """
@@ -443,52 +569,56 @@ def regenerate_crave_options():
     try:
         supabase = get_supabase_client()
 
-        sess_resp = (
-            supabase.table("sessions")
-            .select("*")
-            .eq("session_id", session_id)
-            .eq("user_id", g.user_id)
-            .execute()
-        )
-        if not sess_resp.data:
+        session = data_access.get_session(supabase, session_id, g.user_id, (
+            "crave_item", "place_ids", "craving_options", "crave_regenerations", "crave_excluded",
+            "crave_candidates", "crave_personalized", *LEGACY_COLUMNS,
+        ))
+        if session is None:
             return jsonify({"error": "Session not found."}), 404
 
-        session = sess_resp.data[0]
-        loc_opts = session.get("location_options") or {}
+        _ensure_converted(supabase, session)
 
-        regen_count = loc_opts.get("crave_regenerations", 0)
+        regen_count = session.get("crave_regenerations") or 0
         if regen_count >= MAX_REGENERATIONS:
             return jsonify({"error": f"Maximum {MAX_REGENERATIONS} regenerations reached. Please pick from the current options."}), 400
 
-        places = loc_opts.get("places", [])
-
-        # Check user preferences
         crave_item = session.get("crave_item", "")
-        prefs_resp = (
-            supabase.table("user_preferences")
-            .select("*")
-            .eq("user_id", g.user_id)
-            .eq("category", crave_item.lower())
-            .execute()
-        )
-        preferences = prefs_resp.data or []
-        is_personalized = len(preferences) >= MATURITY_THRESHOLD
-
-        try:
-            options = llm_service.generate_craving_options(
-                crave_item,
-                places,
-                user_preferences=preferences if is_personalized else None,
+        excluded = _shown(session.get("crave_excluded"), session.get("craving_options"), "option")
+
+        fields = {"crave_regenerations": regen_count + 1, "crave_excluded": excluded}
+        options, fields["crave_candidates"] = _next_page(session, "crave_candidates", CRAVE_PAGE_SIZE)
+        is_personalized = bool(session.get("crave_personalized"))
+        if options is None:
+            # No pool (or too little of it left): ask the LLM for one page
+            del fields["crave_candidates"]
+            preferences, is_personalized = personalization.get_personalization(
+                supabase, g.user_id, crave_item.lower()
             )
-        except Exception as llm_err:
-            return jsonify({"error": f"LLM service error: {llm_err}"}), 502
-
-        # Update session with new options and increment count
-        loc_opts["options"] = options
-        loc_opts["crave_regenerations"] = regen_count + 1
-        supabase.table("sessions").update(
-            {"location_options": loc_opts}
-        ).eq("session_id", session_id).execute()
+            places = places_service.load_places(supabase, session.get("place_ids") or [])
+            with admission.slot(admission.LOW) as rejected:
+                if rejected is not None:
+                    return rejected
+                try:
+                    options = llm_service.generate_craving_options(
+                        crave_item,
+                        places,
+                        user_preferences=preferences or None,
+                        exclude_items=excluded or None,
+                    )
+                except Exception as llm_err:
+                    return jsonify({"error": f"LLM service error: {llm_err}"}), 502
+        fields["craving_options"] = options
+
+        # Update session with new options and increment count, unless
+        # another regeneration got there first
+        updated = data_access.update_session(
+            supabase,
+            session_id,
+            fields,
+            expect={"crave_regenerations": regen_count},
+        )
+        if updated is None:
+            return jsonify({"error": CONCURRENT_REGENERATION_ERROR}), 409
 
         return jsonify({
             "data": {
@@ -505,6 +635,7 @@ def regenerate_crave_options():
 
 @session_bp.route("/challenges/regenerate", methods=["POST"])
 @require_auth
+@idempotent
 def regenerate_challenges():
     """Regenerate challenge suggestions (different challenges)
     ---
@@ -513,6 +644,11 @@ def regenerate_challenges():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -530,6 +666,12 @@ def regenerate_challenges():
         description: Regeneration limit reached or invalid session type
       404:
         description: Session not found
+      409:
+        description: Another regeneration of this session happened at the same time
+      429:
+        description: Too many LLM requests from this user (see Retry-After)
+      503:
+        description: LLM capacity is full (see Retry-After)
       500:
         description: Server error
     """
@@ -542,47 +684,53 @@ def regenerate_challenges():
     try:
         supabase = get_supabase_client()
 
-        sess_resp = (
-            supabase.table("sessions")
-            .select("*")
-            .eq("session_id", session_id)
-            .eq("user_id", g.user_id)
-            .execute()
-        )
-        if not sess_resp.data:
+        session = data_access.get_session(supabase, session_id, g.user_id, (
+            "session_type", "calories", "challenge_regenerations", "challenge_excluded",
+            "challenge_candidates", *LEGACY_COLUMNS,
+        ))
+        if session is None:
             return jsonify({"error": "Session not found."}), 404
 
-        session = sess_resp.data[0]
-
         if session.get("session_type") not in ("solo_challenge", "invite_friend"):
             return jsonify({"error": "Challenge regeneration is only for solo_challenge and invite_friend sessions."}), 400
 
-        loc_opts = session.get("location_options") or {}
-        regen_count = loc_opts.get("challenge_regenerations", 0)
+        _ensure_converted(supabase, session)
+        regen_count = session.get("challenge_regenerations") or 0
         if regen_count >= MAX_REGENERATIONS:
             return jsonify({"error": f"Maximum {MAX_REGENERATIONS} regenerations reached. Please pick from the current challenges."}), 400
 
-        profile_resp = (
-            supabase.table("profiles")
-            .select("age, weight")
-            .eq("user_id", g.user_id)
-            .execute()
+        fields = {"challenge_regenerations": regen_count + 1}
+        challenges, fields["challenge_candidates"] = _next_page(
+            session, "challenge_candidates", CHALLENGE_PAGE_SIZE,
+            group_key="difficulty", groups=CHALLENGE_DIFFICULTIES,
         )
-        profile = profile_resp.data[0] if profile_resp.data else {}
-
-        try:
-            challenges = llm_service.generate_challenges(
-                calories=session.get("calories", 300),
-                user_age=profile.get("age"),
-                user_weight=profile.get("weight"),
-            )
-        except Exception as llm_err:
-            return jsonify({"error": f"LLM service error: {llm_err}"}), 502
-
-        loc_opts["challenge_regenerations"] = regen_count + 1
-        supabase.table("sessions").update(
-            {"location_options": loc_opts}
-        ).eq("session_id", session_id).execute()
+        if challenges is None:
+            # No pool (or too little of it left): ask the LLM for one page
+            del fields["challenge_candidates"]
+            profile = data_access.get_profile(supabase, g.user_id, ("age", "weight")) or {}
+            with admission.slot(admission.LOW) as rejected:
+                if rejected is not None:
+                    return rejected
+                try:
+                    challenges = llm_service.generate_challenges(
+                        calories=session.get("calories", 300),
+                        user_age=profile.get("age"),
+                        user_weight=profile.get("weight"),
+                        exclude_items=session.get("challenge_excluded") or None,
+                    )
+                except Exception as llm_err:
+                    return jsonify({"error": f"LLM service error: {llm_err}"}), 502
+        # The current page is not stored, so record what is shown as it goes out
+        fields["challenge_excluded"] = _shown(session.get("challenge_excluded"), challenges, "description")
+
+        updated = data_access.update_session(
+            supabase,
+            session_id,
+            fields,
+            expect={"challenge_regenerations": regen_count},
+        )
+        if updated is None:
+            return jsonify({"error": CONCURRENT_REGENERATION_ERROR}), 409
 
         return jsonify({
             "data": {
@@ -602,6 +750,7 @@ def regenerate_challenges():
 
 @session_bp.route("/healthy/regenerate", methods=["POST"])
 @require_auth
+@idempotent
 def regenerate_healthy():
     """Regenerate healthy substitute suggestions
     ---
@@ -610,6 +759,11 @@ def regenerate_healthy():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -627,6 +781,12 @@ def regenerate_healthy():
         description: Regeneration limit reached or wrong session type
       404:
         description: Session not found
+      409:
+        description: Another regeneration of this session happened at the same time
+      429:
+        description: Too many LLM requests from this user (see Retry-After)
+      503:
+        description: LLM capacity is full (see Retry-After)
       500:
         description: Server error
     """
@@ -639,49 +799,50 @@ def regenerate_healthy():
     try:
         supabase = get_supabase_client()
 
-        sess_resp = (
-            supabase.table("sessions")
-            .select("*")
-            .eq("session_id", session_id)
-            .eq("user_id", g.user_id)
-            .execute()
-        )
-        if not sess_resp.data:
+        session = data_access.get_session(supabase, session_id, g.user_id, (
+            "session_type", "crave_item", "calories", "healthy_suggestions", "healthy_excluded",
+            "healthy_regenerations", "healthy_candidates", *LEGACY_COLUMNS,
+        ))
+        if session is None:
             return jsonify({"error": "Session not found."}), 404
 
-        session = sess_resp.data[0]
-
         if session.get("session_type") != "healthy_route":
             return jsonify({"error": "This endpoint is only for healthy_route sessions."}), 400
 
-        loc_opts = session.get("location_options") or {}
-        regen_count = loc_opts.get("healthy_regenerations", 0)
+        _ensure_converted(supabase, session)
+        regen_count = session.get("healthy_regenerations") or 0
         if regen_count >= MAX_REGENERATIONS:
             return jsonify({"error": f"Maximum {MAX_REGENERATIONS} regenerations reached. Please pick from the current suggestions."}), 400
 
         # Collect previously shown suggestions to exclude
-        excluded = loc_opts.get("healthy_excluded", [])
-        current_suggestions = loc_opts.get("healthy_suggestions", [])
-        for s in current_suggestions:
-            name = s.get("suggestion", "")
-            if name and name not in excluded:
-                excluded.append(name)
-
-        try:
-            suggestions = llm_service.generate_healthy_substitute(
-                crave_item=session.get("crave_item", ""),
-                calories=session.get("calories", 300),
-                exclude_items=excluded if excluded else None,
-            )
-        except Exception as llm_err:
-            return jsonify({"error": f"LLM service error: {llm_err}"}), 502
-
-        loc_opts["healthy_suggestions"] = suggestions
-        loc_opts["healthy_regenerations"] = regen_count + 1
-        loc_opts["healthy_excluded"] = excluded
-        supabase.table("sessions").update(
-            {"location_options": loc_opts}
-        ).eq("session_id", session_id).execute()
+        excluded = _shown(session.get("healthy_excluded"), session.get("healthy_suggestions"), "suggestion")
+
+        fields = {"healthy_regenerations": regen_count + 1, "healthy_excluded": excluded}
+        suggestions, fields["healthy_candidates"] = _next_page(session, "healthy_candidates", HEALTHY_PAGE_SIZE)
+        if suggestions is None:
+            # No pool (or too little of it left): ask the LLM for one page
+            del fields["healthy_candidates"]
+            with admission.slot(admission.LOW) as rejected:
+                if rejected is not None:
+                    return rejected
+                try:
+                    suggestions = llm_service.generate_healthy_substitute(
+                        crave_item=session.get("crave_item", ""),
+                        calories=session.get("calories", 300),
+                        exclude_items=excluded if excluded else None,
+                    )
+                except Exception as llm_err:
+                    return jsonify({"error": f"LLM service error: {llm_err}"}), 502
+        fields["healthy_suggestions"] = suggestions
+
+        updated = data_access.update_session(
+            supabase,
+            session_id,
+            fields,
+            expect={"healthy_regenerations": regen_count},
+        )
+        if updated is None:
+            return jsonify({"error": CONCURRENT_REGENERATION_ERROR}), 409
 
         return jsonify({
             "data": {
@@ -697,6 +858,7 @@ def regenerate_healthy():
 
 @session_bp.route("/healthy/accept", methods=["POST"])
 @require_auth
+@idempotent
 def accept_healthy():
     """Accept a healthy substitute — awards points and logs the choice
     ---
@@ -705,6 +867,11 @@ def accept_healthy():
     security:
       - Bearer: []
     parameters:
+      - name: Idempotency-Key
+        in: header
+        type: string
+        required: false
+        description: Retries with the same key get the first response back instead of running again
       - name: body
         in: body
         required: true
@@ -739,58 +906,56 @@ def accept_healthy():
     try:
         supabase = get_supabase_client()
 
-        sess_resp = (
-            supabase.table("sessions")
-            .select("*")
-            .eq("session_id", session_id)
-            .eq("user_id", g.user_id)
-            .execute()
-        )
-        if not sess_resp.data:
+        session = data_access.get_session(supabase, session_id, g.user_id, (
+            "session_type", "crave_item", "calories", "healthy_suggestions", *LEGACY_COLUMNS,
+        ))
+        if session is None:
             return jsonify({"error": "Session not found."}), 404
 
-        session = sess_resp.data[0]
-
         if session.get("session_type") != "healthy_route":
             return jsonify({"error": "This endpoint is only for healthy_route sessions."}), 400
 
+        _ensure_converted(supabase, session)
+        original_crave = session.get("crave_item", "")
         calories = session.get("calories") or 300
         points = math.floor(calories / 10)
 
         # Update session with the healthy choice and a positive rating
-        supabase.table("sessions").update({
-            "crave_item": selected,
-            "rating": 7,
-        }).eq("session_id", session_id).execute()
+        healthy_choice = {"crave_item": selected, "rating": 7}
+        write_behind.update_later("sessions", "session_id", session_id, healthy_choice)
+        data_access.patch("sessions", session_id, healthy_choice)
 
         # Update user total points
-        profile_resp = (
-            supabase.table("profiles")
-            .select("total_points")
-            .eq("user_id", g.user_id)
-            .execute()
-        )
-        current_points = profile_resp.data[0]["total_points"] if profile_resp.data else 0
+        profile = data_access.get_profile(supabase, g.user_id, ("total_points",), fresh=True) or {}
+        current_points = profile.get("total_points") or 0
         new_total = current_points + points
 
-        supabase.table("profiles").update(
-            {"total_points": new_total}
-        ).eq("user_id", g.user_id).execute()
+        data_access.update_profile(supabase, g.user_id, {"total_points": new_total})
+        leaderboard.record_points(g.user_id, new_total)
 
-        # Log preference
-        original_crave = session.get("crave_item", "")
-        category = original_crave.split(" ")[-1].lower() if original_crave else "healthy"
-        _upsert_preference(supabase, g.user_id, category, selected)
-
-        # Look up rank
-        rank_resp = (
-            supabase.table("ranks")
-            .select("rank_type")
-            .lte("min_points", new_total)
-            .gte("max_points", new_total)
-            .execute()
+        # Calories saved versus the original craving, if the pick was one of ours
+        suggested = next(
+            (
+                sug for sug in session.get("healthy_suggestions") or []
+                if sug.get("suggestion") == selected
+            ),
+            None,
+        )
+        calories_offset = 0
+        if suggested and isinstance(suggested.get("estimated_calories"), (int, float)):
+            calories_offset = max(0, calories - int(suggested["estimated_calories"]))
+        stats_service.record_session_outcome(
+            g.user_id,
+            SessionType.HEALTHY_ROUTE.value,
+            rating=7,
+            calories_offset=calories_offset,
         )
-        rank = rank_resp.data[0]["rank_type"] if rank_resp.data else "Beginner"
+
+        # Log preference
+        category = preference_service.preference_category(original_crave, "healthy")
+        preference_service.increment_preference_later(g.user_id, category, selected)
+
+        rank = rank_service.resolve_rank(new_total)
 
         return jsonify({
             "data": {
@@ -805,29 +970,3 @@ def accept_healthy():
 
     except Exception as exc:
         return jsonify({"error": str(exc)}), 500
-
-
-def _upsert_preference(supabase, user_id: str, category: str, item: str):
-    """Increment order_count if preference exists, otherwise create it."""
-    from datetime import datetime, timezone
-    existing = (
-        supabase.table("user_preferences")
-        .select("*")
-        .eq("user_id", user_id)
-        .eq("category", category)
-        .eq("item", item)
-        .execute()
-    )
-    if existing.data:
-        pref = existing.data[0]
-        supabase.table("user_preferences").update({
-            "order_count": pref["order_count"] + 1,
-            "last_ordered": datetime.now(timezone.utc).isoformat(),
-        }).eq("preference_id", pref["preference_id"]).execute()
-    else:
-        supabase.table("user_preferences").insert({
-            "user_id": user_id,
-            "category": category,
-            "item": item,
-            "order_count": 1,
-        }).execute()
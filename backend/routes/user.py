@@ -1,10 +1,24 @@
-from flask import Blueprint, g, jsonify, request
+import base64
+import json
+import uuid
+from datetime import datetime
+
+from flask import Blueprint, Response, current_app, g, jsonify, request, stream_with_context
 
 from config import get_supabase_client
 from middleware.auth_middleware import require_auth
+from services import data_access, leaderboard, rank_service, stats_service
 
 user_bp = Blueprint("user", __name__)
 
+HISTORY_FIELDS = ("session_id", "crave_item", "calories", "session_type", "rating", "created_at", "challenges")
+HISTORY_DEFAULT_LIMIT = 50
+HISTORY_MAX_LIMIT = 100
+HISTORY_EXPORT_PAGE_SIZE = 200
+LEADERBOARD_DEFAULT_LIMIT = 10
+LEADERBOARD_MAX_LIMIT = 100
+LEADERBOARD_MAX_RADIUS = 50
+
 
 @user_bp.route("/profile", methods=["GET"])
 @require_auth
@@ -23,27 +37,15 @@ def get_profile():
     """
     supabase = get_supabase_client()
 
-    profile_resp = (
-        supabase.table("profiles")
-        .select("*")
-        .eq("user_id", g.user_id)
-        .execute()
+    profile = data_access.get_profile(
+        supabase, g.user_id, ("name", "email", "age", "height", "weight", "total_points")
     )
-    if not profile_resp.data:
+    if profile is None:
         return jsonify({"error": "Profile not found."}), 404
 
-    profile = profile_resp.data[0]
     total_points = profile.get("total_points", 0)
 
-    # Look up rank
-    rank_resp = (
-        supabase.table("ranks")
-        .select("rank_type")
-        .lte("min_points", total_points)
-        .gte("max_points", total_points)
-        .execute()
-    )
-    rank = rank_resp.data[0]["rank_type"] if rank_resp.data else "Beginner"
+    rank = rank_service.resolve_rank(total_points)
 
     return jsonify({
         "data": {
@@ -103,13 +105,103 @@ def update_profile():
         return jsonify({"error": "No valid fields to update. Allowed: name, age, height, weight."}), 400
 
     supabase = get_supabase_client()
-    supabase.table("profiles").update(updates).eq("user_id", g.user_id).execute()
+    data_access.update_profile(supabase, g.user_id, updates)
+    if "name" in updates:
+        leaderboard.record_name(g.user_id, updates["name"])
 
     return jsonify({
         "data": {"message": "Profile updated.", "updated_fields": list(updates.keys())}
     }), 200
 
 
+@user_bp.route("/stats", methods=["GET"])
+@require_auth
+def get_stats():
+    """Get precomputed stats and streaks
+    ---
+    tags:
+      - User
+    security:
+      - Bearer: []
+    responses:
+      200:
+        description: >
+          Sessions by type, average rating, current and best daily streak,
+          and total calories offset. Maintained on write, so this is a
+          single-row read.
+      500:
+        description: Server error
+    """
+    try:
+        stats = stats_service.get_user_stats(get_supabase_client(), g.user_id)
+        return jsonify({"data": stats}), 200
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+
+
+@user_bp.route("/leaderboard", methods=["GET"])
+@require_auth
+def get_leaderboard():
+    """Get the points leaderboard (top N and the places around you)
+    ---
+    tags:
+      - User
+    security:
+      - Bearer: []
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 10
+        description: Number of top entries (max 100)
+      - name: radius
+        in: query
+        type: integer
+        required: false
+        default: 0
+        description: Also return this many places above and below you (max 50)
+    responses:
+      200:
+        description: Top entries, your own position, and your neighbourhood if radius > 0
+      400:
+        description: Invalid limit or radius
+      500:
+        description: Server error
+    """
+    try:
+        limit = max(1, min(LEADERBOARD_MAX_LIMIT, int(request.args.get("limit", LEADERBOARD_DEFAULT_LIMIT))))
+        radius = max(0, min(LEADERBOARD_MAX_RADIUS, int(request.args.get("radius", 0))))
+    except ValueError:
+        return jsonify({"error": "limit and radius must be integers."}), 400
+
+    try:
+        supabase = get_supabase_client()
+        top = leaderboard.top(supabase, limit)
+        me, around = leaderboard.around(supabase, g.user_id, radius)
+
+        def public(entry):
+            return {
+                "position": entry["position"],
+                "name": entry["name"],
+                "total_points": entry["total_points"],
+                "rank": entry["rank"],
+                "is_me": entry["user_id"] == g.user_id,
+            }
+
+        result = {
+            "top": [public(e) for e in top],
+            "me": public(me) if me else None,
+        }
+        if radius:
+            result["around"] = [public(e) for e in around]
+
+        return jsonify({"data": result}), 200
+
+    except Exception as exc:
+        return jsonify({"error": str(exc)}), 500
+
+
 @user_bp.route("/history", methods=["GET"])
 @require_auth
 def get_history():
@@ -119,36 +211,132 @@ def get_history():
       - User
     security:
       - Bearer: []
+    produces:
+      - application/json
+      - application/x-ndjson
+    parameters:
+      - name: limit
+        in: query
+        type: integer
+        required: false
+        default: 50
+        description: Page size (max 100). Ignored when streaming NDJSON.
+      - name: cursor
+        in: query
+        type: string
+        required: false
+        description: next_cursor from the previous page
+      - name: fields
+        in: query
+        type: string
+        required: false
+        description: >
+          Comma-separated subset of session_id, crave_item, calories,
+          session_type, rating, created_at, challenges. Defaults to all.
     responses:
       200:
-        description: List of past sessions with challenges
+        description: >
+          Page of past sessions (newest first) with next_cursor, or with
+          Accept application/x-ndjson the full history as one session per line
+      400:
+        description: Invalid limit, cursor or fields
     """
+    try:
+        limit = int(request.args.get("limit", HISTORY_DEFAULT_LIMIT))
+    except ValueError:
+        return jsonify({"error": "limit must be an integer."}), 400
+    limit = max(1, min(HISTORY_MAX_LIMIT, limit))
+
+    fields = HISTORY_FIELDS
+    if request.args.get("fields"):
+        fields = tuple(f.strip() for f in request.args["fields"].split(",") if f.strip())
+        unknown = [f for f in fields if f not in HISTORY_FIELDS]
+        if unknown or not fields:
+            return jsonify({"error": f"Unknown fields: {unknown}. Allowed: {list(HISTORY_FIELDS)}"}), 400
+
+    cursor = None
+    if request.args.get("cursor"):
+        try:
+            cursor = _decode_cursor(request.args["cursor"])
+        except ValueError:
+            return jsonify({"error": "Invalid cursor."}), 400
+
     supabase = get_supabase_client()
+    user_id = g.user_id
 
-    sessions_resp = (
-        supabase.table("sessions")
-        .select("*, challenges(*)")
-        .eq("user_id", g.user_id)
-        .order("created_at", desc=True)
-        .limit(50)
-        .execute()
-    )
+    if request.accept_mimetypes.best_match(["application/json", "application/x-ndjson"]) == "application/x-ndjson":
+        dumps = current_app.json.dumps
+
+        def export():
+            page_cursor = cursor
+            while True:
+                rows = _history_page(supabase, user_id, fields, page_cursor, HISTORY_EXPORT_PAGE_SIZE)
+                for row in rows:
+                    yield dumps(_project(row, fields)) + "\n"
+                if len(rows) < HISTORY_EXPORT_PAGE_SIZE:
+                    return
+                page_cursor = (rows[-1]["created_at"], rows[-1]["session_id"])
 
-    sessions = sessions_resp.data or []
+        return Response(stream_with_context(export()), mimetype="application/x-ndjson")
+
+    # Fetch one extra row to learn whether another page exists
+    rows = _history_page(supabase, user_id, fields, cursor, limit + 1)
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]["created_at"], rows[-1]["session_id"])
 
     return jsonify({
         "data": {
-            "sessions": [
-                {
-                    "session_id": s["session_id"],
-                    "crave_item": s["crave_item"],
-                    "calories": s.get("calories"),
-                    "session_type": s.get("session_type"),
-                    "rating": s.get("rating"),
-                    "created_at": s.get("created_at"),
-                    "challenges": s.get("challenges", []),
-                }
-                for s in sessions
-            ]
+            "sessions": [_project(s, fields) for s in rows],
+            "next_cursor": next_cursor,
         }
     }), 200
+
+
+def _history_page(supabase, user_id: str, fields: tuple, cursor: tuple | None, limit: int) -> list[dict]:
+    """Fetch one keyset page of sessions ordered by (created_at, session_id) desc."""
+    # session_id and created_at are always needed to build the next cursor
+    columns = ["session_id", "created_at"]
+    columns += [f for f in fields if f not in columns and f != "challenges"]
+    if "challenges" in fields:
+        columns.append("challenges(*)")
+
+    query = (
+        supabase.table("sessions")
+        .select(", ".join(columns))
+        .eq("user_id", user_id)
+    )
+    if cursor:
+        created_at, session_id = cursor
+        query = query.or_(
+            f'created_at.lt."{created_at}",'
+            f'and(created_at.eq."{created_at}",session_id.lt.{session_id})'
+        )
+    resp = (
+        query.order("created_at", desc=True)
+        .order("session_id", desc=True)
+        .limit(limit)
+        .execute()
+    )
+    return resp.data or []
+
+
+def _project(session: dict, fields: tuple) -> dict:
+    return {f: session.get(f, [] if f == "challenges" else None) for f in fields}
+
+
+def _encode_cursor(created_at: str, session_id: str) -> str:
+    raw = json.dumps([created_at, session_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        created_at, session_id = json.loads(raw)
+        uuid.UUID(session_id)
+        datetime.fromisoformat(created_at)
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
+    return created_at, session_id
@@ -0,0 +1,56 @@
+"""Fire concurrent accepts at one invite link and check exactly one wins.
+
+Usage:
+    python scripts/check_invite_race.py <invite_token> <bearer_token> [<bearer_token> ...]
+
+Each bearer token should belong to a different invitee. Set BASE_URL to
+point at a running server (default http://localhost:5000).
+"""
+
+import os
+import sys
+import threading
+
+import requests
+
+BASE_URL = os.getenv("BASE_URL", "http://localhost:5000")
+
+
+def main(invite_token: str, bearer_tokens: list[str]) -> int:
+    barrier = threading.Barrier(len(bearer_tokens))
+    results: list[tuple[int, dict]] = []
+    lock = threading.Lock()
+
+    def accept(bearer: str):
+        barrier.wait()
+        resp = requests.post(
+            f"{BASE_URL}/invite/respond",
+            json={"invite_token": invite_token, "action": "accept"},
+            headers={"Authorization": f"Bearer {bearer}"},
+            timeout=30,
+        )
+        with lock:
+            results.append((resp.status_code, resp.json()))
+
+    threads = [threading.Thread(target=accept, args=(t,)) for t in bearer_tokens]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    winners = [body for status, body in results if status == 200]
+    for status, body in results:
+        print(status, body)
+
+    if len(winners) != 1:
+        print(f"FAIL: expected exactly one successful accept, got {len(winners)}")
+        return 1
+    print("OK: exactly one accept succeeded")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(main(sys.argv[1], sys.argv[2:]))
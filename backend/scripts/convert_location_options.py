@@ -0,0 +1,43 @@
+"""Convert old sessions.location_options blobs into the places table and narrow columns.
+
+Usage:
+    python scripts/convert_location_options.py [<batch_size>]
+
+Run after migrations/008_places_table.sql, with SUPABASE_SERVICE_ROLE_KEY
+set: only the service role may execute the function. Calls convert_location_options()
+one batch at a time (default 500 rows) until nothing is left, pausing
+between batches so the conversion does not compete with live traffic.
+Safe to stop and re-run.
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import get_supabase_service_client  # noqa: E402
+
+PAUSE_SECONDS = 0.2
+
+
+def main(batch_size: int) -> int:
+    supabase = get_supabase_service_client()
+    total = 0
+    while True:
+        resp = supabase.rpc("convert_location_options", {"p_batch_size": batch_size}).execute()
+        converted = resp.data or 0
+        if not converted:
+            break
+        total += converted
+        print(f"converted {total} sessions")
+        time.sleep(PAUSE_SECONDS)
+    print(f"OK: {total} sessions converted, none left")
+    return 0
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        print(__doc__)
+        sys.exit(2)
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) == 2 else 500))
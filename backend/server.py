@@ -0,0 +1,153 @@
+"""Production entry point.
+
+    python server.py                  # serve with Gunicorn (settings from gunicorn.conf.py)
+    python server.py --check-startup  # time imports + warm-up, fail if over budget
+
+The app is imported and warmed once in the master process, before the
+workers are forked, so every worker starts with the same read-only state
+(copy-on-write): the rank table, the Swagger spec and a first leaderboard
+snapshot. Network clients (Supabase, OpenAI, Places) are dropped again
+before forking, and each worker opens its own on first use.
+"""
+
+import os
+import sys
+import time
+
+WORKER_CLASS = os.getenv("WORKER_CLASS", "gevent")
+
+if WORKER_CLASS == "gevent":
+    # Patch before anything else is imported: locks, events and sockets
+    # created while preloading must be the cooperative ones workers use.
+    from gevent import monkey
+
+    monkey.patch_all()
+
+import importlib  # noqa: E402
+import logging  # noqa: E402
+import runpy  # noqa: E402
+
+STARTUP_BUDGET_SECONDS = float(os.getenv("STARTUP_BUDGET_SECONDS", "5"))
+CONFIG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")
+
+# Imported in this order so each stage's time covers only what it adds
+IMPORT_STAGES = [
+    ("flask", ["flask", "flask_cors", "flasgger"]),
+    ("supabase", ["supabase"]),
+    ("openai", ["openai"]),
+    ("googlemaps", ["googlemaps"]),
+    ("app", ["app"]),
+]
+
+# Must never be imported by the serving path (rag/ is not wired in)
+FORBIDDEN_MODULES = ["langchain", "faiss"]
+
+logger = logging.getLogger("server")
+
+
+def load_app(timings: dict):
+    """Import the app stage by stage, recording how long each stage took."""
+    for stage, modules in IMPORT_STAGES:
+        start = time.perf_counter()
+        for name in modules:
+            importlib.import_module(name)
+        timings[f"import:{stage}"] = time.perf_counter() - start
+    return sys.modules["app"]
+
+
+def warm_up(app_module, timings: dict):
+    """Build the state every worker should inherit instead of rebuilding it."""
+    from config import get_supabase_client
+    from services import leaderboard, rank_service
+
+    start = time.perf_counter()
+    rank_service.load_ranks()  # falls back to the seeded defaults on error
+    timings["warm:ranks"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with app_module.app.test_request_context():
+        app_module.swagger.get_apispecs("apispec")
+    timings["warm:swagger"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    try:
+        leaderboard.load_from_db(get_supabase_client())
+    except Exception as exc:
+        # Workers load it on first use instead
+        logger.warning("leaderboard preload skipped: %s", exc)
+    timings["warm:leaderboard"] = time.perf_counter() - start
+
+
+def drop_network_clients():
+    """Forget every client that holds sockets, so no connection is shared across fork."""
+    import config
+    from services import http_pool, llm_service, places_service
+
+    config.get_supabase_client.cache_clear()
+    config.get_supabase_service_client.cache_clear()
+    llm_service._get_client.cache_clear()
+    places_service._get_gmaps_client.cache_clear()
+    http_pool.close_all()
+
+
+def report(timings: dict, out=sys.stderr):
+    total = sum(timings.values())
+    for name, seconds in timings.items():
+        print(f"{name:<20} {seconds * 1000:8.1f} ms", file=out)
+    print(f"{'total':<20} {total * 1000:8.1f} ms (budget {STARTUP_BUDGET_SECONDS * 1000:.0f} ms)", file=out)
+    return total
+
+
+def check_startup() -> int:
+    timings: dict[str, float] = {}
+    app_module = load_app(timings)
+    warm_up(app_module, timings)
+    drop_network_clients()
+    total = report(timings)
+
+    failures = []
+    heavy = [name for name in FORBIDDEN_MODULES if name in sys.modules]
+    if heavy:
+        failures.append(f"imported on the serving path: {heavy}")
+    if total > STARTUP_BUDGET_SECONDS:
+        failures.append(f"startup took {total:.2f}s, budget is {STARTUP_BUDGET_SECONDS:.2f}s")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    if not failures:
+        print("OK: startup within budget", file=sys.stderr)
+    return 1 if failures else 0
+
+
+def serve():
+    from gunicorn.app.base import BaseApplication
+
+    # Read first: it also sets up the environment the app is imported with
+    settings = runpy.run_path(CONFIG_PATH)
+
+    timings: dict[str, float] = {}
+    app_module = load_app(timings)
+    warm_up(app_module, timings)
+    drop_network_clients()
+    report(timings)
+
+    class Server(BaseApplication):
+        def load_config(self):
+            for key, value in settings.items():
+                if key in self.cfg.settings and value is not None:
+                    self.cfg.set(key, value)
+            self.cfg.set("preload_app", True)
+
+        def load(self):
+            return app_module.app
+
+    Server().run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    if sys.argv[1:] == ["--check-startup"]:
+        sys.exit(check_startup())
+    if sys.argv[1:]:
+        print(__doc__)
+        sys.exit(2)
+    serve()
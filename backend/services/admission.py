@@ -0,0 +1,255 @@
+"""Admission control for the endpoints that call the LLM.
+
+Each such request takes one token from its user's bucket and one from a
+worker-wide bucket, and holds one of LLM_MAX_CONCURRENT slots while it
+runs. A user over their rate gets 429 at once. Otherwise a request that
+cannot start waits in a bounded queue, ordered by priority, so creating a
+match goes ahead of regenerating options. When the queue is full a
+request is turned away with 503 (or pushes out a lower-priority waiter),
+and a request that waits longer than LLM_QUEUE_TIMEOUT_SECONDS gives up.
+Both carry Retry-After. Endpoints without @admit (or slot()) never wait here.
+"""
+
+import heapq
+import itertools
+import math
+import threading
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+from flask import g, jsonify
+
+from config import (
+    ADMISSION_ENABLED,
+    LLM_BURST,
+    LLM_MAX_CONCURRENT,
+    LLM_QUEUE_SIZE,
+    LLM_QUEUE_TIMEOUT_SECONDS,
+    LLM_RATE_PER_SECOND,
+    LLM_USER_BURST,
+    LLM_USER_RATE_PER_MINUTE,
+)
+from services.cache import TTLCache
+
+# Lower runs first
+HIGH = 0  # creating a match: another player may be waiting on it
+NORMAL = 1  # the main session flow
+LOW = 2  # regenerating options the user already has
+
+PRIORITY_NAMES = {HIGH: "high", NORMAL: "normal", LOW: "low"}
+OUTCOMES = ("admitted", "user_limited", "shed")
+
+
+class TokenBucket:
+    """*rate* tokens per second, holding at most *burst*. Not thread-safe on its own."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self, now: float) -> bool:
+        self._refill(now)
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+    def give_back(self, now: float):
+        """Return a token taken for work that never ran."""
+        self._refill(now)
+        self.tokens = min(self.burst, self.tokens + 1)
+
+    def wait_time(self, now: float) -> float:
+        """Seconds until a token is available."""
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class _Waiter:
+    __slots__ = ("priority", "seq", "evicted")
+
+    def __init__(self, priority: int, seq: int):
+        self.priority = priority
+        self.seq = seq
+        self.evicted = False
+
+    def __lt__(self, other):
+        return (self.priority, self.seq) < (other.priority, other.seq)
+
+
+class AdmissionController:
+    """Concurrency slots, a worker-wide token bucket and a priority queue in front of them."""
+
+    def __init__(self, max_concurrent: int, queue_size: int, queue_timeout: float, rate: float, burst: float):
+        self.max_concurrent = max_concurrent
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self._bucket = TokenBucket(rate, burst)
+        self._waiting: list[_Waiter] = []  # heap
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def acquire(self, priority: int) -> float | None:
+        """Take a slot. Returns None once admitted, else the seconds to suggest in Retry-After.
+
+        Call release() after an admitted request finishes.
+        """
+        deadline = time.monotonic() + self.queue_timeout
+        with self._cond:
+            if not self._waiting and self._try_start(time.monotonic()):
+                return None
+            if len(self._waiting) >= self.queue_size:
+                if not self._waiting:
+                    return self._retry_after()  # LLM_QUEUE_SIZE=0: no queueing at all
+                lowest = max(self._waiting)
+                if lowest.priority <= priority:
+                    return self._retry_after()
+                self._remove(lowest)
+                lowest.evicted = True
+                self._cond.notify_all()
+            waiter = _Waiter(priority, next(self._seq))
+            heapq.heappush(self._waiting, waiter)
+
+            while True:
+                if waiter.evicted:
+                    return self._retry_after()
+                now = time.monotonic()
+                if self._waiting[0] is waiter and self._try_start(now):
+                    heapq.heappop(self._waiting)
+                    self._cond.notify_all()  # the next waiter is now at the front
+                    return None
+                if now >= deadline:
+                    self._remove(waiter)
+                    self._cond.notify_all()
+                    return self._retry_after()
+                timeout = deadline - now
+                if self._waiting[0] is waiter and self.active < self.max_concurrent:
+                    timeout = min(timeout, self._bucket.wait_time(now))  # only short of a token
+                self._cond.wait(timeout)
+
+    def release(self):
+        with self._cond:
+            self.active -= 1
+            self._cond.notify_all()
+
+    def waiting(self) -> int:
+        return len(self._waiting)
+
+    def _try_start(self, now: float) -> bool:
+        if self.active >= self.max_concurrent or not self._bucket.take(now):
+            return False
+        self.active += 1
+        return True
+
+    def _remove(self, waiter: _Waiter):
+        self._waiting.remove(waiter)
+        heapq.heapify(self._waiting)
+
+    def _retry_after(self) -> float:
+        """Roughly how long until the requests queued now have started."""
+        return max(1.0, (len(self._waiting) + 1) / self._bucket.rate)
+
+
+_controller = AdmissionController(
+    LLM_MAX_CONCURRENT, LLM_QUEUE_SIZE, LLM_QUEUE_TIMEOUT_SECONDS, LLM_RATE_PER_SECOND, LLM_BURST
+)
+_user_rate = LLM_USER_RATE_PER_MINUTE / 60
+# An idle user's bucket is full again after burst / rate seconds, so dropping it then changes nothing
+_user_buckets = TTLCache(maxsize=100_000, default_ttl=LLM_USER_BURST / _user_rate)
+_lock = threading.Lock()
+_outcomes = {(name, outcome): 0 for name in PRIORITY_NAMES.values() for outcome in OUTCOMES}
+
+
+def admit(priority: int):
+    """Decorator that runs the endpoint only once admitted. Apply below ``require_auth``."""
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            with slot(priority) as rejected:
+                if rejected is not None:
+                    return rejected
+                return f(*args, **kwargs)
+
+        return decorated
+
+    return decorator
+
+
+@contextmanager
+def slot(priority: int):
+    """Admit the current user's request for the ``with`` block.
+
+    Yields None once admitted, or the 429/503 response to return instead.
+    For endpoints that only sometimes call the LLM, around that call.
+    """
+    if not ADMISSION_ENABLED:
+        yield None
+        return
+
+    wait = _take_user_token(g.user_id)
+    if wait:
+        _count(priority, "user_limited")
+        yield _reject("Too many requests. Please slow down.", 429, wait)
+        return
+
+    retry_after = _controller.acquire(priority)
+    if retry_after is not None:
+        # Shed work did not run, so it does not count against the user's rate
+        _refund_user_token(g.user_id)
+        _count(priority, "shed")
+        yield _reject("The server is busy. Please try again shortly.", 503, retry_after)
+        return
+    _count(priority, "admitted")
+    try:
+        yield None
+    finally:
+        _controller.release()
+
+
+def stats() -> dict:
+    """Requests running and queued now, and outcomes per priority since start."""
+    with _lock:
+        outcomes = dict(_outcomes)
+    return {"active": _controller.active, "waiting": _controller.waiting(), "outcomes": outcomes}
+
+
+def _take_user_token(user_id: str) -> float:
+    """0 if *user_id* had a token, else the seconds until they will."""
+    now = time.monotonic()
+    with _lock:
+        bucket = _user_buckets.peek(user_id)
+        if bucket is None:
+            bucket = TokenBucket(_user_rate, LLM_USER_BURST)
+        if bucket.take(now):
+            _user_buckets.set(user_id, bucket)  # refreshes the TTL
+            return 0.0
+        return bucket.wait_time(now)
+
+
+def _refund_user_token(user_id: str):
+    with _lock:
+        bucket = _user_buckets.peek(user_id)
+        if bucket is not None:
+            bucket.give_back(time.monotonic())
+
+
+def _count(priority: int, outcome: str):
+    with _lock:
+        _outcomes[(PRIORITY_NAMES[priority], outcome)] += 1
+
+
+def _reject(message: str, status: int, retry_after: float):
+    response = jsonify({"error": message})
+    response.headers["Retry-After"] = str(math.ceil(retry_after))
+    return response, status
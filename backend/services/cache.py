@@ -0,0 +1,88 @@
+import threading
+import time
+import weakref
+from collections import OrderedDict
+
+# name -> cache, for caches created with a name (reported by /metrics)
+_named: "weakref.WeakValueDictionary[str, TTLCache]" = weakref.WeakValueDictionary()
+
+
+class TTLCache:
+    """Small thread-safe LRU cache whose entries expire after a per-entry TTL.
+
+    Keeps hit/miss counters so callers can report cache effectiveness.
+    Pass *name* to have the cache listed by named_caches().
+    """
+
+    def __init__(self, maxsize: int = 1024, default_ttl: float = 60.0, name: str | None = None):
+        self.name = name
+        self.maxsize = maxsize
+        self.default_ttl = default_ttl
+        self.hits = 0
+        self.misses = 0
+        self._data: OrderedDict = OrderedDict()
+        self._lock = threading.Lock()
+        if name is not None:
+            _named[name] = self
+
+    def get(self, key, default=None):
+        """Return the cached value for *key*, or *default* if missing/expired."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def peek(self, key, default=None):
+        """Like get(), but does not count towards hit/miss stats or LRU order."""
+        with self._lock:
+            entry = self._data.get(key)
+        if entry is None or entry[1] <= time.monotonic():
+            return default
+        return entry[0]
+
+    def set(self, key, value, ttl: float | None = None):
+        """Store *value* under *key* for *ttl* seconds (default TTL if omitted)."""
+        ttl = self.default_ttl if ttl is None else ttl
+        if ttl <= 0:
+            self.invalidate(key)
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def invalidate(self, key):
+        """Drop *key* from the cache if present."""
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": (self.hits / total) if total else 0.0,
+        }
+
+
+def named_caches() -> dict[str, TTLCache]:
+    return dict(_named)
@@ -0,0 +1,90 @@
+"""Candidate pools: generate every page of options in one LLM call, then page locally.
+
+The first generation asks the model for enough items to cover the first
+page and every regeneration (pool_size). Near-duplicates are dropped
+(distinct), the first page is shown, and the rest is stored on the
+session. Each regenerate call then takes the next page (take) instead of
+calling the LLM again.
+
+Near-duplicates are found by cosine similarity of hashed character
+trigram vectors. "Spicy ramen" and "Spicy Ramen Bowl" share most of their
+trigrams, so they are caught even when the model rewords an item. Comparing
+a pool of 25 items takes about a millisecond and needs no embedding API.
+"""
+
+import math
+import re
+import unicodedata
+
+import numpy as np
+import xxhash
+
+VECTOR_DIMENSIONS = 1 << 10  # trigram buckets; a few collisions barely move the similarity
+DUPLICATE_SIMILARITY = 0.65  # at or above this, two items count as the same
+OVERSHOOT = 1.25  # ask for this much more than the pages need, to cover dropped duplicates
+
+_NON_WORD = re.compile(r"[^a-z0-9]+")
+
+
+def pool_size(page_size: int, pages: int) -> int:
+    """How many items to ask the model for, to fill *pages* pages after deduplication."""
+    return math.ceil(page_size * pages * OVERSHOOT)
+
+
+def distinct(items: list[dict], key: str) -> list[dict]:
+    """*items* in order, minus any whose *key* text is a near-duplicate of an earlier one."""
+    items = [item for item in items if isinstance(item, dict)]
+    if len(items) < 2:
+        return items
+    similarity = _vectors([str(item.get(key) or "") for item in items])
+    similarity = similarity @ similarity.T
+    kept: list[int] = []
+    for i in range(len(items)):
+        if not kept or similarity[i, kept].max() < DUPLICATE_SIMILARITY:
+            kept.append(i)
+    return [items[i] for i in kept]
+
+
+def take(pool: list[dict], page_size: int, group_key: str | None = None, groups: tuple = ()) -> tuple[list, list]:
+    """(next page, rest of the pool).
+
+    With *group_key*, the page starts with the first remaining item of each
+    of *groups* in that order (e.g. one easy, one medium and one hard
+    challenge) and is filled up from the front of the pool.
+    """
+    chosen: list[int] = []
+    if group_key:
+        for group in groups:
+            index = next(
+                (i for i, item in enumerate(pool) if item.get(group_key) == group and i not in chosen), None
+            )
+            if index is not None and len(chosen) < page_size:
+                chosen.append(index)
+    for i in range(len(pool)):
+        if len(chosen) >= page_size:
+            break
+        if i not in chosen:
+            chosen.append(i)
+    page = [pool[i] for i in chosen]
+    rest = [item for i, item in enumerate(pool) if i not in chosen]
+    return page, rest
+
+
+def _vectors(texts: list[str]) -> np.ndarray:
+    """Hashed character trigram counts weighted by rarity across *texts*, L2-normalised."""
+    cells = []  # row * VECTOR_DIMENSIONS + trigram bucket, one per trigram occurrence
+    for row, text in enumerate(texts):
+        folded = unicodedata.normalize("NFKD", text.lower()).encode("ascii", "ignore").decode()  # crêpe -> crepe
+        padded = f"  {_NON_WORD.sub(' ', folded).strip()} "
+        offset = row * VECTOR_DIMENSIONS
+        cells += [
+            offset + (xxhash.xxh3_64_intdigest(padded[i:i + 3]) & (VECTOR_DIMENSIONS - 1))
+            for i in range(len(padded) - 2)
+        ]
+    vectors = np.bincount(cells, minlength=len(texts) * VECTOR_DIMENSIONS).astype(np.float32)
+    vectors = vectors.reshape(len(texts), VECTOR_DIMENSIONS)
+    # Trigrams most of the pool shares ("to burn ~300 kcal", "crepe") say little about any one item
+    document_frequency = np.count_nonzero(vectors, axis=0)
+    vectors *= np.log((1 + len(texts)) / (1 + document_frequency)) + 1
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-9)
@@ -0,0 +1,128 @@
+"""Compress JSON and text responses with zstd or gzip, by Accept-Encoding.
+
+Whole responses smaller than COMPRESSION_MIN_BYTES go out as they are; the
+framing costs more than it saves. Streamed responses (the NDJSON history
+export, the invite SSE stream) are compressed as they are produced: SSE
+output is flushed after every event, so clients still see each one at once,
+other streams every STREAM_FLUSH_BYTES of input.
+"""
+
+import gzip
+import threading
+import zlib
+
+import zstandard
+from flask import request
+
+from config import (
+    COMPRESSION_ENABLED,
+    COMPRESSION_GZIP_LEVEL,
+    COMPRESSION_MIN_BYTES,
+    COMPRESSION_ZSTD_LEVEL,
+)
+
+ENCODINGS = ["zstd", "gzip"]  # preferred first when the client accepts both equally
+STREAM_FLUSH_BYTES = 64 * 1024
+
+_COMPRESSIBLE = {
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "image/svg+xml",
+}
+
+_lock = threading.Lock()
+_stats = {encoding: {"responses": 0, "bytes_in": 0, "bytes_out": 0} for encoding in ENCODINGS}
+
+
+def init_app(app):
+    """Compress *app*'s responses. Register after other after_request hooks so it runs first."""
+    if not COMPRESSION_ENABLED:
+        return
+    app.after_request(_compress)
+
+
+def stats() -> dict:
+    """Responses compressed and bytes before/after, per encoding, since start."""
+    with _lock:
+        return {encoding: dict(counts) for encoding, counts in _stats.items()}
+
+
+def _compress(response):
+    if not _compressible(response):
+        return response
+    response.vary.add("Accept-Encoding")
+    encoding = request.accept_encodings.best_match(ENCODINGS)
+    if encoding is None:
+        return response
+
+    if response.is_streamed:
+        original = response.response
+        if hasattr(original, "close"):
+            response.call_on_close(original.close)  # e.g. stream_with_context's cleanup
+        flush_each_chunk = response.mimetype == "text/event-stream"
+        response.response = _stream(response.iter_encoded(), encoding, flush_each_chunk)
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESSION_MIN_BYTES:
+            return response
+        compressed = _compress_bytes(data, encoding)
+        _count(encoding, len(data), len(compressed), responses=1)
+        response.set_data(compressed)  # also sets Content-Length
+
+    response.headers["Content-Encoding"] = encoding
+    # The encoded body is a different representation, so a strong ETag no longer holds
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def _compressible(response) -> bool:
+    if response.status_code < 200 or response.status_code in (204, 206, 304):
+        return False
+    if response.direct_passthrough or "Content-Encoding" in response.headers:
+        return False
+    if "no-transform" in (response.headers.get("Cache-Control") or ""):
+        return False
+    mimetype = response.mimetype or ""
+    return mimetype.startswith("text/") or mimetype in _COMPRESSIBLE
+
+
+def _compress_bytes(data: bytes, encoding: str) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compress(data)
+    return gzip.compress(data, compresslevel=COMPRESSION_GZIP_LEVEL, mtime=0)
+
+
+def _stream(chunks, encoding: str, flush_each_chunk: bool):
+    if encoding == "zstd":
+        compressor = zstandard.ZstdCompressor(level=COMPRESSION_ZSTD_LEVEL).compressobj()
+        sync_flush = zstandard.COMPRESSOBJ_FLUSH_BLOCK
+    else:
+        compressor = zlib.compressobj(COMPRESSION_GZIP_LEVEL, zlib.DEFLATED, 31)  # 31: gzip framing
+        sync_flush = zlib.Z_SYNC_FLUSH
+
+    _count(encoding, 0, 0, responses=1)
+    unflushed = 0
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        unflushed += len(chunk)
+        if flush_each_chunk or unflushed >= STREAM_FLUSH_BYTES:
+            out += compressor.flush(sync_flush)
+            unflushed = 0
+        _count(encoding, len(chunk), len(out))
+        if out:
+            yield out
+    tail = compressor.flush()
+    _count(encoding, 0, len(tail))
+    yield tail
+
+
+def _count(encoding: str, bytes_in: int, bytes_out: int, responses: int = 0):
+    with _lock:
+        counts = _stats[encoding]
+        counts["responses"] += responses
+        counts["bytes_in"] += bytes_in
+        counts["bytes_out"] += bytes_out
@@ -0,0 +1,222 @@
+import logging
+import os
+import socket
+import threading
+
+from flask import g, has_app_context
+
+from config import PUBSUB_BACKEND, ROW_CACHE_TTL_SECONDS
+from services import pubsub
+from services.cache import TTLCache
+from services.pubsub import get_pubsub
+
+logger = logging.getLogger(__name__)
+
+ROW_CACHE_MAX_ENTRIES = 10000
+INVALIDATION_CHANNEL = "row_cache:invalidate"
+
+_PRIMARY_KEYS = {"sessions": "session_id", "profiles": "user_id"}
+_OWNER_COLUMNS = {"sessions": ("user_id",)}  # always read, for the ownership check
+
+# A row cached across requests is only safe if every worker hears about every
+# write to it, so the cross-request cache needs a pub/sub backend shared by
+# all workers. Refuse to start with one that only reaches this process.
+CROSS_REQUEST_CACHE = ROW_CACHE_TTL_SECONDS > 0
+if CROSS_REQUEST_CACHE and not pubsub.is_shared(PUBSUB_BACKEND):
+    raise RuntimeError(
+        f"ROW_CACHE_TTL_SECONDS={ROW_CACHE_TTL_SECONDS:g} needs a PUBSUB_BACKEND shared by all "
+        f"workers, but '{PUBSUB_BACKEND}' only reaches this process. "
+        "Configure a shared backend or set ROW_CACHE_TTL_SECONDS=0."
+    )
+
+# table -> primary key value -> row. Holds private copies; callers get their own.
+_caches = {
+    table: TTLCache(maxsize=ROW_CACHE_MAX_ENTRIES, default_ttl=ROW_CACHE_TTL_SECONDS, name=f"rows:{table}")
+    for table in _PRIMARY_KEYS
+}
+
+_caches_pid = os.getpid()  # process that created the caches (a forked child must not trust them)
+_listener_lock = threading.Lock()
+_listener_pid = None
+
+
+# ------------------------------------------------------------------
+# Reads
+# ------------------------------------------------------------------
+
+def get_session(
+    supabase, session_id: str, user_id: str, columns: tuple[str, ...], fresh: bool = False
+) -> dict | None:
+    """Return the user's session row, or None if it does not exist or is not theirs.
+
+    Only *columns* (plus session_id and user_id) are guaranteed to be present.
+    """
+    row = _get(supabase, "sessions", session_id, columns, fresh)
+    if row is None or row.get("user_id") != user_id:
+        return None
+    return row
+
+
+def get_profile(supabase, user_id: str, columns: tuple[str, ...], fresh: bool = False) -> dict | None:
+    """Return the user's profile row, with at least *columns*.
+
+    Pass ``fresh=True`` before a read-modify-write (e.g. adding points), so
+    the value comes from the database rather than another request's copy.
+    """
+    return _get(supabase, "profiles", user_id, columns, fresh)
+
+
+def _get(supabase, table: str, key: str, columns: tuple[str, ...], fresh: bool) -> dict | None:
+    """Look *key* up in the request's identity map, then the row cache, then the database.
+
+    Within one request every lookup of the same row returns the same dict,
+    so changes made to it by the handler are seen by later lookups. A copy
+    missing some of *columns* is completed with a query for just those.
+    """
+    wanted = {_PRIMARY_KEYS[table], *_OWNER_COLUMNS.get(table, ()), *columns}
+    identity_map = _identity_map()
+    row = identity_map.get((table, key))
+    if not fresh and row is not None and wanted <= row.keys():
+        return row
+
+    if row is None and not fresh and CROSS_REQUEST_CACHE:
+        _ensure_listener()
+        cached = _caches[table].get(key)
+        if cached is not None:
+            row = identity_map[(table, key)] = dict(cached)
+            if wanted <= row.keys():
+                return row
+
+    missing = wanted if fresh or row is None else wanted - row.keys()
+    resp = supabase.table(table).select(", ".join(sorted(missing))).eq(_PRIMARY_KEYS[table], key).execute()
+    if not resp.data:
+        return None
+    if row is None:
+        row = identity_map[(table, key)] = resp.data[0]
+    else:
+        row.update(resp.data[0])
+    if CROSS_REQUEST_CACHE:
+        _caches[table].set(key, dict(row))
+    return row
+
+
+# ------------------------------------------------------------------
+# Writes: everything that changes a cached row goes through here
+# ------------------------------------------------------------------
+
+def update_session(supabase, session_id: str, fields: dict, expect: dict | None = None) -> dict | None:
+    """UPDATE a session and cache the result.
+
+    *expect* adds ``column = value`` conditions (optimistic checks). Returns
+    the updated row, or None if no row matched.
+    """
+    return _update(supabase, "sessions", session_id, fields, expect)
+
+
+def update_profile(supabase, user_id: str, fields: dict) -> dict | None:
+    return _update(supabase, "profiles", user_id, fields, None)
+
+
+def _update(supabase, table: str, key: str, fields: dict, expect: dict | None) -> dict | None:
+    query = supabase.table(table).update(fields).eq(_PRIMARY_KEYS[table], key)
+    for column, value in (expect or {}).items():
+        query = query.eq(column, value)
+    resp = query.execute()
+    if not resp.data:
+        # Nothing matched: our copy (if any) is what made the caller expect otherwise
+        forget(table, key)
+        return None
+    remember(table, resp.data[0])
+    return _identity_map().get((table, key), resp.data[0])
+
+
+def remember(table: str, row: dict):
+    """Cache a row the caller just read or wrote (e.g. the result of an insert)."""
+    key = row[_PRIMARY_KEYS[table]]
+    identity_map = _identity_map()
+    if (table, key) in identity_map:
+        identity_map[(table, key)].clear()
+        identity_map[(table, key)].update(row)
+    else:
+        identity_map[(table, key)] = dict(row)
+    if CROSS_REQUEST_CACHE:
+        _caches[table].set(key, dict(row))
+        _publish(table, key)
+
+
+def patch(table: str, key: str, fields: dict):
+    """Apply a write that is still pending (write-behind) to our cached copies.
+
+    Lets this worker read its own deferred writes. Other workers are not
+    told; they would only re-read the not-yet-updated row.
+    """
+    identity_map = _identity_map()
+    if (table, key) in identity_map:
+        identity_map[(table, key)].update(fields)
+    cached = _caches[table].peek(key) if CROSS_REQUEST_CACHE else None
+    if cached is not None:
+        _caches[table].set(key, {**cached, **fields})
+
+
+def forget(table: str, key: str):
+    """Drop every cached copy of a row, here and (via pub/sub) in other workers."""
+    _identity_map().pop((table, key), None)
+    if CROSS_REQUEST_CACHE:
+        _caches[table].invalidate(key)
+        _publish(table, key)
+
+
+def stats() -> dict:
+    return {table: cache.stats() for table, cache in _caches.items()}
+
+
+# ------------------------------------------------------------------
+# Internals
+# ------------------------------------------------------------------
+
+def _identity_map() -> dict:
+    if not has_app_context():
+        return {}
+    return g.setdefault("_loaded_rows", {})
+
+
+def _origin() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _publish(table: str, key: str):
+    try:
+        get_pubsub().publish(INVALIDATION_CHANNEL, {"origin": _origin(), "table": table, "key": key})
+    except Exception:
+        logger.exception("row cache invalidation publish failed")
+
+
+def _ensure_listener():
+    """Start (once per process) the thread that applies other workers' invalidations."""
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+        if os.getpid() != _caches_pid:
+            # Forked after the parent filled its caches
+            for cache in _caches.values():
+                cache.clear()
+        subscription = get_pubsub().subscribe(INVALIDATION_CHANNEL)
+        threading.Thread(
+            target=_listen, args=(subscription,), name="row-cache-invalidation", daemon=True
+        ).start()
+
+
+def _listen(subscription):
+    origin = _origin()
+    while True:
+        message = subscription.get()
+        if not message or message.get("origin") == origin:
+            continue
+        cache = _caches.get(message.get("table"))
+        if cache is not None:
+            cache.invalidate(message.get("key"))
+
@@ -0,0 +1,215 @@
+import os
+import threading
+
+import httpx
+import requests
+from requests.adapters import HTTPAdapter
+
+from config import HTTP2_ENABLED, HTTP_POOL_MAX_CONNECTIONS, HTTP_POOL_MAX_KEEPALIVE, STANDINS
+
+HTTP_CONNECT_TIMEOUT_SECONDS = 5
+HTTP_KEEPALIVE_EXPIRY_SECONDS = 60
+
+# Per-upstream read timeouts. LLM completions take seconds; PostgREST and
+# Places answer in well under one.
+UPSTREAM_TIMEOUTS = {
+    "supabase": 30,
+    "openai": 60,
+    "places": 10,
+}
+
+_lock = threading.Lock()
+_clients: dict[str, object] = {}  # name -> httpx.Client / requests.Session
+_stats: dict[str, "PoolStats"] = {}
+_pid = os.getpid()
+
+
+class PoolStats:
+    """Counters for one upstream's connection pool."""
+
+    def __init__(self, name: str, max_connections: int, http2: bool):
+        self.name = name
+        self.max_connections = max_connections
+        self.http2 = http2
+        self.requests = 0
+        self.in_flight = 0
+        self.new_connections = 0
+        self.tls_handshakes = 0
+        self.saturated = 0  # requests that found every pooled connection busy
+        self.open_connections = 0
+        self._lock = threading.Lock()
+
+    def begin(self, saturated: bool):
+        with self._lock:
+            self.requests += 1
+            self.in_flight += 1
+            if saturated:
+                self.saturated += 1
+
+    def end(self, new_connection: bool, tls: bool, open_connections: int):
+        with self._lock:
+            self.in_flight -= 1
+            self.new_connections += new_connection
+            self.tls_handshakes += tls
+            self.open_connections = open_connections
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            reused = self.requests - self.in_flight - self.new_connections
+            done = self.requests - self.in_flight
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "max_connections": self.max_connections,
+                "open_connections": self.open_connections,
+                "new_connections": self.new_connections,
+                "tls_handshakes": self.tls_handshakes,
+                "reuse_ratio": (reused / done) if done else 0.0,
+                "saturated": self.saturated,
+                "http2": self.http2,
+            }
+
+
+class _TracedTransport(httpx.HTTPTransport):
+    """httpx transport that records connection reuse via httpcore trace events."""
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        super().__init__(**kwargs)
+        self.stats = stats
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        events = set()
+        outer_trace = request.extensions.get("trace")
+
+        def trace(event_name, info):
+            events.add(event_name)
+            if outer_trace is not None:
+                outer_trace(event_name, info)
+
+        request.extensions["trace"] = trace
+        connections = self._pool.connections
+        self.stats.begin(
+            saturated=len(connections) >= self.stats.max_connections
+            and not any(c.is_available() for c in connections)
+        )
+        try:
+            return super().handle_request(request)
+        finally:
+            self.stats.end(
+                new_connection="connection.connect_tcp.started" in events,
+                tls="connection.start_tls.started" in events,
+                open_connections=len(self._pool.connections),
+            )
+
+
+class _CountingAdapter(HTTPAdapter):
+    """requests adapter that derives reuse counts from urllib3's per-pool counters."""
+
+    def __init__(self, stats: PoolStats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def send(self, request, **kwargs):
+        before = self._connections_made()
+        self.stats.begin(saturated=self.stats.in_flight >= self.stats.max_connections)
+        try:
+            return super().send(request, **kwargs)
+        finally:
+            new_connection = self._connections_made() > before
+            self.stats.end(
+                new_connection=new_connection,
+                tls=new_connection and request.url.startswith("https"),
+                # idle ones plus those still in use, this one included: requests
+                # only hands the connection back once the body has been read
+                open_connections=self._idle_connections() + self.stats.in_flight,
+            )
+
+    def _pools(self) -> list:
+        pools = self.poolmanager.pools
+        return [pools[key] for key in list(pools.keys()) if key in pools]
+
+    def _connections_made(self) -> int:
+        return sum(pool.num_connections for pool in self._pools())
+
+    def _idle_connections(self) -> int:
+        # urllib3 pads each pool's queue with None placeholders up to maxsize
+        return sum(
+            sum(1 for conn in list(pool.pool.queue) if conn is not None)
+            for pool in self._pools()
+            if pool.pool is not None
+        )
+
+
+def get_httpx_client(name: str) -> httpx.Client:
+    """Return the shared, pooled httpx client for an upstream (supabase, openai)."""
+    return _get(name, _new_httpx_client)
+
+
+def get_requests_session(name: str) -> requests.Session:
+    """Return the shared, pooled requests session for an upstream (places)."""
+    return _get(name, _new_requests_session)
+
+
+def stats() -> dict:
+    """Pool counters per upstream, for /health/pools."""
+    return {name: s.snapshot() for name, s in _stats.items()}
+
+
+def close_all():
+    """Close every pooled connection. Clients are rebuilt on next use."""
+    with _lock:
+        for client in _clients.values():
+            client.close()
+        _clients.clear()
+
+
+def _get(name: str, factory):
+    global _pid
+    client = _clients.get(name)
+    if client is not None and _pid == os.getpid():
+        return client
+    with _lock:
+        if _pid != os.getpid():
+            # Forked: the parent's sockets must not be shared with it
+            _clients.clear()
+            _stats.clear()
+            _pid = os.getpid()
+        if name not in _clients:
+            _clients[name] = factory(name)
+        return _clients[name]
+
+
+def _new_httpx_client(name: str) -> httpx.Client:
+    stats = _stats[name] = PoolStats(name, HTTP_POOL_MAX_CONNECTIONS, HTTP2_ENABLED)
+    limits = httpx.Limits(
+        max_connections=HTTP_POOL_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_POOL_MAX_KEEPALIVE,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    )
+    timeout = httpx.Timeout(UPSTREAM_TIMEOUTS[name], connect=HTTP_CONNECT_TIMEOUT_SECONDS)
+    if name in STANDINS:
+        import standins
+
+        transport = standins.httpx_transport(name)
+    else:
+        transport = _TracedTransport(stats, limits=limits, http2=HTTP2_ENABLED, retries=1)
+    return httpx.Client(transport=transport, timeout=timeout, follow_redirects=True)
+
+
+def _new_requests_session(name: str) -> requests.Session:
+    # urllib3 speaks HTTP/1.1 only
+    stats = _stats[name] = PoolStats(name, HTTP_POOL_MAX_CONNECTIONS, http2=False)
+    adapter = _CountingAdapter(
+        stats,
+        pool_connections=4,
+        pool_maxsize=HTTP_POOL_MAX_CONNECTIONS,
+        max_retries=1,
+    )
+    if name in STANDINS:
+        import standins
+
+        adapter = standins.requests_adapter(name)
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
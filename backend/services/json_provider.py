@@ -0,0 +1,75 @@
+"""Flask JSON provider backed by orjson, used by jsonify() and request.get_json().
+
+orjson handles dicts, lists, datetimes, UUIDs, dataclasses and Enums (including
+the str Enums in models/enums.py) itself, without calling back into Python.
+Output matches Flask's default provider (sorted keys, compact, trailing
+newline), with two differences:
+- datetimes are ISO 8601, like the timestamps Supabase returns, instead of
+  RFC 822
+- non-ASCII text is sent as UTF-8 rather than \\u escapes
+"""
+
+import dataclasses
+import decimal
+import json
+import uuid
+from datetime import date
+from enum import Enum
+
+import orjson
+from flask.json.provider import JSONProvider
+
+
+def _default(o):
+    """Types orjson does not know; the rest only reach here on the stdlib fallback."""
+    if isinstance(o, decimal.Decimal):
+        return str(o)
+    if hasattr(o, "__html__"):
+        return str(o.__html__())
+    if isinstance(o, date):
+        return o.isoformat()
+    if isinstance(o, uuid.UUID):
+        return str(o)
+    if isinstance(o, Enum):
+        return o.value
+    if dataclasses.is_dataclass(o) and not isinstance(o, type):
+        return dataclasses.asdict(o)
+    raise TypeError(f"Object of type {type(o).__name__} is not JSON serializable")
+
+
+class OrjsonProvider(JSONProvider):
+    sort_keys = True  # as Flask's default, so responses stay byte-for-byte stable
+    compact: bool | None = None  # None: indented in debug mode only
+    mimetype = "application/json"
+
+    def dumps(self, obj, **kwargs) -> str:
+        return self._dumps(obj, **kwargs).decode()
+
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return json.loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        # Build the body as bytes; going through dumps() would decode and re-encode it
+        return self._app.response_class(self._dumps(obj, indent=indent) + b"\n", mimetype=self.mimetype)
+
+    def _dumps(self, obj, indent=None, sort_keys=None, default=_default, **kwargs) -> bytes:
+        sort_keys = self.sort_keys if sort_keys is None else sort_keys
+        if not kwargs:
+            # Dicts with int keys (e.g. Swagger response codes) are stringified, as json.dumps does
+            option = orjson.OPT_NON_STR_KEYS
+            if sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, default=default, option=option)
+            except orjson.JSONEncodeError:
+                pass  # e.g. integers wider than 64 bits or nesting deeper than 254; json copes
+        kwargs.setdefault("separators", None if indent else (",", ":"))
+        return json.dumps(
+            obj, default=default, sort_keys=sort_keys, indent=2 if indent else None, **kwargs
+        ).encode()
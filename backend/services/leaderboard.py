@@ -0,0 +1,284 @@
+import logging
+import math
+import random
+import threading
+import time
+
+from services import rank_service
+
+logger = logging.getLogger(__name__)
+
+LEADERBOARD_REFRESH_SECONDS = 300  # full rebuild interval; other workers' awards show up within this
+LEADERBOARD_RETRY_SECONDS = 30  # after a failed background refresh
+LEADERBOARD_SCAN_PAGE_SIZE = 1000
+
+_END_KEY = (math.inf,)  # sorts after every (-points, user_id) key
+_UNKNOWN = object()  # name not loaded yet (user joined the board after the last scan)
+
+
+class _Node:
+    __slots__ = ("key", "next", "width")
+
+    def __init__(self, key, levels: int):
+        self.key = key
+        self.next = [None] * levels
+        self.width = [0] * levels
+
+
+class IndexableSkipList:
+    """Sorted container with O(log n) insert, remove, rank-of-key and select-by-index.
+
+    Each forward link records how many elements it skips over, which is what
+    makes positional lookups logarithmic.
+    """
+
+    def __init__(self, max_levels: int = 24):
+        self.max_levels = max_levels
+        self.size = 0
+        self._end = _Node(_END_KEY, 0)
+        self._head = _Node(None, max_levels)
+        self._head.next = [self._end] * max_levels
+        self._head.width = [1] * max_levels
+
+    def __len__(self):
+        return self.size
+
+    def insert(self, key):
+        chain = [None] * self.max_levels
+        steps_at_level = [0] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key <= key:
+                steps_at_level[level] += node.width[level]
+                node = node.next[level]
+            chain[level] = node
+
+        levels = min(self.max_levels, 1 - int(math.log2(1.0 - random.random())))
+        new = _Node(key, levels)
+        steps = 0
+        for level in range(levels):
+            prev = chain[level]
+            new.next[level] = prev.next[level]
+            prev.next[level] = new
+            new.width[level] = prev.width[level] - steps
+            prev.width[level] = steps + 1
+            steps += steps_at_level[level]
+        for level in range(levels, self.max_levels):
+            chain[level].width[level] += 1
+        self.size += 1
+
+    def remove(self, key):
+        chain = self._chain_before(key)
+        target = chain[0].next[0]
+        if target.key != key:
+            raise KeyError(key)
+        for level in range(len(target.next)):
+            prev = chain[level]
+            prev.width[level] += target.width[level] - 1
+            prev.next[level] = target.next[level]
+        for level in range(len(target.next), self.max_levels):
+            chain[level].width[level] -= 1
+        self.size -= 1
+
+    def index(self, key) -> int:
+        """0-based position of *key*."""
+        node = self._head
+        position = 0
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                position += node.width[level]
+                node = node.next[level]
+        if node.next[0].key != key:
+            raise KeyError(key)
+        return position
+
+    def slice(self, start: int, stop: int) -> list:
+        """Keys at positions [start, stop)."""
+        start = max(0, start)
+        stop = min(self.size, stop)
+        if start >= stop:
+            return []
+        node = self._head
+        remaining = start + 1
+        for level in reversed(range(self.max_levels)):
+            while node.width[level] <= remaining:
+                remaining -= node.width[level]
+                node = node.next[level]
+        keys = []
+        for _ in range(stop - start):
+            keys.append(node.key)
+            node = node.next[0]
+        return keys
+
+    def _chain_before(self, key) -> list:
+        chain = [None] * self.max_levels
+        node = self._head
+        for level in reversed(range(self.max_levels)):
+            while node.next[level].key < key:
+                node = node.next[level]
+            chain[level] = node
+        return chain
+
+
+class Leaderboard:
+    """In-memory ranking of users by total_points (ties broken by user_id)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._list = IndexableSkipList()
+        self._points: dict[str, int] = {}
+        self._names: dict[str, str | None] = {}
+        self.loaded_at: float | None = None
+
+    def rebuild(self, rows: list[dict]):
+        """Replace the board with (user_id, name, total_points) rows."""
+        fresh = IndexableSkipList()
+        points, names = {}, {}
+        for row in rows:
+            user_id = row["user_id"]
+            points[user_id] = row.get("total_points") or 0
+            names[user_id] = row.get("name")
+            fresh.insert((-points[user_id], user_id))
+        with self._lock:
+            self._list, self._points, self._names = fresh, points, names
+            self.loaded_at = time.monotonic()
+
+    def record_points(self, user_id: str, total_points: int):
+        with self._lock:
+            old = self._points.get(user_id)
+            if old == total_points:
+                return
+            if old is not None:
+                self._list.remove((-old, user_id))
+            self._list.insert((-total_points, user_id))
+            self._points[user_id] = total_points
+
+    def record_name(self, user_id: str, name: str | None):
+        with self._lock:
+            self._names[user_id] = name
+
+    def top(self, n: int) -> list[dict]:
+        with self._lock:
+            return self._entries(0, self._list.slice(0, n))
+
+    def around(self, user_id: str, radius: int) -> tuple[dict | None, list[dict]]:
+        """Return the user's own entry and the entries within *radius* places of it."""
+        with self._lock:
+            points = self._points.get(user_id)
+            if points is None:
+                return None, []
+            position = self._list.index((-points, user_id))
+            start = max(0, position - radius)
+            entries = self._entries(start, self._list.slice(start, position + radius + 1))
+        return entries[position - start], entries
+
+    def __len__(self):
+        return len(self._list)
+
+    def _entries(self, start: int, keys: list) -> list[dict]:
+        return [
+            {
+                "position": start + i + 1,
+                "user_id": user_id,
+                "name": self._names.get(user_id, _UNKNOWN),
+                "total_points": -neg_points,
+            }
+            for i, (neg_points, user_id) in enumerate(keys)
+        ]
+
+
+_board = Leaderboard()
+_load_lock = threading.Lock()  # held for the whole of a load, so at most one runs at a time
+_next_refresh_at = 0.0  # monotonic; pushed back after a failed refresh
+
+
+def load_from_db(supabase):
+    """Rebuild the board from a single paged scan over profiles."""
+    rows, start = [], 0
+    while True:
+        resp = (
+            supabase.table("profiles")
+            .select("user_id, name, total_points")
+            .order("user_id")
+            .range(start, start + LEADERBOARD_SCAN_PAGE_SIZE - 1)
+            .execute()
+        )
+        page = resp.data or []
+        rows.extend(page)
+        if len(page) < LEADERBOARD_SCAN_PAGE_SIZE:
+            break
+        start += LEADERBOARD_SCAN_PAGE_SIZE
+    _board.rebuild(rows)
+
+
+def ensure_loaded(supabase):
+    """Load on first use, then refresh in the background every LEADERBOARD_REFRESH_SECONDS.
+
+    Only the first load makes a request wait. After that the current board
+    keeps being served while a single background thread rebuilds it.
+    """
+    loaded_at = _board.loaded_at
+    if loaded_at is None:
+        with _load_lock:
+            if _board.loaded_at is None:
+                load_from_db(supabase)
+        return
+    now = time.monotonic()
+    if now - loaded_at < LEADERBOARD_REFRESH_SECONDS or now < _next_refresh_at:
+        return
+    if not _load_lock.acquire(blocking=False):
+        return  # a refresh is already running
+    threading.Thread(target=_refresh, args=(supabase,), name="leaderboard-refresh", daemon=True).start()
+
+
+def _refresh(supabase):
+    """Rebuild the board; runs with _load_lock held by the caller and releases it."""
+    global _next_refresh_at
+    try:
+        load_from_db(supabase)
+    except Exception:
+        logger.exception("leaderboard refresh failed; serving the previous board")
+        _next_refresh_at = time.monotonic() + LEADERBOARD_RETRY_SECONDS
+    finally:
+        _load_lock.release()
+
+
+def record_points(user_id: str, total_points: int):
+    """Point-award hook: move the user to their new place on the board."""
+    _board.record_points(user_id, total_points)
+
+
+def record_name(user_id: str, name: str | None):
+    _board.record_name(user_id, name)
+
+
+def top(supabase, n: int) -> list[dict]:
+    ensure_loaded(supabase)
+    return _render(supabase, _board.top(n))
+
+
+def around(supabase, user_id: str, radius: int) -> tuple[dict | None, list[dict]]:
+    ensure_loaded(supabase)
+    me, entries = _board.around(user_id, radius)
+    return me, _render(supabase, entries)
+
+
+def _render(supabase, entries: list[dict]) -> list[dict]:
+    """Fill in names for users who joined the board after the last scan, and add rank labels."""
+    missing = [e["user_id"] for e in entries if e["name"] is _UNKNOWN]
+    names = {}
+    if missing:
+        resp = (
+            supabase.table("profiles")
+            .select("user_id, name")
+            .in_("user_id", missing)
+            .execute()
+        )
+        names = {row["user_id"]: row.get("name") for row in resp.data or []}
+        for user_id in missing:
+            _board.record_name(user_id, names.get(user_id))
+    for e in entries:
+        if e["name"] is _UNKNOWN:
+            e["name"] = names.get(e["user_id"])
+        e["rank"] = rank_service.resolve_rank(e["total_points"])
+    return entries
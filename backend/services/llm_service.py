@@ -1,26 +1,40 @@
 import json
+from functools import lru_cache
 
 from openai import OpenAI
 
 from config import OPENAI_API_KEY
-
-_client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
+from services import http_pool, tracing
 
 MODEL = "gpt-4o-mini"
 
 
-def _chat(system_prompt: str, user_prompt: str) -> str:
-    """Low-level helper that calls OpenAI chat completions."""
-    if _client is None:
+@lru_cache(maxsize=1)
+def _get_client() -> OpenAI:
+    """Create the OpenAI client once, on the shared keep-alive connection pool."""
+    if not OPENAI_API_KEY:
         raise RuntimeError("OPENAI_API_KEY is not configured.")
-    response = _client.chat.completions.create(
-        model=MODEL,
-        temperature=0.7,
-        messages=[
-            {"role": "system", "content": system_prompt},
-            {"role": "user", "content": user_prompt},
-        ],
+    return OpenAI(
+        api_key=OPENAI_API_KEY,
+        http_client=http_pool.get_httpx_client("openai"),
+        timeout=http_pool.UPSTREAM_TIMEOUTS["openai"],
     )
+
+
+def _chat(system_prompt: str, user_prompt: str) -> str:
+    """Low-level helper that calls OpenAI chat completions."""
+    with tracing.span("llm", MODEL) as span:
+        response = _get_client().chat.completions.create(
+            model=MODEL,
+            temperature=0.7,
+            messages=[
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt},
+            ],
+        )
+        if response.usage is not None:
+            span.attrs["prompt_tokens"] = response.usage.prompt_tokens
+            span.attrs["completion_tokens"] = response.usage.completion_tokens
     return response.choices[0].message.content
 
 
@@ -43,14 +57,18 @@ def generate_craving_options(
     crave_item: str,
     places: list[dict],
     user_preferences: list[dict] | None = None,
+    count: int | None = None,
+    exclude_items: list[str] | None = None,
 ) -> list[dict]:
     """Return a list of specific craving options based on nearby places.
 
     Each option is a dict with keys: option (str), store (str), description (str).
+    Pass *count* to ask for that many options instead of 4-6 (a candidate pool).
     """
+    how_many = f"{count} clearly different" if count else "4-6"
     system_prompt = (
         "You are a food craving assistant. The user has a generic craving. "
-        "Based on the nearby stores provided, generate 4-6 specific options "
+        f"Based on the nearby stores provided, generate {how_many} specific options "
         "the user can choose from. Each option should be a specific menu item "
         "that satisfies the craving, tied to a real store from the list.\n\n"
         "Return ONLY a JSON array where each element has:\n"
@@ -60,6 +78,22 @@ def generate_craving_options(
         "No markdown, no explanation — just the JSON array."
     )
 
+    raw = _chat(system_prompt, _craving_options_prompt(crave_item, places, user_preferences, exclude_items))
+    try:
+        options = _parse_json(raw)
+        return options[:count] if count and isinstance(options, list) else options
+    except (json.JSONDecodeError, ValueError):
+        # Fallback: return a single generic option
+        return [{"option": crave_item, "store": "Any nearby store", "description": f"A {crave_item}"}]
+
+
+def _craving_options_prompt(
+    crave_item: str,
+    places: list[dict],
+    user_preferences: list[dict] | None = None,
+    exclude_items: list[str] | None = None,
+) -> str:
+    """User message for generate_craving_options: the craving, nearby stores, past orders."""
     places_text = "\n".join(
         f"- {p['name']} ({p['address']}, rating: {p['rating']})"
         for p in places
@@ -77,12 +111,12 @@ def generate_craving_options(
             f"Prioritise options aligned with their history:\n{prefs_text}"
         )
 
-    raw = _chat(system_prompt, user_msg)
-    try:
-        return _parse_json(raw)
-    except (json.JSONDecodeError, ValueError):
-        # Fallback: return a single generic option
-        return [{"option": crave_item, "store": "Any nearby store", "description": f"A {crave_item}"}]
+    if exclude_items:
+        user_msg += (
+            "\n\nDo NOT suggest any of the following (already shown to the user):\n"
+            + "\n".join(f"- {item}" for item in exclude_items)
+        )
+    return user_msg
 
 
 # ------------------------------------------------------------------
@@ -114,21 +148,38 @@ def generate_challenges(
     calories: int,
     user_age: int | None = None,
     user_weight: float | None = None,
+    sets: int = 1,
+    exclude_items: list[str] | None = None,
 ) -> list[dict]:
     """Return 3 physical challenges calibrated to burn roughly *calories*.
 
     Each challenge is a dict with keys: description (str), time_limit (int, minutes).
+    With *sets* > 1, returns up to 3 * *sets* different challenges (a candidate
+    pool), each also tagged with difficulty: "easy", "medium" or "hard".
     """
-    system_prompt = (
-        "You are a fitness challenge creator. The user wants to earn a food "
-        "treat by completing a physical challenge. Generate exactly 3 challenges "
-        "of varying difficulty (easy, medium, hard) that roughly burn the "
-        "given calorie amount.\n\n"
-        "For each challenge include:\n"
-        '  "description": clear instructions on what to do,\n'
-        '  "time_limit": duration in minutes.\n\n'
-        "Return ONLY a JSON array of 3 objects. No markdown, no explanation."
-    )
+    if sets == 1:
+        system_prompt = (
+            "You are a fitness challenge creator. The user wants to earn a food "
+            "treat by completing a physical challenge. Generate exactly 3 challenges "
+            "of varying difficulty (easy, medium, hard) that roughly burn the "
+            "given calorie amount.\n\n"
+            "For each challenge include:\n"
+            '  "description": clear instructions on what to do,\n'
+            '  "time_limit": duration in minutes.\n\n'
+            "Return ONLY a JSON array of 3 objects. No markdown, no explanation."
+        )
+    else:
+        system_prompt = (
+            "You are a fitness challenge creator. The user wants to earn a food "
+            f"treat by completing a physical challenge. Generate {sets * 3} clearly "
+            f"different challenges, {sets} each of easy, medium and hard difficulty, "
+            "that roughly burn the given calorie amount.\n\n"
+            "For each challenge include:\n"
+            '  "description": clear instructions on what to do,\n'
+            '  "time_limit": duration in minutes,\n'
+            '  "difficulty": "easy", "medium" or "hard".\n\n'
+            f"Return ONLY a JSON array of {sets * 3} objects. No markdown, no explanation."
+        )
 
     user_msg = f"Target calorie burn: {calories} kcal"
     if user_age:
@@ -136,11 +187,17 @@ def generate_challenges(
     if user_weight:
         user_msg += f"\nUser weight: {user_weight} kg"
 
+    if exclude_items:
+        user_msg += (
+            "\n\nDo NOT suggest any of the following (already shown to the user):\n"
+            + "\n".join(f"- {item}" for item in exclude_items)
+        )
+
     raw = _chat(system_prompt, user_msg)
     try:
         challenges = _parse_json(raw)
         if isinstance(challenges, list) and len(challenges) >= 1:
-            return challenges[:3]
+            return challenges[:sets * 3]
     except (json.JSONDecodeError, ValueError):
         pass
 
@@ -160,22 +217,25 @@ def generate_healthy_substitute(
     crave_item: str,
     calories: int,
     exclude_items: list[str] | None = None,
+    count: int | None = None,
 ) -> list[dict]:
     """Return 2-3 healthier food alternatives that give a similar vibe.
 
     Each suggestion is a dict with keys:
       suggestion (str), description (str), estimated_calories (int), why (str).
+    Pass *count* to ask for that many instead (a candidate pool).
     """
+    how_many = f"{count} clearly different" if count else "2-3"
     system_prompt = (
         "You are a healthy eating assistant. The user is craving something "
-        "unhealthy. Suggest 2-3 healthier alternatives that give a similar "
+        f"unhealthy. Suggest {how_many} healthier alternatives that give a similar "
         "taste, texture, or vibe — so the user still feels satisfied.\n\n"
         "For each suggestion include:\n"
         '  "suggestion": the healthier food item name,\n'
         '  "description": what it is and how to get/make it,\n'
         '  "estimated_calories": approximate calorie count (integer),\n'
         '  "why": one sentence on why it satisfies the same craving.\n\n'
-        "Return ONLY a JSON array of 2-3 objects. No markdown, no explanation."
+        f"Return ONLY a JSON array of {count or '2-3'} objects. No markdown, no explanation."
     )
 
     user_msg = f"Craving: {crave_item}\nOriginal estimated calories: {calories} kcal"
@@ -190,7 +250,7 @@ def generate_healthy_substitute(
     try:
         suggestions = _parse_json(raw)
         if isinstance(suggestions, list) and len(suggestions) >= 1:
-            return suggestions[:3]
+            return suggestions[:count or 3]
     except (json.JSONDecodeError, ValueError):
         pass
 
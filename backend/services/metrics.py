@@ -0,0 +1,208 @@
+import os
+from time import monotonic, perf_counter
+
+from flask import g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from services import admission, cache, compression, http_pool, tracing, write_behind
+
+# Set by gunicorn.conf.py. Each worker then writes its samples to files
+# there, and a scrape of any worker reports the sum over all of them.
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+# Counters kept by the caches, pools, admission control and write-behind
+# buffer are copied into Prometheus metrics at most this often per worker
+# (and on every scrape)
+STATS_SYNC_SECONDS = 5
+
+# Supabase answers in milliseconds, OpenAI in seconds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+_UPSTREAMS = {"db": "supabase", "llm": "openai", "places": "places"}
+
+REQUESTS = Counter(
+    "http_requests_total", "Requests handled", ["endpoint", "method", "status"]
+)
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "Time to produce the response (headers only for streams)",
+    ["endpoint", "method"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight", "Requests being handled", multiprocess_mode="livesum"
+)
+
+UPSTREAM_LATENCY = Histogram(
+    "upstream_call_duration_seconds",
+    "Supabase, OpenAI and Places calls by table/operation, model or search",
+    ["upstream", "target"],
+    buckets=LATENCY_BUCKETS,
+)
+UPSTREAM_ERRORS = Counter(
+    "upstream_call_errors_total", "Upstream calls that raised", ["upstream", "target"]
+)
+UPSTREAM_IN_FLIGHT = Gauge(
+    "upstream_requests_in_flight", "Requests waiting on an upstream", ["upstream"],
+    multiprocess_mode="livesum",
+)
+UPSTREAM_OPEN_CONNECTIONS = Gauge(
+    "upstream_open_connections", "Pooled connections per upstream", ["upstream"],
+    multiprocess_mode="livesum",
+)
+UPSTREAM_NEW_CONNECTIONS = Counter(
+    "upstream_new_connections_total", "Connections opened (not reused)", ["upstream"]
+)
+UPSTREAM_SATURATED = Counter(
+    "upstream_pool_saturated_total", "Requests that found every pooled connection busy", ["upstream"]
+)
+
+CACHE_HITS = Counter("cache_hits_total", "In-process cache hits", ["cache"])
+CACHE_MISSES = Counter("cache_misses_total", "In-process cache misses", ["cache"])
+CACHE_ENTRIES = Gauge(
+    "cache_entries", "Entries held by in-process caches", ["cache"], multiprocess_mode="livesum"
+)
+
+WRITE_BEHIND_PENDING = Gauge(
+    "write_behind_pending", "Deferred writes not yet flushed", multiprocess_mode="livesum"
+)
+WRITE_BEHIND_FLUSHED = Counter("write_behind_flushed_total", "Deferred writes flushed")
+WRITE_BEHIND_FAILED = Counter("write_behind_failed_total", "Deferred writes that failed")
+WRITE_BEHIND_RETRYING = Gauge(
+    "write_behind_retrying", "Deferred writes waiting to be retried", multiprocess_mode="livesum"
+)
+WRITE_BEHIND_DEAD_LETTERED = Counter(
+    "write_behind_dead_lettered_total", "Deferred writes given up on and moved to the dead-letter file"
+)
+
+COMPRESSED_RESPONSES = Counter(
+    "http_compressed_responses_total", "Responses sent compressed", ["encoding"]
+)
+COMPRESSION_INPUT_BYTES = Counter(
+    "http_compression_input_bytes_total", "Response bytes before compression", ["encoding"]
+)
+COMPRESSION_OUTPUT_BYTES = Counter(
+    "http_compression_output_bytes_total", "Response bytes after compression", ["encoding"]
+)
+
+LLM_ADMISSIONS = Counter(
+    "llm_admissions_total", "LLM-backed requests admitted, rate limited per user, or shed",
+    ["priority", "outcome"],
+)
+LLM_ACTIVE = Gauge(
+    "llm_admission_active", "LLM-backed requests running", multiprocess_mode="livesum"
+)
+LLM_WAITING = Gauge(
+    "llm_admission_waiting", "LLM-backed requests queued for a slot", multiprocess_mode="livesum"
+)
+
+_upstream_children: dict = {}  # (kind, name) -> histogram child, skips labels() per span
+_synced: dict = {}  # counter key -> value already added
+_next_sync = 0.0
+
+
+def init_app(app):
+    """Record request and upstream metrics for *app*. Serve them with render()."""
+    tracing.add_listener(_observe_span)
+    app.before_request(_begin)
+    app.after_request(_finish)
+    app.teardown_request(_end)
+
+
+def render() -> tuple[bytes, str]:
+    """The exposition text and its content type."""
+    sync_stats()
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def sync_stats():
+    """Copy this worker's cache, pool, compression, admission and write-behind counters into the metrics."""
+    global _next_sync
+    _next_sync = monotonic() + STATS_SYNC_SECONDS
+
+    for name, c in cache.named_caches().items():
+        stats = c.stats()
+        _add(CACHE_HITS, ("hits", name), stats["hits"], name)
+        _add(CACHE_MISSES, ("misses", name), stats["misses"], name)
+        CACHE_ENTRIES.labels(name).set(stats["size"])
+
+    for name, stats in http_pool.stats().items():
+        UPSTREAM_IN_FLIGHT.labels(name).set(stats["in_flight"])
+        UPSTREAM_OPEN_CONNECTIONS.labels(name).set(stats["open_connections"])
+        _add(UPSTREAM_NEW_CONNECTIONS, ("new_connections", name), stats["new_connections"], name)
+        _add(UPSTREAM_SATURATED, ("saturated", name), stats["saturated"], name)
+
+    for encoding, stats in compression.stats().items():
+        _add(COMPRESSED_RESPONSES, ("compressed", encoding), stats["responses"], encoding)
+        _add(COMPRESSION_INPUT_BYTES, ("compression_in", encoding), stats["bytes_in"], encoding)
+        _add(COMPRESSION_OUTPUT_BYTES, ("compression_out", encoding), stats["bytes_out"], encoding)
+
+    stats = admission.stats()
+    LLM_ACTIVE.set(stats["active"])
+    LLM_WAITING.set(stats["waiting"])
+    for (priority, outcome), total in stats["outcomes"].items():
+        _add(LLM_ADMISSIONS, ("admissions", priority, outcome), total, priority, outcome)
+
+    stats = write_behind.stats()
+    WRITE_BEHIND_PENDING.set(stats["pending"])
+    _add(WRITE_BEHIND_FLUSHED, ("flushed",), stats["flushed"])
+    _add(WRITE_BEHIND_FAILED, ("failed",), stats["failed"])
+    WRITE_BEHIND_RETRYING.set(stats["retrying"])
+    _add(WRITE_BEHIND_DEAD_LETTERED, ("dead_lettered",), stats["dead_lettered"])
+
+
+def _add(counter, key: tuple, total: int, *labels):
+    """Increase *counter* to *total*; the sources keep running totals, not deltas."""
+    previous = _synced.get(key, 0)
+    delta = total - previous if total >= previous else total  # source was reset (e.g. after fork)
+    if delta > 0:
+        (counter.labels(*labels) if labels else counter).inc(delta)
+    _synced[key] = total
+
+
+def _observe_span(span):
+    child = _upstream_children.get((span.kind, span.name))
+    if child is None:
+        child = UPSTREAM_LATENCY.labels(_UPSTREAMS.get(span.kind, span.kind), span.name)
+        _upstream_children[(span.kind, span.name)] = child
+    child.observe(span.duration)
+    if span.error:
+        UPSTREAM_ERRORS.labels(_UPSTREAMS.get(span.kind, span.kind), span.name).inc()
+
+
+def _begin():
+    g._metrics_start = perf_counter()
+    REQUESTS_IN_FLIGHT.inc()
+    if monotonic() >= _next_sync:
+        sync_stats()
+
+
+def _finish(response):
+    start = g.get("_metrics_start")
+    if start is None:
+        return response
+    endpoint = request.endpoint or "unmatched"
+    REQUEST_LATENCY.labels(endpoint, request.method).observe(perf_counter() - start)
+    REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+    return response
+
+
+def _end(exc):
+    # Teardown runs for every request, including ones whose response was
+    # never finalized, so the in-flight gauge cannot drift upwards.
+    if g.pop("_metrics_start", None) is not None:
+        REQUESTS_IN_FLIGHT.dec()
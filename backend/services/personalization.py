@@ -0,0 +1,184 @@
+import logging
+import os
+import socket
+import threading
+import time
+from datetime import datetime
+
+from config import PUBSUB_BACKEND
+from services import pubsub
+from services.cache import TTLCache
+from services.pubsub import get_pubsub
+
+logger = logging.getLogger(__name__)
+
+MATURITY_THRESHOLD = 5  # preferences count to trigger personalisation
+PERSONALIZATION_TOP_K = 5  # items sent to the prompt
+PERSONALIZATION_CANDIDATES = 20  # items kept per (user, category)
+PERSONALIZATION_HALF_LIFE_DAYS = 30
+PERSONALIZATION_CACHE_TTL_SECONDS = 3600  # with a shared pub/sub backend to carry invalidations
+PERSONALIZATION_LOCAL_CACHE_TTL_SECONDS = 5  # otherwise: how long other workers' writes go unseen
+PERSONALIZATION_CACHE_MAX_ENTRIES = 10000
+INVALIDATION_CHANNEL = "personalization:invalidate"
+
+_HALF_LIFE_SECONDS = PERSONALIZATION_HALF_LIFE_DAYS * 86400
+
+# Like the row cache in data_access: a profile is kept for long only when every
+# worker hears about every write to it
+SHARED_INVALIDATION = pubsub.is_shared(PUBSUB_BACKEND)
+
+# (user_id, category) -> _Profile
+_profiles = TTLCache(
+    maxsize=PERSONALIZATION_CACHE_MAX_ENTRIES,
+    default_ttl=PERSONALIZATION_CACHE_TTL_SECONDS if SHARED_INVALIDATION else PERSONALIZATION_LOCAL_CACHE_TTL_SECONDS,
+    name="personalization",
+)
+_listener_lock = threading.Lock()
+_listener_pid = None
+
+
+class _Profile:
+    """Recency-weighted item scores for one (user, category).
+
+    Each score is stored as of its last update and decayed lazily: an order
+    counts 1 today, 0.5 after one half-life, and so on.
+    """
+
+    __slots__ = ("items", "distinct", "lock")
+
+    def __init__(self, distinct: int):
+        self.items: dict[str, list] = {}  # item -> [score, as_of, order_count]
+        self.distinct = distinct
+        self.lock = threading.Lock()
+
+    def add(self, item: str, count: int, at: float):
+        """Fold in *count* orders of *item*. ``distinct`` is left to the database's answer (inserted)."""
+        with self.lock:
+            entry = self.items.get(item)
+            if entry is None:
+                # New here, but possibly an existing row that was never loaded or was pruned
+                self.items[item] = [float(count), at, count]
+            else:
+                entry[0] = _decay(entry[0], entry[1], at) + count
+                entry[1] = at
+                entry[2] += count
+            if len(self.items) > PERSONALIZATION_CANDIDATES:
+                weakest = min(self.items, key=lambda i: _decay(self.items[i][0], self.items[i][1], at))
+                del self.items[weakest]
+
+    def top(self, k: int, now: float) -> list[dict]:
+        with self.lock:
+            ranked = sorted(
+                self.items.items(),
+                key=lambda kv: _decay(kv[1][0], kv[1][1], now),
+                reverse=True,
+            )
+            return [{"item": item, "order_count": entry[2]} for item, entry in ranked[:k]]
+
+
+def _decay(score: float, as_of: float, now: float) -> float:
+    return score * 0.5 ** (max(0.0, now - as_of) / _HALF_LIFE_SECONDS)
+
+
+def _load(supabase, user_id: str, category: str) -> _Profile:
+    resp = (
+        supabase.table("user_preferences")
+        .select("item, order_count, last_ordered", count="exact")
+        .eq("user_id", user_id)
+        .eq("category", category)
+        .order("order_count", desc=True)
+        .limit(PERSONALIZATION_CANDIDATES)
+        .execute()
+    )
+    rows = resp.data or []
+    profile = _Profile(distinct=resp.count if resp.count is not None else len(rows))
+    for row in rows:
+        last = row.get("last_ordered")
+        as_of = datetime.fromisoformat(last).timestamp() if last else time.time()
+        count = row.get("order_count") or 1
+        # Without per-order timestamps, treat all past orders as made at last_ordered
+        profile.items[row["item"]] = [float(count), as_of, count]
+    return profile
+
+
+def get_personalization(supabase, user_id: str, category: str) -> tuple[list[dict], bool]:
+    """Return (top-K preferences, is_personalized) for a craving category.
+
+    The list is empty until the user has MATURITY_THRESHOLD distinct items in
+    the category. Reads the database only on a cache miss.
+    """
+    key = (user_id, category)
+    if SHARED_INVALIDATION:
+        _ensure_listener()
+    profile = _profiles.get(key)
+    if profile is None:
+        profile = _load(supabase, user_id, category)
+        _profiles.set(key, profile)
+
+    if profile.distinct < MATURITY_THRESHOLD:
+        return [], False
+    return profile.top(PERSONALIZATION_TOP_K, time.time()), True
+
+
+def record_order(user_id: str, category: str, item: str, count: int = 1):
+    """Preference-writer hook: fold a new order into the cached profile, if cached."""
+    profile = _profiles.peek((user_id, category))
+    if profile is not None:
+        profile.add(item, count, time.time())
+
+
+def record_written(rows: list[dict]):
+    """Preference-writer hook, after the write: *rows* as returned by increment_preferences.
+
+    Counts the items the database inserted towards MATURITY_THRESHOLD and
+    tells other workers to drop their copies of the profiles.
+    """
+    keys = set()
+    for row in rows:
+        key = (row["user_id"], row["category"])
+        keys.add(key)
+        if row.get("inserted"):
+            profile = _profiles.peek(key)
+            if profile is not None:
+                with profile.lock:
+                    profile.distinct += 1
+    if SHARED_INVALIDATION:
+        for user_id, category in keys:
+            _publish(user_id, category)
+
+
+def _origin() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _publish(user_id: str, category: str):
+    try:
+        get_pubsub().publish(
+            INVALIDATION_CHANNEL, {"origin": _origin(), "user_id": user_id, "category": category}
+        )
+    except Exception:
+        logger.exception("personalization invalidation publish failed")
+
+
+def _ensure_listener():
+    """Start (once per process) the thread that applies other workers' invalidations."""
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+        subscription = get_pubsub().subscribe(INVALIDATION_CHANNEL)
+        threading.Thread(
+            target=_listen, args=(subscription,), name="personalization-invalidation", daemon=True
+        ).start()
+
+
+def _listen(subscription):
+    origin = _origin()
+    while True:
+        message = subscription.get()
+        if not message or message.get("origin") == origin:
+            continue
+        _profiles.invalidate((message.get("user_id"), message.get("category")))
@@ -1,12 +1,24 @@
+from functools import lru_cache
+
 import googlemaps
 
-from config import GOOGLE_PLACES_API_KEY
+from config import GOOGLE_PLACES_API_KEY, get_supabase_service_client
+from services import http_pool, tracing
+
+PLACES_QUERIES_PER_SECOND = 100  # googlemaps' client-side rate limit, per process
 
 
+@lru_cache(maxsize=1)
 def _get_gmaps_client():
+    """Create the Places client once, on the shared keep-alive connection pool."""
     if not GOOGLE_PLACES_API_KEY:
         return None
-    return googlemaps.Client(key=GOOGLE_PLACES_API_KEY)
+    return googlemaps.Client(
+        key=GOOGLE_PLACES_API_KEY,
+        timeout=http_pool.UPSTREAM_TIMEOUTS["places"],
+        queries_per_second=PLACES_QUERIES_PER_SECOND,
+        requests_session=http_pool.get_requests_session("places"),
+    )
 
 
 def search_nearby_places(keyword: str, lat: float, lng: float, radius: int = 5000) -> list[dict]:
@@ -20,13 +32,15 @@ def search_nearby_places(keyword: str, lat: float, lng: float, radius: int = 500
         return []
 
     try:
-        response = client.places_nearby(
-            location=(lat, lng),
-            radius=radius,
-            keyword=keyword,
-            type="food",
-        )
-        results = response.get("results", [])
+        with tracing.span("places", "nearby") as span:
+            response = client.places_nearby(
+                location=(lat, lng),
+                radius=radius,
+                keyword=keyword,
+                type="food",
+            )
+            results = response.get("results", [])
+            span.attrs["results"] = len(results)
         return [
             {
                 "name": place.get("name", ""),
@@ -38,3 +52,37 @@ def search_nearby_places(keyword: str, lat: float, lng: float, radius: int = 500
         ]
     except Exception:
         return []
+
+
+def save_places(places: list[dict]) -> list[str]:
+    """Upsert *places* into the shared places table and return their place_ids in order.
+
+    Runs as the service role: the table is shared, so clients may not write it.
+    """
+    places = [p for p in places if p.get("place_id")]
+    if places:
+        get_supabase_service_client().rpc("upsert_places", {"p_places": places}).execute()
+    return [p["place_id"] for p in places]
+
+
+def load_places(supabase, place_ids: list[str]) -> list[dict]:
+    """Fetch places by ID, in the order given. IDs no longer in the table are skipped."""
+    if not place_ids:
+        return []
+    resp = (
+        supabase.table("places")
+        .select("place_id, name, address, rating")
+        .in_("place_id", place_ids)
+        .execute()
+    )
+    by_id = {row["place_id"]: row for row in resp.data or []}
+    return [
+        {
+            "name": by_id[pid]["name"],
+            "address": by_id[pid]["address"],
+            "place_id": pid,
+            "rating": by_id[pid]["rating"],
+        }
+        for pid in place_ids
+        if pid in by_id
+    ]
@@ -0,0 +1,86 @@
+from datetime import datetime, timezone
+
+from config import get_supabase_service_client
+from services import personalization, write_behind
+
+
+def preference_category(item: str, default: str) -> str:
+    """Bucket an item by its last word, e.g. "Nutella crepe" -> "crepe"."""
+    return item.split(" ")[-1].lower() if item else default
+
+
+def increment_preference(user_id: str, category: str, item: str):
+    """Add one order of *item* to the user's preferences (insert or increment)."""
+    increment_preferences([{
+        "user_id": user_id,
+        "category": category,
+        "item": item,
+        "order_count": 1,
+        "last_ordered": datetime.now(timezone.utc).isoformat(),
+    }])
+
+
+def increment_preference_later(user_id: str, category: str, item: str):
+    """Like increment_preference, but off the request path via the write-behind buffer.
+
+    The cached personalization profile is updated immediately.
+    """
+    personalization.record_order(user_id, category, item)
+    write_behind.submit(
+        "preference",
+        (user_id, category, item),
+        {"order_count": 1, "last_ordered": datetime.now(timezone.utc).isoformat()},
+    )
+
+
+def increment_preferences(increments: list[dict]):
+    """Flush many preference increments in a single statement.
+
+    Each increment has user_id, category, item and optionally order_count
+    (default 1) and last_ordered. Repeated keys are merged before sending.
+    """
+    merged: dict[tuple, dict] = {}
+    for inc in increments:
+        key = (inc["user_id"], inc["category"], inc["item"])
+        row = merged.get(key)
+        if row is None:
+            merged[key] = {
+                "user_id": inc["user_id"],
+                "category": inc["category"],
+                "item": inc["item"],
+                "order_count": inc.get("order_count", 1),
+                "last_ordered": inc.get("last_ordered"),
+            }
+        else:
+            row["order_count"] += inc.get("order_count", 1)
+            row["last_ordered"] = max(filter(None, (row["last_ordered"], inc.get("last_ordered"))), default=None)
+
+    if merged:
+        _write_rows(list(merged.values()))
+        for row in merged.values():
+            personalization.record_order(row["user_id"], row["category"], row["item"], row["order_count"])
+
+
+def _write_rows(rows: list[dict]):
+    # As the service role: increment_preferences trusts the user_id in each row
+    resp = get_supabase_service_client().rpc("increment_preferences", {"p_rows": rows}).execute()
+    personalization.record_written(resp.data or [])
+
+
+def _merge_pending(old: dict, new: dict) -> dict:
+    return {
+        "order_count": old["order_count"] + new["order_count"],
+        "last_ordered": max(old["last_ordered"], new["last_ordered"]),
+    }
+
+
+def _flush_pending(supabase, items: dict) -> list:
+    # One statement for the whole batch; it either all lands or all retries
+    _write_rows([
+        {"user_id": user_id, "category": category, "item": item, **payload}
+        for (user_id, category, item), payload in items.items()
+    ])
+    return []
+
+
+write_behind.register("preference", _merge_pending, _flush_pending)
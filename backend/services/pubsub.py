@@ -0,0 +1,98 @@
+import queue
+import threading
+from functools import lru_cache
+
+from config import PUBSUB_BACKEND
+
+
+class Subscription:
+    """A single subscriber's view of one channel."""
+
+    def __init__(self, backend, channel: str):
+        self._backend = backend
+        self.channel = channel
+        self._queue: queue.Queue = queue.Queue()
+
+    def deliver(self, message):
+        self._queue.put(message)
+
+    def get(self, timeout: float | None = None):
+        """Block for the next message; return None if *timeout* passes first."""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+    def close(self):
+        self._backend.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class LocalBackend:
+    """In-process pub/sub. Messages only reach subscribers in the same worker.
+
+    Other backends (Redis, Postgres LISTEN/NOTIFY, ...) need the same three
+    methods: ``subscribe``, ``unsubscribe`` and ``publish``.
+    """
+
+    def __init__(self):
+        self._channels: dict[str, set[Subscription]] = {}
+        self._lock = threading.Lock()
+
+    def subscribe(self, channel: str) -> Subscription:
+        sub = Subscription(self, channel)
+        with self._lock:
+            self._channels.setdefault(channel, set()).add(sub)
+        return sub
+
+    def unsubscribe(self, sub: Subscription):
+        with self._lock:
+            subs = self._channels.get(sub.channel)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._channels[sub.channel]
+
+    def publish(self, channel: str, message) -> int:
+        """Deliver *message* to every current subscriber; return how many got it."""
+        with self._lock:
+            subs = list(self._channels.get(channel, ()))
+        for sub in subs:
+            sub.deliver(message)
+        return len(subs)
+
+
+_BACKENDS = {"local": LocalBackend}
+_PROCESS_LOCAL = {"local"}  # backends whose messages never leave the process
+
+
+def register_backend(name: str, factory, shared: bool = True):
+    """Make a backend selectable through the PUBSUB_BACKEND env var.
+
+    *shared* says whether its messages reach every worker, not just this process.
+    """
+    _BACKENDS[name] = factory
+    if not shared:
+        _PROCESS_LOCAL.add(name)
+    get_pubsub.cache_clear()
+
+
+def is_shared(name: str) -> bool:
+    """Whether backend *name* delivers messages to every worker."""
+    return name not in _PROCESS_LOCAL
+
+
+@lru_cache(maxsize=1)
+def get_pubsub():
+    """Return the process-wide pub/sub backend selected by PUBSUB_BACKEND."""
+    try:
+        return _BACKENDS[PUBSUB_BACKEND]()
+    except KeyError:
+        raise RuntimeError(
+            f"Unknown PUBSUB_BACKEND '{PUBSUB_BACKEND}'. Available: {sorted(_BACKENDS)}"
+        )
@@ -0,0 +1,56 @@
+import bisect
+import threading
+import time
+
+from config import get_supabase_client
+
+# Mirrors the seed rows in migrations/001_create_tables.sql; used until the
+# ranks table has been read, or if it cannot be.
+DEFAULT_RANKS = [
+    ("Beginner", 0, 99),
+    ("Bronze", 100, 499),
+    ("Silver", 500, 999),
+    ("Gold", 1000, 2499),
+    ("Platinum", 2500, 4999),
+    ("Diamond", 5000, 999999),
+]
+FALLBACK_RANK = "Beginner"
+DEFAULT_RANKS_TTL_SECONDS = 60  # after a failed read, try the table again this soon
+
+_lock = threading.Lock()
+_ranks: list[tuple[str, int, int]] | None = None
+_min_points: list[int] = []
+_retry_at: float | None = None  # monotonic; set while the defaults stand in for the table
+
+
+def load_ranks(supabase=None) -> list[tuple[str, int, int]]:
+    """Read the ranks table once and keep it in memory, sorted by min_points.
+
+    If it cannot be read, DEFAULT_RANKS are used for DEFAULT_RANKS_TTL_SECONDS
+    and the table is tried again after that.
+    """
+    global _ranks, _min_points, _retry_at
+    try:
+        supabase = supabase or get_supabase_client()
+        resp = supabase.table("ranks").select("rank_type, min_points, max_points").execute()
+        rows = [(r["rank_type"], r["min_points"], r["max_points"]) for r in resp.data or []]
+    except Exception:
+        rows = []
+    retry_at = None if rows else time.monotonic() + DEFAULT_RANKS_TTL_SECONDS
+    rows = sorted(rows or DEFAULT_RANKS, key=lambda r: r[1])
+    with _lock:
+        _ranks = rows
+        _min_points = [r[1] for r in rows]
+        _retry_at = retry_at
+    return rows
+
+
+def resolve_rank(total_points: int) -> str:
+    """Return the rank label for *total_points*, without a database round-trip once the table is loaded."""
+    if _ranks is None or (_retry_at is not None and time.monotonic() >= _retry_at):
+        load_ranks()
+    i = bisect.bisect_right(_min_points, total_points) - 1
+    if i < 0:
+        return FALLBACK_RANK
+    rank_type, _, max_points = _ranks[i]
+    return rank_type if total_points <= max_points else FALLBACK_RANK
@@ -0,0 +1,124 @@
+import json
+import logging
+import os
+import threading
+import time
+
+from config import GOOGLE_PLACES_API_KEY, OPENAI_API_KEY, READY_PROBE_INTERVAL_SECONDS, get_supabase_client
+from services import http_pool, llm_service
+
+logger = logging.getLogger(__name__)
+
+PROBE_TIMEOUT_SECONDS = 2  # OpenAI and Places; the Supabase query uses the pool's own timeout
+# Results older than this mean the prober itself is stuck
+STALE_AFTER_SECONDS = READY_PROBE_INTERVAL_SECONDS * 3 + http_pool.UPSTREAM_TIMEOUTS["supabase"]
+PLACES_PROBE_URL = "https://maps.googleapis.com/maps/api/place/nearbysearch/json"
+
+# Without Supabase no endpoint works. OpenAI and Places outages hit every
+# instance alike, so they degrade the response instead of failing readiness
+# (pulling all instances out of the load balancer would not help).
+CRITICAL = {"supabase"}
+
+_lock = threading.Lock()
+_prober_pid = None
+_results: dict[str, dict] = {}
+_checked_at = None  # monotonic time of the last completed round
+_response = (503, b'{"status": "starting"}')  # (status code, JSON body), rebuilt after each round
+
+
+def response() -> tuple[int, bytes]:
+    """The cached readiness answer: (HTTP status, JSON body). Never probes inline."""
+    _ensure_prober()
+    if _checked_at is not None and time.monotonic() - _checked_at > STALE_AFTER_SECONDS:
+        return 503, json.dumps({"status": "stale", "dependencies": _results}).encode()
+    return _response
+
+
+def dependency(name: str) -> dict | None:
+    """Last probe result for one dependency, or None before the first round."""
+    _ensure_prober()
+    return _results.get(name)
+
+
+# ------------------------------------------------------------------
+# Probes: each raises on failure, returns "disabled" if not configured
+# ------------------------------------------------------------------
+
+def _probe_supabase():
+    get_supabase_client().table("profiles").select("user_id").limit(1).execute()
+
+
+def _probe_openai():
+    if not OPENAI_API_KEY:
+        return "disabled"
+    client = llm_service._get_client().with_options(timeout=PROBE_TIMEOUT_SECONDS, max_retries=0)
+    client.models.retrieve(llm_service.MODEL)  # free, unlike a completion
+
+
+def _probe_places():
+    if not GOOGLE_PLACES_API_KEY:
+        return "disabled"
+    # Reachability only: a real search is billed
+    resp = http_pool.get_requests_session("places").head(PLACES_PROBE_URL, timeout=PROBE_TIMEOUT_SECONDS)
+    if resp.status_code >= 500:
+        raise RuntimeError(f"HTTP {resp.status_code}")
+
+
+PROBES = {
+    "supabase": _probe_supabase,
+    "openai": _probe_openai,
+    "places": _probe_places,
+}
+
+
+def probe_all():
+    """Run every probe once and rebuild the cached answer."""
+    global _checked_at, _response, _results
+    results = {}
+    for name, probe in PROBES.items():
+        start = time.perf_counter()
+        try:
+            status, error = probe() or "up", None
+        except Exception as exc:
+            status, error = "down", str(exc)[:200]
+        results[name] = {
+            "status": status,
+            "latency_ms": round((time.perf_counter() - start) * 1000, 1),
+            "error": error,
+            "checked_at": time.time(),
+        }
+        if status == "down":
+            logger.warning("readiness probe %s failed: %s", name, error)
+
+    if any(results[name]["status"] == "down" for name in CRITICAL):
+        overall, code = "unavailable", 503
+    elif any(r["status"] == "down" for r in results.values()):
+        overall, code = "degraded", 200
+    else:
+        overall, code = "ready", 200
+    body = json.dumps({"status": overall, "dependencies": results}).encode()
+
+    _results = results
+    _checked_at = time.monotonic()
+    _response = (code, body)
+
+
+def _ensure_prober():
+    """Start (once per process) the thread that re-probes every READY_PROBE_INTERVAL_SECONDS."""
+    global _prober_pid
+    if _prober_pid == os.getpid():
+        return
+    with _lock:
+        if _prober_pid == os.getpid():
+            return
+        _prober_pid = os.getpid()
+        threading.Thread(target=_run, name="readiness-prober", daemon=True).start()
+
+
+def _run():
+    while True:
+        try:
+            probe_all()
+        except Exception:
+            logger.exception("readiness probe round failed")
+        time.sleep(READY_PROBE_INTERVAL_SECONDS)
@@ -0,0 +1,52 @@
+from datetime import date, datetime, timezone
+
+from config import get_supabase_service_client
+
+
+def record_session_outcome(
+    user_id: str,
+    session_type: str | None,
+    rating: int | None = None,
+    calories_offset: int = 0,
+):
+    """Fold one finished session into the user's ``user_stats`` row (single upsert).
+
+    Runs as the service role: the function trusts the user ID it is given.
+    """
+    get_supabase_service_client().rpc("record_session_outcome", {
+        "p_user_id": user_id,
+        "p_session_type": session_type or "unknown",
+        "p_rating": rating,
+        "p_calories_offset": int(calories_offset),
+    }).execute()
+
+
+def get_user_stats(supabase, user_id: str) -> dict:
+    """Read the precomputed stats row and shape it for the API."""
+    resp = (
+        supabase.table("user_stats")
+        .select("*")
+        .eq("user_id", user_id)
+        .execute()
+    )
+    row = resp.data[0] if resp.data else {}
+
+    rating_count = row.get("rating_count", 0)
+    last_active = row.get("last_active_date")
+
+    # The stored streak only moves on write; it is broken once a full day passes
+    current_streak = row.get("current_streak", 0)
+    if last_active:
+        days_idle = (datetime.now(timezone.utc).date() - date.fromisoformat(last_active)).days
+        if days_idle > 1:
+            current_streak = 0
+
+    return {
+        "total_sessions": row.get("total_sessions", 0),
+        "sessions_by_type": row.get("sessions_by_type", {}),
+        "average_rating": round(row["rating_sum"] / rating_count, 2) if rating_count else None,
+        "current_streak": current_streak,
+        "best_streak": row.get("best_streak", 0),
+        "last_active_date": last_active,
+        "total_calories_offset": row.get("total_calories_offset", 0),
+    }
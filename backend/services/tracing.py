@@ -0,0 +1,169 @@
+import contextvars
+import functools
+import logging
+from time import perf_counter
+
+from flask import g, request
+from postgrest._sync import request_builder
+
+from config import SLOW_REQUEST_MS, TRACING_ENABLED
+
+logger = logging.getLogger(__name__)
+
+# PostgREST builders that send a request; RPCs go through SyncSingleRequestBuilder
+_BUILDERS = (
+    request_builder.SyncQueryRequestBuilder,
+    request_builder.SyncSingleRequestBuilder,
+    request_builder.SyncMaybeSingleRequestBuilder,
+)
+
+# The request's trace. Set alongside flask.g, but a ContextVar lookup costs a
+# fraction of going through the g proxy, and spans are recorded per call.
+_trace: contextvars.ContextVar["Trace | None"] = contextvars.ContextVar("trace", default=None)
+
+# Called with every finished span, in or out of a request (see add_listener)
+_listeners: tuple = ()
+
+_OPERATIONS = {"GET": "select", "HEAD": "select", "POST": "insert", "PATCH": "update", "DELETE": "delete"}
+
+
+class Span:
+    """One timed upstream call. Use as a context manager; set extra fields on ``attrs``."""
+
+    __slots__ = ("kind", "name", "start", "duration", "attrs", "error")
+
+    def __init__(self, kind: str, name: str):
+        self.kind = kind
+        self.name = name
+        self.attrs = {}
+        self.error = False
+
+    def __enter__(self):
+        self.start = perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.duration = perf_counter() - self.start
+        self.error = exc_type is not None
+        trace = _trace.get()
+        if trace is not None:
+            trace.spans.append(self)
+        for listener in _listeners:
+            listener(self)
+        return False
+
+    def describe(self) -> str:
+        fields = "".join(f" {key}={value}" for key, value in self.attrs.items())
+        return f"{self.kind} {self.name} {self.duration * 1000:.1f}ms{fields}{' error' if self.error else ''}"
+
+
+class Trace:
+    """Spans recorded while handling one request."""
+
+    __slots__ = ("start", "spans")
+
+    def __init__(self):
+        self.start = perf_counter()
+        self.spans: list[Span] = []
+
+    def totals(self) -> dict:
+        """kind -> (calls, seconds)"""
+        totals = {}
+        for span in self.spans:
+            calls, seconds = totals.get(span.kind, (0, 0.0))
+            totals[span.kind] = (calls + 1, seconds + span.duration)
+        return totals
+
+
+def span(kind: str, name: str) -> Span:
+    return Span(kind, name)
+
+
+def add_listener(listener):
+    """Call *listener(span)* for every finished span, e.g. to feed metrics."""
+    global _listeners
+    _instrument_postgrest()
+    _listeners = (*_listeners, listener)
+
+
+def init_app(app):
+    """Trace every request: Server-Timing header, slow-request log, traced PostgREST calls."""
+    if not TRACING_ENABLED:
+        return
+    _instrument_postgrest()
+    app.before_request(_begin)
+    app.after_request(_finish)
+    app.teardown_request(_end)
+
+
+def _begin():
+    g._trace_token = _trace.set(Trace())
+
+
+def _finish(response):
+    if "_trace_token" not in g:
+        return response
+    trace = _trace.get()
+    elapsed = perf_counter() - trace.start
+    metrics = [
+        f'{kind};dur={seconds * 1000:.1f};desc="{calls} call{"s" if calls != 1 else ""}"'
+        for kind, (calls, seconds) in trace.totals().items()
+    ]
+    metrics.append(f"total;dur={elapsed * 1000:.1f}")
+    response.headers["Server-Timing"] = ", ".join(metrics)
+
+    if elapsed * 1000 >= SLOW_REQUEST_MS:
+        logger.warning(
+            "slow request %s %s %d %.1fms%s",
+            request.method,
+            request.path,
+            response.status_code,
+            elapsed * 1000,
+            "".join(f"\n  {s.describe()}" for s in trace.spans),
+        )
+    return response
+
+
+def _end(exc):
+    # Teardown runs even when a handler or after_request hook raises, so the
+    # trace never outlives its request.
+    token = g.pop("_trace_token", None)
+    if token is not None:
+        _trace.reset(token)
+
+
+# ------------------------------------------------------------------
+# PostgREST
+# ------------------------------------------------------------------
+
+def _instrument_postgrest():
+    for builder in _BUILDERS:
+        execute = builder.__dict__["execute"]
+        if not getattr(execute, "_traced", False):
+            builder.execute = _traced_execute(execute)
+
+
+def _traced_execute(execute):
+    @functools.wraps(execute)
+    def wrapper(self):
+        with Span("db", _describe_query(self.request)) as span:
+            response = execute(self)
+            data = getattr(response, "data", None)
+            span.attrs["rows"] = len(data) if isinstance(data, list) else int(data is not None)
+        return response
+
+    wrapper._traced = True
+    return wrapper
+
+
+def _describe_query(req) -> str:
+    """``<table>.<operation>``, or ``rpc.<function>``."""
+    path = req.path.path
+    table = path[path.rfind("/") + 1:]
+    method = str(req.http_method.value if hasattr(req.http_method, "value") else req.http_method)
+    if method == "POST":
+        if "/rpc/" in path:
+            return f"rpc.{table}"
+        if "resolution=" in req.headers.get("prefer", ""):
+            return f"{table}.upsert"
+    return f"{table}.{_OPERATIONS.get(method, method.lower())}"
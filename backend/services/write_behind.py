@@ -0,0 +1,365 @@
+import atexit
+import glob
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+
+from config import WRITE_BEHIND_ENABLED, WRITE_BEHIND_SPOOL_DIR, get_supabase_client
+
+logger = logging.getLogger(__name__)
+
+WRITE_BEHIND_FLUSH_INTERVAL_SECONDS = 0.5
+WRITE_BEHIND_MAX_PENDING = 10000  # distinct pending keys before submitters write synchronously
+WRITE_BEHIND_MAX_ATTEMPTS = 10  # failed flushes of one key before it goes to the dead-letter file
+WRITE_BEHIND_MAX_BACKOFF_SECONDS = 60  # retry delays double from the flush interval up to this
+
+# kind -> (merge(old_payload, new_payload) -> payload, flush(supabase, {key: payload}) -> failed keys)
+_handlers: dict[str, tuple] = {}
+
+
+def register(kind: str, merge, flush):
+    """Register how pending writes of *kind* are coalesced and flushed.
+
+    ``flush`` receives the Supabase client and a dict of key -> payload and
+    returns the keys that could not be written (they are retried).
+    """
+    _handlers[kind] = (merge, flush)
+
+
+class WriteBehind:
+    """Coalescing write buffer drained by a background thread.
+
+    Every submitted write is appended to a spool segment before it is
+    acknowledged, so a crashed worker loses nothing: the next process to
+    start replays segments left behind by dead workers. Segment names carry
+    a random ID per process start, because a restarted worker often gets
+    the pid of the one that crashed. The flusher fsyncs
+    each segment once, when it seals it, rather than once per write. Segments
+    are deleted once everything in them has been flushed. Delivery is
+    at-least-once — a crash between a flush and the segment delete replays
+    that batch.
+
+    A key whose write fails is retried on its own, with exponential backoff.
+    After max_attempts failures it is appended to ``dead-letter/<pid>.jsonl``
+    in the spool directory and logged, instead of being retried forever.
+    """
+
+    def __init__(
+        self,
+        spool_dir: str,
+        flush_interval: float,
+        max_pending: int,
+        max_attempts: int = WRITE_BEHIND_MAX_ATTEMPTS,
+        max_backoff: float = WRITE_BEHIND_MAX_BACKOFF_SECONDS,
+    ):
+        self.spool_dir = spool_dir
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.max_attempts = max_attempts
+        self.max_backoff = max_backoff
+        self.flushed = 0
+        self.failed = 0
+        self.dead_lettered = 0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._pid = None
+        self._reset()
+
+    def _reset(self):
+        self._pending: dict[str, dict] = {}
+        self._pending_count = 0
+        self._attempts: dict[tuple, tuple[int, float]] = {}  # (kind, key) -> (failures, monotonic retry time)
+        self._segment = None
+        self._segment_seq = 0
+        self._sealed_segments: list[str] = []
+        self._owned: set[str] = set()  # segments this process created or claimed
+        self._thread = None
+        self._pid = os.getpid()
+        self._run_id = f"{self._pid}-{uuid.uuid4().hex[:8]}"
+
+    # -- public API -------------------------------------------------------
+
+    def start(self):
+        """Start the flusher and replay orphaned segments now, not on the first submit()."""
+        self._ensure_started()
+
+    def submit(self, kind: str, key, payload):
+        """Queue a write. Falls back to writing inline when the buffer is full."""
+        self._ensure_started()
+        with self._lock:
+            if self._pending_count < self.max_pending:
+                self._spool({"kind": kind, "key": key, "payload": payload})
+                self._merge(kind, key, payload)
+                if self._pending_count >= self.max_pending // 2:
+                    self._wake.set()  # don't wait out the interval when filling up
+                return
+
+        # Backpressure: the buffer is full, so pay for the round-trip now
+        flush = _handlers[kind][1]
+        failed = flush(get_supabase_client(), {key: payload})
+        if failed:
+            raise RuntimeError(f"write-behind: synchronous {kind} write failed")
+
+    def flush(self):
+        """Write everything pending and due now. Safe to call from any thread."""
+        with self._flush_lock:
+            with self._lock:
+                pending, self._pending, self._pending_count = self._pending, {}, 0
+                segment, sealed = self._seal_segment()
+            if segment is not None:
+                # One fsync per flush round instead of one per write, and not under _lock
+                os.fsync(segment.fileno())
+                segment.close()
+            if not pending and not sealed:
+                return
+
+            # Fresh writes go out in one batch per kind. Retries are due once
+            # their backoff has passed and go one key at a time, so a single
+            # bad payload cannot keep failing the rest of a batch.
+            now = time.monotonic()
+            fresh: dict[str, dict] = {}
+            retries: list[tuple[str, dict]] = []
+            leftover: dict[str, dict] = {}
+            for kind, items in pending.items():
+                for key, payload in items.items():
+                    attempts, retry_at = self._attempts.get((kind, key), (0, 0.0))
+                    if not attempts:
+                        fresh.setdefault(kind, {})[key] = payload
+                    elif retry_at <= now:
+                        retries.append((kind, {key: payload}))
+                    else:
+                        leftover.setdefault(kind, {})[key] = payload
+
+            supabase = get_supabase_client() if fresh or retries else None
+            for kind, items in [*fresh.items(), *retries]:
+                try:
+                    failed = _handlers[kind][1](supabase, items)
+                except Exception:
+                    logger.exception("write-behind flush of %s failed", kind)
+                    failed = list(items)
+                for key in items:
+                    if key not in failed:
+                        self._attempts.pop((kind, key), None)
+                for key in failed:
+                    if self._record_failure(kind, key, items[key], now):
+                        leftover.setdefault(kind, {})[key] = items[key]
+                self.flushed += len(items) - len(failed)
+                self.failed += len(failed)
+
+            with self._lock:
+                # Re-spool what is still pending so the sealed segments can go
+                for kind, items in leftover.items():
+                    for key, payload in items.items():
+                        attempts = self._attempts[(kind, key)][0]
+                        self._spool({"kind": kind, "key": key, "payload": payload, "attempts": attempts})
+                        self._merge(kind, key, payload, older=True)
+            for path in sealed:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def shutdown(self):
+        """Drain on exit: stop the worker and flush whatever is left."""
+        if self._thread is None or self._pid != os.getpid():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=10)
+        self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "pending": self._pending_count,
+            "retrying": len(self._attempts),
+            "flushed": self.flushed,
+            "failed": self.failed,
+            "dead_lettered": self.dead_lettered,
+        }
+
+    # -- internals --------------------------------------------------------
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                # Forked child: the parent's thread and spool file are not ours
+                self._reset()
+            os.makedirs(self.spool_dir, exist_ok=True)
+            self._recover()
+            self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("write-behind flush loop error")
+
+    def _record_failure(self, kind: str, key, payload, now: float) -> bool:
+        """Count a failed write of *key*. True to retry it later, False if it was dead-lettered."""
+        attempts = self._attempts.get((kind, key), (0, 0.0))[0] + 1
+        if attempts < self.max_attempts:
+            delay = min(self.flush_interval * 2 ** attempts, self.max_backoff)
+            self._attempts[(kind, key)] = (attempts, now + delay)
+            return True
+        self._attempts.pop((kind, key), None)
+        path = os.path.join(self.spool_dir, "dead-letter", f"{os.getpid()}.jsonl")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({"kind": kind, "key": key, "payload": payload, "attempts": attempts}) + "\n")
+        self.dead_lettered += 1
+        logger.error("write-behind: %s %s failed %d times, moved to %s", kind, key, attempts, path)
+        return False
+
+    def _merge(self, kind: str, key, payload, older: bool = False):
+        key = tuple(key) if isinstance(key, list) else key
+        items = self._pending.setdefault(kind, {})
+        current = items.get(key)
+        if current is None:
+            items[key] = payload
+            self._pending_count += 1
+        else:
+            merge = _handlers[kind][0]
+            items[key] = merge(payload, current) if older else merge(current, payload)
+
+    def _spool(self, record: dict):
+        if self._segment is None:
+            self._segment_seq += 1
+            path = os.path.join(self.spool_dir, f"spool-{self._run_id}-{self._segment_seq}.jsonl")
+            self._segment = open(path, "x", encoding="utf-8")  # never append to another process's file
+            self._owned.add(path)
+        self._segment.write(json.dumps(record) + "\n")
+        self._segment.flush()  # to the OS, which keeps it if this process dies; flush() fsyncs
+
+    def _seal_segment(self):
+        """Detach the active segment.
+
+        Returns it, still open so the caller can fsync and close it outside
+        the lock, and every segment now fully captured in memory.
+        """
+        segment = self._segment
+        if segment is not None:
+            self._sealed_segments.append(segment.name)
+            self._segment = None
+        sealed, self._sealed_segments = self._sealed_segments, []
+        return segment, sealed
+
+    def _recover(self):
+        """Adopt spool segments left by processes that are no longer running."""
+        # Both live segments (spool-<pid>-<run>-<n>) and ones a since-crashed
+        # worker had itself recovered (recovered-<pid>-<run>-<n>) are fair game.
+        # A file with this process's pid that it did not create belongs to
+        # an earlier process that had the same pid, so it is an orphan too.
+        for path in sorted(glob.glob(os.path.join(self.spool_dir, "*-*-*.jsonl"))):
+            try:
+                pid = int(os.path.basename(path).split("-")[1])
+            except ValueError:
+                continue
+            if path in self._owned or (pid != os.getpid() and _pid_alive(pid)):
+                continue
+            self._segment_seq += 1
+            claimed = os.path.join(self.spool_dir, f"recovered-{self._run_id}-{self._segment_seq}.jsonl")
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue  # another worker claimed it first
+            self._owned.add(claimed)
+            with open(claimed, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn final line from the crash
+                    if record.get("kind") not in _handlers:
+                        logger.warning("write-behind: no handler for %s, dropping", record.get("kind"))
+                        continue
+                    self._merge(record["kind"], record["key"], record["payload"])
+                    if record.get("attempts"):
+                        # Keep counting toward the dead letter, but retry right away
+                        key = record["key"]
+                        scope = (record["kind"], tuple(key) if isinstance(key, list) else key)
+                        attempts = max(record["attempts"], self._attempts.get(scope, (0, 0.0))[0])
+                        self._attempts[scope] = (attempts, 0.0)
+            self._sealed_segments.append(claimed)
+            logger.info("write-behind: recovered %s", path)
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_buffer = WriteBehind(
+    WRITE_BEHIND_SPOOL_DIR,
+    WRITE_BEHIND_FLUSH_INTERVAL_SECONDS,
+    WRITE_BEHIND_MAX_PENDING,
+)
+atexit.register(_buffer.shutdown)
+
+
+def start():
+    """Start this worker's flusher, replaying spools left by dead workers. Call once per worker."""
+    if WRITE_BEHIND_ENABLED:
+        _buffer.start()
+
+
+def submit(kind: str, key, payload):
+    """Queue a non-critical write, or perform it now when write-behind is disabled."""
+    if not WRITE_BEHIND_ENABLED:
+        failed = _handlers[kind][1](get_supabase_client(), {key: payload})
+        if failed:
+            raise RuntimeError(f"{kind} write failed")
+        return
+    _buffer.submit(kind, key, payload)
+
+
+def flush():
+    _buffer.flush()
+
+
+def shutdown():
+    _buffer.shutdown()
+
+
+def stats() -> dict:
+    return _buffer.stats()
+
+
+# ------------------------------------------------------------------
+# Generic row updates: later fields win, one UPDATE per row on flush
+# ------------------------------------------------------------------
+
+def update_later(table: str, pk_column: str, pk_value: str, fields: dict):
+    """Defer ``UPDATE table SET fields WHERE pk_column = pk_value``."""
+    submit("row_update", (table, pk_column, pk_value), fields)
+
+
+def _flush_row_updates(supabase, items: dict) -> list:
+    failed = []
+    for (table, pk_column, pk_value), fields in items.items():
+        try:
+            supabase.table(table).update(fields).eq(pk_column, pk_value).execute()
+        except Exception:
+            logger.exception("write-behind update of %s.%s=%s failed", table, pk_column, pk_value)
+            failed.append((table, pk_column, pk_value))
+    return failed
+
+
+register("row_update", lambda old, new: {**old, **new}, _flush_row_updates)
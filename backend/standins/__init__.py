@@ -0,0 +1,63 @@
+"""Local stand-ins for Supabase, OpenAI and Google Places, for offline load testing.
+
+Enabled with ``STANDINS=all`` (or a comma list of ``supabase``, ``openai``,
+``places``). The real clients are kept: http_pool gives them a transport
+that answers in-process instead of over the network, so query building,
+response parsing, pooling and tracing all still run. Added latency per call
+comes from ``STANDIN_<NAME>_LATENCY`` (see standins/latency.py).
+
+The Supabase stand-in keeps its tables in memory, per process. Run it with
+a single worker (``WEB_CONCURRENCY=1``); one gevent worker handles
+thousands of concurrent requests.
+"""
+
+import os
+import time
+
+import httpx
+
+from standins import chat, gotrue, latency, postgrest
+from standins.places import PlacesAdapter
+from standins.store import get_store
+
+DEFAULT_LATENCY = {
+    "supabase": "lognormal:4:0.5",
+    "openai": "lognormal:900:0.5",
+    "places": "lognormal:150:0.4",
+}
+
+_users = gotrue.Users()
+
+
+class StandInTransport(httpx.BaseTransport):
+    def __init__(self, handler, delay):
+        self.handler = handler
+        self.delay = delay
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        request.read()
+        time.sleep(self.delay())
+        return self.handler(request)
+
+
+def _latency(name: str):
+    return latency.parse(os.getenv(f"STANDIN_{name.upper()}_LATENCY", DEFAULT_LATENCY[name]))
+
+
+def _supabase(request: httpx.Request) -> httpx.Response:
+    if "/auth/v1/" in request.url.path:
+        return gotrue.handle(get_store(), _users, request)
+    return postgrest.handle(get_store(), request)
+
+
+def httpx_transport(name: str) -> httpx.BaseTransport:
+    """Transport for the shared httpx client of *name* (supabase or openai)."""
+    handlers = {"supabase": _supabase, "openai": chat.handle}
+    return StandInTransport(handlers[name], _latency(name))
+
+
+def requests_adapter(name: str) -> PlacesAdapter:
+    """Adapter for the shared requests session of *name* (places)."""
+    if name != "places":
+        raise ValueError(f"no requests stand-in for {name}")
+    return PlacesAdapter(_latency(name))
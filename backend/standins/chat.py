@@ -0,0 +1,121 @@
+"""OpenAI's chat completions API (/v1/chat/completions) for the stand-in.
+
+Answers each of llm_service's prompts with JSON of the shape it asks for,
+so responses parse like real ones. Content is varied at random, so
+regenerating gives different options.
+"""
+
+import json
+import random
+import re
+import time
+import uuid
+import zlib
+
+import httpx
+
+_ITEMS = [
+    "Grilled chicken wrap", "Veggie burger", "Margherita pizza", "Spicy ramen", "Fish tacos",
+    "Falafel bowl", "Chicken tikka", "Caesar salad", "Pad thai", "Sushi platter",
+    "Loaded fries", "Bibimbap", "Chocolate shake", "Acai bowl", "Poke bowl",
+    "Butter chicken", "Beef burrito", "Katsu curry", "Mushroom risotto", "Lamb gyro",
+    "Banh mi", "Pho", "Nachos", "Shawarma plate", "Waffles", "Cheesecake", "Dumplings",
+]
+_HEALTHY = [
+    "Greek yogurt parfait", "Baked sweet potato fries", "Cauliflower crust pizza",
+    "Zucchini noodles with pesto", "Frozen banana 'nice cream'", "Air-fried chicken tenders",
+    "Lettuce-wrap burger", "Dark chocolate and almonds", "Hummus with veggie sticks",
+    "Grilled fish tacos", "Chia pudding", "Edamame", "Cottage cheese with pineapple",
+    "Turkey lettuce cups", "Roasted chickpeas", "Protein smoothie", "Quinoa salad bowl",
+]
+_EXERCISES = [
+    "Brisk walk", "Jog", "Jump rope intervals", "Bodyweight circuit (squats, push-ups, lunges)",
+    "Stair climbing", "Cycling", "Dance workout", "Burpee ladder", "Swimming laps",
+    "Rowing machine", "Uphill hike", "Kettlebell swings", "Shadow boxing", "Power yoga flow",
+    "Mountain climber intervals", "Elliptical session",
+]
+_DIFFICULTIES = (("easy", 45), ("medium", 30), ("hard", 15))
+
+
+def handle(request: httpx.Request) -> httpx.Response:
+    path = request.url.path
+    if path.endswith("/chat/completions") and request.method == "POST":
+        body = json.loads(request.content)
+        messages = body.get("messages", [])
+        system = next((m["content"] for m in messages if m["role"] == "system"), "")
+        user = next((m["content"] for m in messages if m["role"] == "user"), "")
+        content = json.dumps(_answer(system, user))
+        prompt_tokens = sum(len(m.get("content") or "") for m in messages) // 4
+        completion_tokens = len(content) // 4
+        return httpx.Response(200, request=request, json={
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", ""),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop",
+            }],
+            "usage": {
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+            },
+        })
+    if "/models/" in path and request.method == "GET":
+        model = path.rsplit("/", 1)[-1]
+        return httpx.Response(200, request=request, json={
+            "id": model, "object": "model", "created": 0, "owned_by": "stand-in",
+        })
+    return httpx.Response(404, request=request, json={
+        "error": {"message": f"stand-in OpenAI does not implement {request.method} {path}", "type": "invalid_request_error"},
+    })
+
+
+def _answer(system: str, user: str):
+    if "food craving assistant" in system:
+        stores = re.findall(r"^- (.+?) \(", user, re.MULTILINE) or ["Any nearby store"]
+        craving = _field(user, "Craving") or "food"
+        return [
+            {"option": f"{item} ({craving})", "store": random.choice(stores),
+             "description": f"A {item.lower()} that hits the {craving} craving."}
+            for item in random.sample(_ITEMS, _count(system) or random.randint(4, 6))
+        ]
+    if "nutrition assistant" in system:
+        # The same item always gets the same estimate, so players can be matched on it
+        item = _field(user, "Food item").lower()
+        return {"calories": 150 + zlib.crc32(item.encode()) % 105 * 10}
+    if "fitness challenge creator" in system:
+        calories = int(_field(user, "Target calorie burn", "300").split()[0])
+        count = _count(system)
+        if count is None:
+            return [
+                {"description": f"{exercise} to burn ~{calories} kcal", "time_limit": minutes}
+                for exercise, (_, minutes) in zip(random.sample(_EXERCISES, 3), _DIFFICULTIES)
+            ]
+        return [
+            {"description": f"{exercise} to burn ~{calories} kcal", "time_limit": minutes, "difficulty": difficulty}
+            for i, exercise in enumerate(random.sample(_EXERCISES, count))
+            for difficulty, minutes in [_DIFFICULTIES[i % 3]]
+        ]
+    if "healthy eating assistant" in system:
+        excluded = set(re.findall(r"^- (.+)$", user, re.MULTILINE))
+        choices = [s for s in _HEALTHY if s not in excluded] or _HEALTHY
+        return [
+            {"suggestion": s, "description": f"{s}, easy to make at home.",
+             "estimated_calories": random.randrange(80, 400, 10), "why": "Similar taste and texture, far fewer calories."}
+            for s in random.sample(choices, min(_count(system) or 3, len(choices)))
+        ]
+    return {}
+
+
+def _count(system: str) -> int | None:
+    """The item count a candidate-pool prompt asks for; None for the usual page."""
+    match = re.search(r"(?:Generate|generate|Suggest) (\d+) ", system)
+    return int(match.group(1)) if match else None
+
+
+def _field(text: str, name: str, default: str = "") -> str:
+    match = re.search(rf"^{re.escape(name)}: (.+)$", text, re.MULTILINE)
+    return match.group(1).strip() if match else default
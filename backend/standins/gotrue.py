@@ -0,0 +1,124 @@
+"""Supabase Auth (GoTrue, /auth/v1) for the stand-in: email/password sign-up and sign-in.
+
+Users are confirmed on sign-up. As with the real project, a profile row is
+created for every new user (the handle_new_user trigger in migration 001).
+"""
+
+import base64
+import json
+import secrets
+import time
+import uuid
+from datetime import datetime, timezone
+
+import httpx
+
+from standins.store import Store
+
+ACCESS_TOKEN_TTL_SECONDS = 3600
+
+
+class Users:
+    def __init__(self):
+        self.by_email: dict[str, dict] = {}
+        self.passwords: dict[str, str] = {}  # user id -> password
+        self.access_tokens: dict[str, tuple[str, float]] = {}  # token -> (user id, expires at)
+        self.refresh_tokens: dict[str, str] = {}  # token -> user id
+        self.by_id: dict[str, dict] = {}
+
+
+def handle(store: Store, users: Users, request: httpx.Request) -> httpx.Response:
+    path = request.url.path.split("/auth/v1/", 1)[-1].strip("/")
+    body = json.loads(request.content or b"{}") if request.method == "POST" else {}
+    with store.lock:
+        if path == "signup" and request.method == "POST":
+            return _signup(store, users, body, request)
+        if path == "token" and request.method == "POST":
+            grant_type = request.url.params.get("grant_type")
+            if grant_type == "password":
+                user = users.by_email.get((body.get("email") or "").lower())
+                if user is None or users.passwords[user["id"]] != body.get("password"):
+                    return _error(request, 400, "invalid_credentials", "Invalid login credentials")
+                return _session(users, user, request)
+            if grant_type == "refresh_token":
+                user_id = users.refresh_tokens.pop(body.get("refresh_token"), None)
+                if user_id is None:
+                    return _error(request, 400, "refresh_token_not_found", "Invalid Refresh Token")
+                return _session(users, users.by_id[user_id], request)
+        if path == "user" and request.method == "GET":
+            user = _authenticated(users, request)
+            if user is None:
+                return _error(request, 401, "bad_jwt", "invalid JWT: unable to parse or verify signature")
+            return _json(request, 200, user)
+        if path == "logout" and request.method == "POST":
+            token = request.headers.get("authorization", "")[7:]
+            users.access_tokens.pop(token, None)
+            return httpx.Response(204, request=request)
+    return _error(request, 404, "not_found", f"stand-in auth does not implement {request.method} /{path}")
+
+
+def _signup(store: Store, users: Users, body: dict, request: httpx.Request) -> httpx.Response:
+    email = (body.get("email") or "").lower()
+    if not email or not body.get("password"):
+        return _error(request, 422, "validation_failed", "Signup requires a valid password")
+    if email in users.by_email:
+        return _error(request, 422, "user_already_exists", "User already registered")
+    now = datetime.now(timezone.utc).isoformat()
+    metadata = body.get("data") or {}
+    user = {
+        "id": str(uuid.uuid4()),
+        "aud": "authenticated",
+        "role": "authenticated",
+        "email": email,
+        "email_confirmed_at": now,
+        "app_metadata": {"provider": "email", "providers": ["email"]},
+        "user_metadata": metadata,
+        "created_at": now,
+        "updated_at": now,
+    }
+    users.by_email[email] = user
+    users.by_id[user["id"]] = user
+    users.passwords[user["id"]] = body["password"]
+    store.insert("profiles", {"user_id": user["id"], "name": metadata.get("full_name"), "email": email})
+    return _session(users, user, request)
+
+
+def _session(users: Users, user: dict, request: httpx.Request) -> httpx.Response:
+    expires_at = int(time.time()) + ACCESS_TOKEN_TTL_SECONDS
+    access_token = _jwt({"sub": user["id"], "email": user["email"], "aud": "authenticated",
+                         "role": "authenticated", "exp": expires_at})
+    refresh_token = secrets.token_urlsafe(16)
+    users.access_tokens[access_token] = (user["id"], expires_at)
+    users.refresh_tokens[refresh_token] = user["id"]
+    return _json(request, 200, {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_TTL_SECONDS,
+        "expires_at": expires_at,
+        "refresh_token": refresh_token,
+        "user": user,
+    })
+
+
+def _authenticated(users: Users, request: httpx.Request) -> dict | None:
+    header = request.headers.get("authorization", "")
+    entry = users.access_tokens.get(header[7:] if header.startswith("Bearer ") else header)
+    if entry is None or entry[1] < time.time():
+        return None
+    return users.by_id[entry[0]]
+
+
+def _jwt(claims: dict) -> str:
+    def encode(part: dict) -> str:
+        return base64.urlsafe_b64encode(json.dumps(part).encode()).rstrip(b"=").decode()
+
+    # Shaped like a Supabase JWT so clients can decode it; the signature is never checked
+    return f"{encode({'alg': 'HS256', 'typ': 'JWT'})}.{encode(claims)}.{secrets.token_urlsafe(32)}"
+
+
+def _json(request: httpx.Request, status: int, body: dict) -> httpx.Response:
+    return httpx.Response(status, json=body, request=request)
+
+
+def _error(request: httpx.Request, status: int, code: str, message: str) -> httpx.Response:
+    return _json(request, status, {"code": status, "error_code": code, "msg": message})
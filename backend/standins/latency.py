@@ -0,0 +1,33 @@
+"""Latency distributions for the stand-ins, written as short specs.
+
+    0                   no delay
+    fixed:MS            always MS milliseconds
+    uniform:LOW:HIGH    uniformly between LOW and HIGH ms
+    lognormal:MEDIAN:SIGMA
+                        long-tailed, like real API latency: half of the
+                        calls are faster than MEDIAN ms; SIGMA (e.g. 0.5)
+                        sets how heavy the tail is
+"""
+
+import math
+import random
+
+
+def parse(spec: str):
+    """Return a function that draws one delay, in seconds, from *spec*."""
+    kind, *args = (spec or "0").strip().split(":")
+    try:
+        values = [float(a) for a in args]
+        if kind in ("0", "none") and not values:
+            return lambda: 0.0
+        if kind == "fixed" and len(values) == 1:
+            return lambda: values[0] / 1000
+        if kind == "uniform" and len(values) == 2:
+            low, high = values
+            return lambda: random.uniform(low, high) / 1000
+        if kind == "lognormal" and len(values) == 2:
+            mu, sigma = math.log(values[0]), values[1]
+            return lambda: random.lognormvariate(mu, sigma) / 1000
+    except ValueError:
+        pass
+    raise ValueError(f"bad latency spec {spec!r}; expected 0, fixed:MS, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA")
@@ -0,0 +1,63 @@
+"""Google Places nearby search for the stand-in, as a requests transport adapter.
+
+The same location and keyword always give the same places, so the shared
+places table sees the overlap it would in production.
+"""
+
+import hashlib
+import json
+import random
+import time
+from urllib.parse import parse_qs, urlsplit
+
+from requests import Response
+from requests.adapters import BaseAdapter
+
+PLACES_PER_SEARCH = 20
+
+_NAMES = ["Kitchen", "Grill", "Bistro", "Diner", "Express", "Eatery", "Corner", "House", "Cafe", "Bar"]
+_STREETS = ["Main St", "High St", "Park Ave", "Station Rd", "Market Sq", "Lake Dr", "Hill Rd"]
+
+
+class PlacesAdapter(BaseAdapter):
+    def __init__(self, latency):
+        super().__init__()
+        self.latency = latency
+
+    def send(self, request, **kwargs):
+        time.sleep(self.latency())
+        url = urlsplit(request.url)
+        response = Response()
+        response.request = request
+        response.url = request.url
+        response.headers["Content-Type"] = "application/json; charset=UTF-8"
+        if url.path.endswith("/place/nearbysearch/json"):
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            body = {"status": "OK", "results": _nearby(query.get("location", "0,0"), query.get("keyword", ""))}
+            response.status_code = 200
+        else:
+            body = {"status": "INVALID_REQUEST", "error_message": f"stand-in Places does not implement {url.path}"}
+            response.status_code = 200 if request.method == "GET" else 405
+        response._content = json.dumps(body).encode()
+        response.reason = "OK" if response.status_code == 200 else "Method Not Allowed"
+        return response
+
+    def close(self):
+        pass
+
+
+def _nearby(location: str, keyword: str) -> list[dict]:
+    lat, lng = (round(float(v), 2) for v in location.split(","))  # ~1 km cells
+    seed = hashlib.blake2b(f"{lat},{lng},{keyword.lower()}".encode(), digest_size=8).hexdigest()
+    rng = random.Random(seed)
+    label = keyword.title() or "Food"
+    return [
+        {
+            "place_id": f"standin-{seed}-{i}",
+            "name": f"{label} {rng.choice(_NAMES)} #{i + 1}",
+            "vicinity": f"{rng.randint(1, 250)} {rng.choice(_STREETS)}",
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "geometry": {"location": {"lat": lat + rng.uniform(-0.01, 0.01), "lng": lng + rng.uniform(-0.01, 0.01)}},
+        }
+        for i in range(PLACES_PER_SEARCH)
+    ]
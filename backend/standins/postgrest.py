@@ -0,0 +1,320 @@
+"""PostgREST's HTTP interface (/rest/v1) over the in-memory store.
+
+Covers what postgrest-py sends for the queries in this app: column lists
+with embedded selects (many-to-one and one-to-many), eq/neq/gt/gte/lt/lte/in/is/like/ilike
+filters (with ``not.``), ``or``/``and`` groups, order, limit/offset,
+``count=exact``, single-object responses, insert/upsert/update/delete with
+``return=representation``, and the RPCs in standins/rpc.py.
+"""
+
+import json
+import re
+
+import httpx
+
+from standins import rpc
+from standins.store import Store, StoreError
+
+_RESERVED_PARAMS = {"select", "order", "limit", "offset", "on_conflict", "columns", "or", "and"}
+_OPERATORS = {"eq", "neq", "gt", "gte", "lt", "lte", "in", "is", "like", "ilike"}
+_OBJECT_MEDIA_TYPE = "application/vnd.pgrst.object+json"
+_ALIAS = re.compile(r"^(\w+):(?!:)(.+)$")
+_EMPTY = object()  # no response body
+
+
+def handle(store: Store, request: httpx.Request) -> httpx.Response:
+    path = request.url.path.split("/rest/v1/", 1)[-1].strip("/")
+    try:
+        with store.lock:
+            if path.startswith("rpc/"):
+                status, body, headers = _call(store, path[4:], request)
+            else:
+                status, body, headers = _query(store, path, request)
+            content = b"" if body is _EMPTY else json.dumps(body, default=str).encode()
+    except StoreError as exc:
+        status, content, headers = exc.status, json.dumps(exc.to_json()).encode(), {}
+    headers.setdefault("content-type", "application/json; charset=utf-8")
+    return httpx.Response(status, content=content, headers=headers, request=request)
+
+
+# ------------------------------------------------------------------
+# Tables
+# ------------------------------------------------------------------
+
+def _query(store: Store, table: str, request: httpx.Request):
+    store.table(table)
+    params = request.url.params
+    prefer = _prefer(request)
+    method = request.method
+
+    if method == "POST":
+        body = json.loads(request.content or b"null")
+        rows_in = body if isinstance(body, list) else [body]
+        resolution = prefer.get("resolution")
+        on_conflict = tuple(c.strip() for c in params["on_conflict"].split(",")) if "on_conflict" in params \
+            else (store.table(table).primary_key,)
+        rows = [
+            store.insert(
+                table, values, on_conflict,
+                merge=resolution == "merge-duplicates", ignore=resolution == "ignore-duplicates",
+            )
+            for values in rows_in
+        ]
+        rows = [row for row in rows if row is not None]
+        return _write_response(store, table, rows, params, prefer, request, status=201)
+
+    condition = _conditions(store, table, params)
+    matched = _select_rows(store, table, condition)
+
+    if method == "PATCH":
+        fields = json.loads(request.content or b"{}")
+        rows = [store.update(table, row[store.table(table).primary_key], fields) for row in matched]
+        return _write_response(store, table, rows, params, prefer, request, status=200)
+
+    if method == "DELETE":
+        rows = [store.delete(table, row[store.table(table).primary_key]) for row in matched]
+        return _write_response(store, table, rows, params, prefer, request, status=200)
+
+    if method not in ("GET", "HEAD"):
+        raise StoreError(405, "PGRST117", f"Unsupported HTTP method: {method}")
+
+    if "order" in params:
+        matched = _order(store, table, matched, params["order"])
+    total = len(matched)
+    offset = int(params.get("offset", 0))
+    limit = int(params["limit"]) if "limit" in params else None
+    page = matched[offset:offset + limit if limit is not None else None]
+
+    headers = {}
+    if prefer.get("count") == "exact":
+        headers["content-range"] = f"{offset}-{offset + len(page) - 1}/{total}" if page else f"*/{total}"
+    body = [_project(store, table, row, params.get("select", "*")) for row in page]
+    return 200, _maybe_single(body, request), headers
+
+
+def _write_response(store, table, rows, params, prefer, request, status):
+    if prefer.get("return") != "representation":
+        return (201 if status == 201 else 204), _EMPTY, {}
+    body = [_project(store, table, row, params.get("select", "*")) for row in rows]
+    return status, _maybe_single(body, request), {}
+
+
+def _maybe_single(body: list, request: httpx.Request):
+    if _OBJECT_MEDIA_TYPE not in request.headers.get("accept", ""):
+        return body
+    if len(body) != 1:
+        raise StoreError(406, "PGRST116", "JSON object requested, multiple (or no) rows returned")
+    return body[0]
+
+
+def _prefer(request: httpx.Request) -> dict:
+    prefer = {}
+    for part in request.headers.get("prefer", "").split(","):
+        key, _, value = part.strip().partition("=")
+        if key:
+            prefer[key] = value
+    return prefer
+
+
+# ------------------------------------------------------------------
+# Filters
+# ------------------------------------------------------------------
+
+def _conditions(store: Store, table: str, params) -> tuple:
+    """All filters in the query string as one ``("and", [...], False)`` tree."""
+    children = []
+    for key, value in params.multi_items():
+        if key in ("or", "and", "not.or", "not.and"):
+            negate = key.startswith("not.")
+            children.append(_parse_group(store, table, key.split(".")[-1], value, negate))
+        elif key not in _RESERVED_PARAMS:
+            children.append(_parse_filter(store, table, key, value))
+    return ("and", children, False)
+
+
+def _parse_filter(store: Store, table: str, column: str, text: str) -> tuple:
+    negate = text.startswith("not.")
+    if negate:
+        text = text[4:]
+    op, _, value = text.partition(".")
+    if op not in _OPERATORS:
+        raise StoreError(400, "PGRST100", f'"failed to parse filter ({op}.{value})"')
+    store.column_type(table, column)
+    if op == "in":
+        value = [store.coerce_filter(table, column, _unquote(v)) for v in _split(value.strip()[1:-1])]
+    elif op == "is":
+        value = {"null": None, "true": True, "false": False}[value.lower()]
+    elif op in ("like", "ilike"):
+        pattern = re.escape(_unquote(value)).replace(r"\*", ".*").replace("%", ".*").replace("_", ".")
+        value = re.compile(f"^{pattern}$", re.IGNORECASE if op == "ilike" else 0)
+    else:
+        value = store.coerce_filter(table, column, _unquote(value))
+    return ("cmp", column, op, value, negate)
+
+
+def _parse_group(store: Store, table: str, kind: str, text: str, negate: bool) -> tuple:
+    """``(a.eq.1,and(b.lt.2,c.is.null))`` -> condition tree."""
+    text = text.strip()
+    if not (text.startswith("(") and text.endswith(")")):
+        raise StoreError(400, "PGRST100", f'"failed to parse logic tree ({text})"')
+    children = []
+    for part in _split(text[1:-1]):
+        part_negate = part.startswith("not.")
+        if part_negate:
+            part = part[4:]
+        if part.startswith(("and(", "or(")):
+            sub_kind, _, rest = part.partition("(")
+            children.append(_parse_group(store, table, sub_kind, "(" + rest, part_negate))
+        else:
+            column, _, rest = part.partition(".")
+            children.append(_parse_filter(store, table, column, ("not." if part_negate else "") + rest))
+    return (kind, children, negate)
+
+
+def _split(text: str) -> list[str]:
+    """Split on commas that are outside quotes and parentheses."""
+    parts, depth, quoted, start = [], 0, False, 0
+    for i, ch in enumerate(text):
+        if ch == '"':
+            quoted = not quoted
+        elif quoted:
+            continue
+        elif ch == "(":
+            depth += 1
+        elif ch == ")":
+            depth -= 1
+        elif ch == "," and depth == 0:
+            parts.append(text[start:i])
+            start = i + 1
+    if text[start:] or parts:
+        parts.append(text[start:])
+    return [p.strip() for p in parts]
+
+
+def _unquote(value: str) -> str:
+    if len(value) >= 2 and value[0] == '"' and value[-1] == '"':
+        return value[1:-1].replace('\\"', '"')
+    return value
+
+
+def _matches(condition: tuple, row: dict) -> bool:
+    kind = condition[0]
+    if kind == "cmp":
+        _, column, op, value, negate = condition
+        stored = row[column]
+        if op == "is":
+            result = stored is value
+        elif stored is None:
+            return False  # NULL compares as unknown, with or without not.
+        elif op == "eq":
+            result = stored == value
+        elif op == "neq":
+            result = stored != value
+        elif op == "gt":
+            result = stored > value
+        elif op == "gte":
+            result = stored >= value
+        elif op == "lt":
+            result = stored < value
+        elif op == "lte":
+            result = stored <= value
+        elif op == "in":
+            result = stored in value
+        else:
+            result = bool(value.match(str(stored)))
+        return result != negate
+    _, children, negate = condition
+    combine = all if kind == "and" else any
+    return combine(_matches(child, row) for child in children) != negate
+
+
+def _select_rows(store: Store, table: str, condition: tuple) -> list[dict]:
+    """Rows matching *condition*, starting from an index when a top-level eq/in allows it."""
+    candidates = None
+    for child in condition[1]:
+        if child[0] == "cmp" and child[2] in ("eq", "in") and not child[4]:
+            values = child[3] if child[2] == "in" else [child[3]]
+            candidates = store.lookup(table, child[1], values)
+            if candidates is not None:
+                break
+    if candidates is None:
+        candidates = store.scan(table)
+    return [row for row in candidates if _matches(condition, row)]
+
+
+# ------------------------------------------------------------------
+# Ordering and projection
+# ------------------------------------------------------------------
+
+def _order(store: Store, table: str, rows: list[dict], spec: str) -> list[dict]:
+    rows = list(rows)
+    for term in reversed(spec.split(",")):
+        column, *modifiers = term.strip().split(".")
+        store.column_type(table, column)
+        descending = "desc" in modifiers
+        nulls_first = "nullsfirst" in modifiers or (descending and "nullslast" not in modifiers)
+        # With reverse=True the whole key flips, so nulls go to the other end
+        null_rank = 0 if nulls_first != descending else 1
+        rows.sort(
+            key=lambda r: (null_rank, 0) if r[column] is None else (1 - null_rank, r[column]),
+            reverse=descending,
+        )
+    return rows
+
+
+def _project(store: Store, table: str, row: dict, select: str) -> dict:
+    out = {}
+    for item in _split(select):
+        if not item:
+            continue
+        aliased = _ALIAS.match(item)
+        alias, target = aliased.groups() if aliased else ("", item)
+        if "(" in target:
+            embedded, _, columns = target.partition("(")
+            embedded = embedded.split("!")[0]
+            out[alias or embedded] = _embed(store, table, row, embedded, columns[:-1])
+        elif target == "*":
+            out.update(row)
+        else:
+            column = target.split("::")[0]
+            store.column_type(table, column)
+            out[alias or column] = row[column]
+    return out
+
+
+def _embed(store: Store, table: str, row: dict, embedded: str, select: str):
+    relation = store.table(table).embeds.get(embedded)
+    if relation is None:
+        raise StoreError(400, "PGRST200", f"Could not find a relationship between '{table}' and "
+                                          f"'{embedded}' in the schema cache")
+    local, remote = relation
+    to_one = remote == store.table(embedded).primary_key
+    if row[local] is None:
+        return None if to_one else []
+    related = store.lookup(embedded, remote, [row[local]])
+    if related is None:
+        related = [r for r in store.scan(embedded) if r[remote] == row[local]]
+    projected = [_project(store, embedded, r, select or "*") for r in related]
+    if to_one:
+        return projected[0] if projected else None
+    return projected
+
+
+# ------------------------------------------------------------------
+# RPC
+# ------------------------------------------------------------------
+
+def _call(store: Store, name: str, request: httpx.Request):
+    function = rpc.FUNCTIONS.get(name)
+    if function is None:
+        raise StoreError(404, "PGRST202", f"Could not find the function public.{name} in the schema cache")
+    if name in rpc.SERVICE_ROLE_ONLY and request.headers.get("apikey") != rpc.SERVICE_ROLE_KEY:
+        raise StoreError(401, "42501", f"permission denied for function {name}")
+    args = json.loads(request.content or b"{}") if request.method == "POST" else dict(request.url.params)
+    try:
+        result = function(store, **args)
+    except TypeError as exc:
+        raise StoreError(404, "PGRST202", f"Could not find the function public.{name}: {exc}") from None
+    if result is None:
+        return 204, _EMPTY, {}
+    return 200, result, {}
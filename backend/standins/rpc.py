@@ -0,0 +1,180 @@
+"""The database functions from migrations/004-008, over the in-memory store.
+
+Each runs under the store lock, so like its SQL original it is atomic.
+"""
+
+from datetime import datetime, timedelta, timezone
+
+from standins.store import Store, coerce
+
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+
+def respond_to_invitation(store: Store, p_invite_token, p_user_id, p_action, p_challenge_expiry_hours=24):
+    """migrations/004_respond_to_invitation_rpc.sql"""
+    found = store.lookup("invitations", "invite_token", [p_invite_token])
+    if not found:
+        return {"error": "not_found"}
+    inv = found[0]
+
+    if _now() > datetime.fromisoformat(inv["expiry_time"]):
+        if inv["status"] == "pending":
+            store.update("invitations", inv["invitation_id"], {"status": "expired"})
+        return {"error": "expired"}
+    if inv["status"] != "pending":
+        return {"error": "not_pending", "status": inv["status"]}
+    if inv["inviter_user_id"] == p_user_id:
+        return {"error": "self_invite"}
+
+    if p_action == "decline":
+        store.update("invitations", inv["invitation_id"], {"status": "declined"})
+        return {"invitation_id": inv["invitation_id"], "status": "declined"}
+
+    src = store.get("sessions", inv["session_id"]) or {}
+    session = store.insert("sessions", {
+        "user_id": p_user_id,
+        "crave_item": src.get("crave_item") or "",
+        "calories": src.get("calories"),
+        "session_type": "invite_friend",
+    })
+    challenge_expiry = (_now() + timedelta(hours=p_challenge_expiry_hours)).isoformat()
+    challenge = store.insert("challenges", {
+        "session_id": session["session_id"],
+        "challenge": inv["challenge_description"],
+        "time_limit": inv["challenge_time_limit"],
+        "expiry_time": challenge_expiry,
+        "status": "pending",
+    })
+    store.update("invitations", inv["invitation_id"], {
+        "invitee_user_id": p_user_id,
+        "invitee_session_id": session["session_id"],
+        "status": "accepted",
+    })
+    return {
+        "invitation_id": inv["invitation_id"],
+        "session_id": session["session_id"],
+        "challenge_id": challenge["challenge_id"],
+        "challenge": inv["challenge_description"],
+        "time_limit": inv["challenge_time_limit"],
+        "expiry_time": challenge["expiry_time"],
+    }
+
+
+def record_session_outcome(store: Store, p_user_id, p_session_type, p_rating=None, p_calories_offset=0):
+    """migrations/006_user_stats.sql"""
+    today = _now().date()
+    stats = store.get("user_stats", p_user_id)
+    if stats is None:
+        return dict(store.insert("user_stats", {
+            "user_id": p_user_id,
+            "total_sessions": 1,
+            "sessions_by_type": {p_session_type: 1},
+            "rating_sum": p_rating or 0,
+            "rating_count": int(p_rating is not None),
+            "current_streak": 1,
+            "best_streak": 1,
+            "last_active_date": today,
+            "total_calories_offset": p_calories_offset or 0,
+        }))
+
+    last = stats["last_active_date"]
+    if last == today.isoformat():
+        streak = stats["current_streak"]
+    elif last == (today - timedelta(days=1)).isoformat():
+        streak = stats["current_streak"] + 1
+    else:
+        streak = 1
+    by_type = dict(stats["sessions_by_type"] or {})
+    by_type[p_session_type] = by_type.get(p_session_type, 0) + 1
+    return dict(store.update("user_stats", p_user_id, {
+        "total_sessions": stats["total_sessions"] + 1,
+        "sessions_by_type": by_type,
+        "rating_sum": stats["rating_sum"] + (p_rating or 0),
+        "rating_count": stats["rating_count"] + int(p_rating is not None),
+        "current_streak": streak,
+        "best_streak": max(stats["best_streak"], streak),
+        "last_active_date": today,
+        "total_calories_offset": stats["total_calories_offset"] + (p_calories_offset or 0),
+        "updated_at": _now(),
+    }))
+
+
+def increment_preferences(store: Store, p_rows):
+    """migrations/007_increment_preferences_rpc.sql"""
+    grouped = {}
+    for r in p_rows:
+        key = (r["user_id"], r["category"], r["item"])
+        count, last = grouped.get(key, (0, None))
+        ordered = coerce("timestamptz", r.get("last_ordered") or _now())
+        grouped[key] = (count + (r.get("order_count") or 1), max(filter(None, [last, ordered])))
+    written = []
+    for (user_id, category, item), (count, last) in grouped.items():
+        values = {"user_id": user_id, "category": category, "item": item}
+        row = store.find_unique("user_preferences", ("user_id", "category", "item"), values)
+        if row is None:
+            store.insert("user_preferences", {**values, "order_count": count, "last_ordered": last})
+        else:
+            store.update("user_preferences", row["preference_id"], {
+                "order_count": row["order_count"] + count,
+                "last_ordered": max(row["last_ordered"], last),
+            })
+        written.append({**values, "inserted": row is None})
+    return written
+
+
+def upsert_places(store: Store, p_places):
+    """migrations/008_places_table.sql"""
+    latest = {}
+    for r in p_places or []:
+        if r.get("place_id"):
+            latest[r["place_id"]] = r
+    for place_id, r in latest.items():
+        values = {
+            "name": r.get("name") or "",
+            "address": r.get("address") or "",
+            "rating": round(float(r.get("rating") or 0), 1),
+        }
+        existing = store.get("places", place_id)
+        if existing is None:
+            store.insert("places", {"place_id": place_id, **values, "updated_at": _now()})
+        elif any(existing[k] != v for k, v in values.items()):
+            store.update("places", place_id, {**values, "updated_at": _now()})
+
+
+def convert_location_options(store: Store, p_batch_size=500):
+    """migrations/008_places_table.sql"""
+    batch = sorted(
+        (row for row in store.scan("sessions") if row["location_options"] is not None),
+        key=lambda row: row["session_id"],
+    )[:p_batch_size]
+    for row in batch:
+        lo = row["location_options"] or {}
+        places = lo.get("places") or []
+        upsert_places(store, places)
+        store.update("sessions", row["session_id"], {
+            "place_ids": [p["place_id"] for p in places if p.get("place_id")],
+            "craving_options": lo.get("options"),
+            "healthy_suggestions": lo.get("healthy_suggestions"),
+            "healthy_excluded": list(lo.get("healthy_excluded") or []),
+            "crave_regenerations": int(lo.get("crave_regenerations") or 0),
+            "challenge_regenerations": int(lo.get("challenge_regenerations") or 0),
+            "healthy_regenerations": int(lo.get("healthy_regenerations") or 0),
+            "location_options": None,
+        })
+    return len(batch)
+
+
+FUNCTIONS = {
+    "respond_to_invitation": respond_to_invitation,
+    "record_session_outcome": record_session_outcome,
+    "increment_preferences": increment_preferences,
+    "upsert_places": upsert_places,
+    "convert_location_options": convert_location_options,
+}
+
+# Every function above is revoked from anon and authenticated in the
+# migrations; only the service role may call them
+SERVICE_ROLE_KEY = "standin-service-role-key"
+SERVICE_ROLE_ONLY = set(FUNCTIONS)
@@ -0,0 +1,180 @@
+"""Tables the stand-in store holds, mirroring migrations/001-010.
+
+Each column maps to a type tag, used to coerce filter values and inserted
+values the way Postgres would. Only constraints the app relies on are kept:
+primary keys, unique keys, defaults and the foreign keys used by embedded
+selects.
+"""
+
+import uuid
+from datetime import datetime, timezone
+
+
+def _uuid():
+    return str(uuid.uuid4())
+
+
+def _now():
+    return datetime.now(timezone.utc).isoformat()
+
+
+class Table:
+    def __init__(self, name, primary_key, columns, defaults=None, unique=(), indexes=(), embeds=None):
+        self.name = name
+        self.primary_key = primary_key
+        self.columns = columns  # column -> type tag
+        self.defaults = defaults or {}  # column -> value or zero-argument callable
+        self.unique = [tuple(u) for u in unique]  # besides the primary key
+        self.indexes = tuple(indexes)  # columns looked up by eq/in often enough to index
+        # embedded table -> (local column, remote column); one row if remote is its primary key, else a list
+        self.embeds = embeds or {}
+
+
+TABLES = {
+    t.name: t
+    for t in [
+        Table(
+            "profiles",
+            "user_id",
+            {
+                "user_id": "uuid", "name": "text", "email": "text", "age": "int",
+                "height": "real", "weight": "real", "total_points": "int",
+                "created_at": "timestamptz",
+            },
+            defaults={"total_points": 0, "created_at": _now},
+        ),
+        Table(
+            "sessions",
+            "session_id",
+            {
+                "session_id": "uuid", "user_id": "uuid", "crave_item": "text", "calories": "int",
+                "location_options": "jsonb", "session_type": "text", "rating": "int",
+                "created_at": "timestamptz", "place_ids": "array", "craving_options": "jsonb",
+                "healthy_suggestions": "jsonb", "healthy_excluded": "array",
+                "crave_regenerations": "int", "challenge_regenerations": "int",
+                "healthy_regenerations": "int", "crave_candidates": "jsonb",
+                "challenge_candidates": "jsonb", "healthy_candidates": "jsonb",
+                "crave_personalized": "bool", "crave_excluded": "array", "challenge_excluded": "array",
+            },
+            defaults={
+                "session_id": _uuid, "created_at": _now, "healthy_excluded": list,
+                "crave_excluded": list, "challenge_excluded": list,
+                "crave_regenerations": 0, "challenge_regenerations": 0, "healthy_regenerations": 0,
+            },
+            indexes=["user_id"],
+            embeds={"profiles": ("user_id", "user_id"), "challenges": ("session_id", "session_id")},
+        ),
+        Table(
+            "challenges",
+            "challenge_id",
+            {
+                "challenge_id": "uuid", "session_id": "uuid", "challenge": "text", "time_limit": "int",
+                "expiry_time": "timestamptz", "status": "text", "created_at": "timestamptz",
+            },
+            defaults={"challenge_id": _uuid, "status": "pending", "created_at": _now},
+            indexes=["session_id"],
+            embeds={"sessions": ("session_id", "session_id")},
+        ),
+        Table(
+            "ranks",
+            "rank_id",
+            {"rank_id": "int", "rank_type": "text", "min_points": "int", "max_points": "int"},
+            unique=[("rank_type",)],
+        ),
+        Table(
+            "user_preferences",
+            "preference_id",
+            {
+                "preference_id": "uuid", "user_id": "uuid", "category": "text", "item": "text",
+                "order_count": "int", "last_ordered": "timestamptz",
+            },
+            defaults={"preference_id": _uuid, "order_count": 1, "last_ordered": _now},
+            unique=[("user_id", "category", "item")],
+            indexes=["user_id"],
+        ),
+        Table(
+            "invitations",
+            "invitation_id",
+            {
+                "invitation_id": "uuid", "session_id": "uuid", "inviter_user_id": "uuid",
+                "invitee_user_id": "uuid", "invite_token": "text", "status": "text",
+                "invitee_session_id": "uuid", "challenge_description": "text",
+                "challenge_time_limit": "int", "expiry_time": "timestamptz", "created_at": "timestamptz",
+            },
+            defaults={"invitation_id": _uuid, "status": "pending", "created_at": _now},
+            unique=[("invite_token",)],
+            indexes=["invite_token", "inviter_user_id"],
+            embeds={"sessions": ("session_id", "session_id")},
+        ),
+        Table(
+            "matchmaking_queue",
+            "queue_id",
+            {
+                "queue_id": "uuid", "user_id": "uuid", "session_id": "uuid", "calories": "int",
+                "status": "text", "created_at": "timestamptz",
+            },
+            defaults={"queue_id": _uuid, "status": "waiting", "created_at": _now},
+            indexes=["status", "user_id", "session_id"],
+        ),
+        Table(
+            "matches",
+            "match_id",
+            {
+                "match_id": "uuid", "user1_id": "uuid", "user2_id": "uuid", "session_id_1": "uuid",
+                "session_id_2": "uuid", "challenge_description": "text", "challenge_time_limit": "int",
+                "status": "text", "winner_user_id": "uuid", "created_at": "timestamptz",
+            },
+            defaults={"match_id": _uuid, "status": "active", "created_at": _now},
+            indexes=["session_id_1", "session_id_2"],
+        ),
+        Table(
+            "user_stats",
+            "user_id",
+            {
+                "user_id": "uuid", "total_sessions": "int", "sessions_by_type": "jsonb",
+                "rating_sum": "int", "rating_count": "int", "current_streak": "int",
+                "best_streak": "int", "last_active_date": "date", "total_calories_offset": "int",
+                "updated_at": "timestamptz",
+            },
+            defaults={
+                "total_sessions": 0, "sessions_by_type": dict, "rating_sum": 0, "rating_count": 0,
+                "current_streak": 0, "best_streak": 0, "total_calories_offset": 0, "updated_at": _now,
+            },
+        ),
+        Table(
+            "places",
+            "place_id",
+            {"place_id": "text", "name": "text", "address": "text", "rating": "real", "updated_at": "timestamptz"},
+            defaults={"name": "", "address": "", "rating": 0, "updated_at": _now},
+        ),
+        Table(
+            "idempotency_keys",
+            "id",
+            {
+                "id": "uuid", "user_id": "uuid", "key": "text", "fingerprint": "text", "status": "int",
+                "headers": "jsonb", "body": "text", "created_at": "timestamptz",
+            },
+            defaults={"id": _uuid, "created_at": _now},
+            unique=[("user_id", "key")],
+            indexes=["user_id"],
+        ),
+    ]
+}
+
+# migrations/001_create_tables.sql seeds these
+SEED_ROWS = {
+    "ranks": [
+        {"rank_id": i, "rank_type": rank_type, "min_points": low, "max_points": high}
+        for i, (rank_type, low, high) in enumerate(
+            [
+                ("Beginner", 0, 99),
+                ("Bronze", 100, 499),
+                ("Silver", 500, 999),
+                ("Gold", 1000, 2499),
+                ("Platinum", 2500, 4999),
+                ("Diamond", 5000, 999999),
+            ],
+            start=1,
+        )
+    ],
+}
@@ -0,0 +1,235 @@
+"""In-memory tables behind the stand-in PostgREST and GoTrue endpoints."""
+
+import threading
+from datetime import date, datetime, timezone
+
+from standins.schema import SEED_ROWS, TABLES
+
+
+class StoreError(Exception):
+    """An error PostgREST would report, with its HTTP status and Postgres/PostgREST code."""
+
+    def __init__(self, status: int, code: str, message: str):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+
+    def to_json(self) -> dict:
+        return {"code": self.code, "message": self.message, "details": None, "hint": None}
+
+
+class Store:
+    """Rows per table, keyed by primary key, with hash indexes on the columns the routes filter by.
+
+    Callers hold ``lock`` for a whole statement (or RPC), which makes every
+    statement atomic and serializable, like a single-connection database.
+    """
+
+    def __init__(self, tables=TABLES, seed=SEED_ROWS):
+        self.tables = tables
+        self.lock = threading.RLock()
+        self.rows: dict[str, dict] = {name: {} for name in tables}
+        self._indexes = {name: {column: {} for column in t.indexes} for name, t in tables.items()}
+        self._unique = {name: {columns: {} for columns in t.unique} for name, t in tables.items()}
+        for table, rows in seed.items():
+            for row in rows:
+                self.insert(table, row)
+
+    # -- reads -------------------------------------------------------------
+
+    def table(self, name: str):
+        try:
+            return self.tables[name]
+        except KeyError:
+            raise StoreError(404, "42P01", f'relation "public.{name}" does not exist') from None
+
+    def get(self, table: str, key):
+        return self.rows[table].get(key)
+
+    def lookup(self, table: str, column: str, values: list) -> list[dict] | None:
+        """Rows whose *column* is one of *values*, or None if *column* is not indexed."""
+        t = self.table(table)
+        if column == t.primary_key:
+            rows = self.rows[table]
+            return [rows[v] for v in dict.fromkeys(values) if v in rows]
+        index = self._indexes[table].get(column)
+        if index is None:
+            return None
+        rows = self.rows[table]
+        return [rows[key] for v in dict.fromkeys(values) for key in index.get(v, ())]
+
+    def scan(self, table: str) -> list[dict]:
+        self.table(table)
+        return list(self.rows[table].values())
+
+    # -- writes ------------------------------------------------------------
+
+    def insert(self, table: str, values: dict, on_conflict: tuple | None = None, merge: bool = False,
+               ignore: bool = False) -> dict | None:
+        """INSERT one row; with *merge*, ON CONFLICT (*on_conflict*) DO UPDATE the given columns."""
+        t = self.table(table)
+        values = self.coerce_row(table, values)
+        if on_conflict and (merge or ignore):
+            existing = self.find_unique(table, on_conflict, values)
+            if existing is not None:
+                if ignore:
+                    return None
+                return self.update(table, existing[t.primary_key], values)
+
+        row = {column: None for column in t.columns}
+        for column, default in t.defaults.items():
+            if column not in values:
+                row[column] = coerce(t.columns[column], default() if callable(default) else default)
+        row.update(values)
+        key = row[t.primary_key]
+        if key is None:
+            raise StoreError(400, "23502", f'null value in column "{t.primary_key}" of relation "{table}" '
+                                           "violates not-null constraint")
+        if key in self.rows[table]:
+            raise StoreError(409, "23505", f'duplicate key value violates unique constraint "{table}_pkey"')
+        for columns, seen in self._unique[table].items():
+            if self._unique_key(row, columns) in seen:
+                raise StoreError(409, "23505", f'duplicate key value violates unique constraint '
+                                               f'"{table}_{"_".join(columns)}_key"')
+
+        self.rows[table][key] = row
+        self._index(table, row)
+        return row
+
+    def update(self, table: str, key, fields: dict) -> dict:
+        t = self.table(table)
+        fields = self.coerce_row(table, fields)
+        row = self.rows[table][key]
+        if t.primary_key in fields and fields[t.primary_key] != key:
+            raise StoreError(400, "42P10", "changing a primary key is not supported by the stand-in")
+        updated = {**row, **fields}
+        for columns, seen in self._unique[table].items():
+            new_key = self._unique_key(updated, columns)
+            if new_key != self._unique_key(row, columns) and new_key in seen:
+                raise StoreError(409, "23505", f'duplicate key value violates unique constraint '
+                                               f'"{table}_{"_".join(columns)}_key"')
+        self._unindex(table, row)
+        row.update(fields)
+        self._index(table, row)
+        return row
+
+    def delete(self, table: str, key) -> dict:
+        row = self.rows[table].pop(key)
+        self._unindex(table, row)
+        return row
+
+    # -- types -------------------------------------------------------------
+
+    def coerce_row(self, table: str, values: dict) -> dict:
+        t = self.table(table)
+        out = {}
+        for column, value in values.items():
+            kind = t.columns.get(column)
+            if kind is None:
+                raise StoreError(400, "PGRST204",
+                                 f"Could not find the '{column}' column of '{table}' in the schema cache")
+            out[column] = coerce(kind, value)
+        return out
+
+    def coerce_filter(self, table: str, column: str, text):
+        """Turn a filter's text into a value comparable with what is stored in *column*."""
+        kind = self.column_type(table, column)
+        if text is None:
+            return None
+        if kind in ("jsonb", "array"):
+            return text
+        try:
+            return coerce(kind, text)
+        except (TypeError, ValueError):
+            raise StoreError(400, "22P02", f'invalid input syntax for type {kind}: "{text}"') from None
+
+    def column_type(self, table: str, column: str) -> str:
+        kind = self.table(table).columns.get(column)
+        if kind is None:
+            raise StoreError(400, "42703", f"column {table}.{column} does not exist")
+        return kind
+
+    # -- internals ---------------------------------------------------------
+
+    def find_unique(self, table: str, columns: tuple, values: dict) -> dict | None:
+        t = self.tables[table]
+        if any(column not in values for column in columns):
+            return None
+        if columns == (t.primary_key,):
+            return self.rows[table].get(values[t.primary_key])
+        seen = self._unique[table].get(columns)
+        if seen is None:
+            raise StoreError(400, "42P10", "there is no unique or exclusion constraint matching the "
+                                           "ON CONFLICT specification")
+        key = seen.get(self._unique_key(values, columns))
+        return None if key is None else self.rows[table][key]
+
+    @staticmethod
+    def _unique_key(row: dict, columns: tuple):
+        key = tuple(row.get(column) for column in columns)
+        return None if None in key else key  # NULLs never conflict
+
+    def _index(self, table: str, row: dict):
+        key = row[self.tables[table].primary_key]
+        for column, index in self._indexes[table].items():
+            index.setdefault(row[column], set()).add(key)
+        for columns, seen in self._unique[table].items():
+            unique_key = self._unique_key(row, columns)
+            if unique_key is not None:
+                seen[unique_key] = key
+
+    def _unindex(self, table: str, row: dict):
+        key = row[self.tables[table].primary_key]
+        for column, index in self._indexes[table].items():
+            keys = index.get(row[column])
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del index[row[column]]
+        for columns, seen in self._unique[table].items():
+            seen.pop(self._unique_key(row, columns), None)
+
+
+def coerce(kind: str, value):
+    """Normalise *value* to how the stand-in stores a column of type *kind*."""
+    if value is None:
+        return None
+    if kind == "int":
+        if isinstance(value, bool):
+            return int(value)
+        if isinstance(value, float) and not value.is_integer():
+            raise ValueError(value)
+        return int(value)
+    if kind == "real":
+        return float(value)
+    if kind == "bool":
+        return value if isinstance(value, bool) else str(value).lower() in ("true", "t", "1")
+    if kind == "timestamptz":
+        # One format for every timestamp, so string order is time order
+        if isinstance(value, datetime):
+            parsed = value
+        else:
+            parsed = datetime.fromisoformat(str(value))
+        if parsed.tzinfo is None:
+            parsed = parsed.replace(tzinfo=timezone.utc)
+        return parsed.astimezone(timezone.utc).isoformat()
+    if kind == "date":
+        return value.isoformat() if isinstance(value, date) else date.fromisoformat(str(value)[:10]).isoformat()
+    if kind in ("text", "uuid"):
+        return str(value)
+    return value  # jsonb, arrays
+
+
+_default_store = None
+_default_store_lock = threading.Lock()
+
+
+def get_store() -> Store:
+    """The process-wide store shared by the stand-in Supabase endpoints."""
+    global _default_store
+    if _default_store is None:
+        with _default_store_lock:
+            if _default_store is None:
+                _default_store = Store()
+    return _default_store